@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+#
+# -----------------------------------------------------------------------------
+# Copyright (c) 2013- Spyder Project Contributors
+#
+# Released under the terms of the MIT License
+# (see LICENSE.txt in the project root directory for details)
+# -----------------------------------------------------------------------------
+
+"""
+Benchmark sorting the lines of the data tree by the "Time (ms)" column.
+
+"Before" reproduces the former `TreeWidgetItem.__lt__`, which applied
+a regex natural sort key to the display strings of both items on every
+comparison. "After" is the model sort, which compares the raw values
+stored under SORT_ROLE.
+
+Run with ``python benchmarks/bench_sort.py`` once the plugin is installed.
+"""
+
+# Standard library imports
+import functools
+import random
+import time
+
+# Third party imports
+from qtpy.QtCore import Qt
+
+# Local imports
+from spyder_line_profiler.results import (
+    ProfileResult, compute_function_result)
+from spyder_line_profiler.spyder.widgets import (
+    COL_TIME, LineProfilerDataModel, natural_sort_key)
+
+
+def make_stats(nlines, nfuncs=10):
+    """Generate a random ProfileResult with `nlines` lines in total."""
+    rng = random.Random(0)
+    functions = {}
+    per_func = nlines // nfuncs
+    for func_index in range(nfuncs):
+        start_line_no = func_index * per_func + 1
+        func_info = ('file.py', start_line_no, 'f%d' % func_index)
+        lines = []
+        timings = []
+        for pos in range(per_func):
+            line_no = start_line_no + pos
+            if rng.random() < 0.2:
+                lines.append('pass\n')
+            else:
+                lines.append('x = %d\n' % line_no)
+                timings.append(
+                    (line_no, rng.randint(1, 10000), rng.random()))
+        functions[func_info] = compute_function_result(
+            func_info, timings, 1.0, lines)
+    return ProfileResult('results.lprof', functions)
+
+
+def sort_before(model, column):
+    """Sort as the former QTreeWidgetItem subclass did."""
+    def less_than(func, i, j):
+        key1 = natural_sort_key(model._line_text(func.result, i, column))
+        key2 = natural_sort_key(model._line_text(func.result, j, column))
+        return -1 if key1 < key2 else (1 if key2 < key1 else 0)
+
+    for func in model.functions:
+        func.order.sort(
+            key=functools.cmp_to_key(functools.partial(less_than, func)))
+
+
+def sort_after(model, column):
+    """Sort with the model and its cached sort keys."""
+    for func in model.functions:
+        func.sort_keys.clear()
+    model.sort(column, Qt.AscendingOrder)
+
+
+def main():
+    from spyder.utils.qthelpers import qapplication
+    app = qapplication()  # noqa: F841
+
+    print('{:>8}  {:>10}  {:>10}'.format('rows', 'before (s)', 'after (s)'))
+    for nlines in (10_000, 100_000):
+        model = LineProfilerDataModel([''] * 8)
+        model.set_stats(make_stats(nlines))
+        timings = []
+        for sort in (sort_before, sort_after):
+            for func in model.functions:
+                func.order.reverse()
+            start = time.perf_counter()
+            sort(model, COL_TIME)
+            timings.append(time.perf_counter() - start)
+        print('{:>8}  {:>10.3f}  {:>10.3f}'.format(nlines, *timings))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,197 @@
+# -*- coding: utf-8 -*-
+#
+# -----------------------------------------------------------------------------
+# Copyright (c) 2013- Spyder Project Contributors
+#
+# Released under the terms of the MIT License
+# (see LICENSE.txt in the project root directory for details)
+# -----------------------------------------------------------------------------
+
+"""
+Command line interface, to profile scripts and export results without Qt.
+
+Examples::
+
+    python -m spyder_line_profiler run script.py arg1 arg2
+    python -m spyder_line_profiler -f csv load -j 4 results/*.lprof
+
+Results are checked against the budgets of the project, if it has a
+budget file, and the exit code is 1 if some are exceeded.
+"""
+
+# Standard library imports
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+import os
+import subprocess
+import sys
+import tempfile
+
+# Local imports
+from spyder_line_profiler.budgets import (
+    BUDGET_FILENAME, BudgetError, check_budgets, get_budgets_for,
+    load_budgets, write_report)
+from spyder_line_profiler.export import (
+    BINARY_FORMATS, FORMATS, is_format_available, write_results)
+from spyder_line_profiler.results import ProfileResult, load_profile_data
+
+STDERR_FILENO = 2
+
+
+def run_script(script, args, datafile):
+    """
+    Profile `script` with kernprof, saving results to `datafile`.
+
+    The output of the script is sent to stderr, so that stdout only has
+    the exported results. Returns the exit code of the script.
+    """
+    command = [sys.executable, '-m', 'kernprof', '-lb', '-o', datafile,
+               script] + list(args)
+    return subprocess.call(command, stdout=STDERR_FILENO)
+
+
+def load_files(paths, jobs=None):
+    """
+    Load the results saved in `paths`, in order.
+
+    Files are loaded by a pool of `jobs` processes if there are several of
+    them. Results are yielded as soon as they are available.
+    """
+    if len(paths) < 2 or jobs == 1:
+        for path in paths:
+            yield load_profile_data(path)
+        return
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        yield from executor.map(load_profile_data, paths)
+
+
+def rename(result, path):
+    # A copy, as the lines of results loaded from a stats file are read
+    # from the file at their path
+    return ProfileResult(path, dict(result), result.sampled)
+
+
+def collect(results, collected):
+    """Yield `results`, also appending them to the list `collected`."""
+    for result in results:
+        collected.append(result)
+        yield result
+
+
+def get_parser():
+    parser = argparse.ArgumentParser(
+        prog='python -m spyder_line_profiler',
+        description='Profile Python scripts line by line and export the '
+                    'results.')
+    parser.add_argument(
+        '-f', '--format', choices=FORMATS, default='text',
+        help='format of the results (default: %(default)s)')
+    parser.add_argument(
+        '-o', '--output',
+        help='file to write the results to (default: stdout, which is not '
+             'available for parquet)')
+    parser.add_argument(
+        '-b', '--budgets',
+        help='budget file to check the results against (default: the {} '
+             'file of the project, if any)'.format(BUDGET_FILENAME))
+    parser.add_argument(
+        '--no-budgets', action='store_true',
+        help="don't check the results against budgets")
+    parser.add_argument(
+        '--report',
+        help='file to write a JSON report of budget violations to')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = subparsers.add_parser(
+        'run', help='profile a script with kernprof and export the results')
+    run_parser.add_argument(
+        '-s', '--save',
+        help='also keep the results of kernprof in this file')
+    run_parser.add_argument('script', help='script to profile')
+    run_parser.add_argument(
+        'args', nargs=argparse.REMAINDER, help='arguments of the script')
+
+    load_parser = subparsers.add_parser(
+        'load', help='export results saved by kernprof (.lprof files)')
+    load_parser.add_argument(
+        '-j', '--jobs', type=int,
+        help='number of processes used to load files (default: number of '
+             'CPUs)')
+    load_parser.add_argument('files', nargs='+', help='results to export')
+    return parser
+
+
+def main(argv=None):
+    parser = get_parser()
+    options = parser.parse_args(argv)
+    if not is_format_available(options.format):
+        parser.error('pyarrow is needed to export to {}'.format(
+            options.format))
+    if options.format in BINARY_FORMATS and options.output is None:
+        parser.error('an output file is needed to export to {}'.format(
+            options.format))
+
+    budgets, budget_file = [], None
+    if not options.no_budgets:
+        try:
+            if options.budgets is not None:
+                budget_file = options.budgets
+                budgets = load_budgets(budget_file)
+            else:
+                budgets, budget_file = get_budgets_for(
+                    options.script if options.command == 'run'
+                    else os.getcwd())
+        except BudgetError as error:
+            parser.exit(2, '{}\n'.format(error))
+
+    returncode = 0
+    tmpdir = None
+    if options.command == 'run':
+        datafile = options.save
+        if datafile is None:
+            tmpdir = tempfile.TemporaryDirectory()
+            datafile = os.path.join(tmpdir.name, 'results.lprof')
+        returncode = run_script(options.script, options.args, datafile)
+        if not os.path.isfile(datafile):
+            parser.exit(returncode or 1,
+                        'No profiling results were saved\n')
+        paths = [datafile]
+        jobs = 1
+    else:
+        paths = options.files
+        jobs = options.jobs
+
+    loaded = []
+    try:
+        results = load_files(paths, jobs)
+        if budget_file is not None:
+            results = collect(results, loaded)
+        if options.command == 'run':
+            results = (rename(result, options.script) for result in results)
+        if options.output is None:
+            write_results(results, sys.stdout, options.format)
+        elif options.format in BINARY_FORMATS:
+            with open(options.output, 'wb') as f:
+                write_results(results, f, options.format)
+        else:
+            with open(options.output, 'w', encoding='utf-8',
+                      newline='') as f:
+                write_results(results, f, options.format)
+    finally:
+        if tmpdir is not None:
+            tmpdir.cleanup()
+
+    violations = [violation for result in loaded
+                  for violation in check_budgets(budgets, result)]
+    for violation in violations:
+        sys.stderr.write('Budget exceeded: {}\n'.format(violation.message()))
+    if options.report is not None:
+        with open(options.report, 'w', encoding='utf-8') as f:
+            write_report(violations, f, budget_file)
+    if violations and not returncode:
+        returncode = 1
+    return returncode
+
+
+if __name__ == '__main__':
+    sys.exit(main())
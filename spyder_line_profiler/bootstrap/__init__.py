@@ -0,0 +1,26 @@
+# -*- coding: utf-8 -*-
+#
+# -----------------------------------------------------------------------------
+# Copyright (c) 2013- Spyder Project Contributors
+#
+# Released under the terms of the MIT License
+# (see LICENSE.txt in the project root directory for details)
+# -----------------------------------------------------------------------------
+
+"""
+Scripts executed by the profiled interpreter.
+
+The interpreter used to run the profiled script does not need to have
+Spyder (or this plugin) installed, so the modules in this package are
+started by path and can only depend on the standard library and
+line_profiler.
+"""
+
+import os.path as osp
+
+BOOTSTRAP_DIR = osp.dirname(osp.abspath(__file__))
+
+
+def get_bootstrap_path(name):
+    """Return the path of bootstrap script `name`."""
+    return osp.join(BOOTSTRAP_DIR, name + '.py')
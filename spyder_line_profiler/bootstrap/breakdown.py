@@ -0,0 +1,244 @@
+# -*- coding: utf-8 -*-
+#
+# -----------------------------------------------------------------------------
+# Copyright (c) 2013- Spyder Project Contributors
+#
+# Released under the terms of the MIT License
+# (see LICENSE.txt in the project root directory for details)
+# -----------------------------------------------------------------------------
+
+"""
+Line profiling broken down by thread and asyncio task.
+
+A ContextProfiler keeps a line profiler per context, that is per thread
+and, within a running event loop, per asyncio task. Profiled functions
+enable the profiler of the context they run in, and coroutines do it
+each time they are resumed, so that the lines of a task are not charged
+with the time other tasks run while it is suspended. The time spent
+suspended is recorded separately, for the line where the coroutine
+waited.
+
+Breakdown files are pickled lists of dicts with the ``thread`` and
+``task`` names of each context (``task`` being None outside of tasks),
+its ``stats`` and its ``suspended`` times, which map the (filename,
+first line of function, line) of await lines to seconds.
+"""
+
+# Standard library imports
+import functools
+import inspect
+import os
+import pickle
+import sys
+import threading
+import time
+import types
+
+# Third party imports
+import line_profiler
+
+
+def get_context():
+    """Return the (thread name, task name or None) of the running code."""
+    task = None
+    asyncio = sys.modules.get('asyncio')
+    if asyncio is not None:
+        try:
+            current = asyncio.current_task()
+        except RuntimeError:  # No running event loop
+            current = None
+        if current is not None:
+            task = current.get_name()
+    return threading.current_thread().name, task
+
+
+class ContextProfiler:
+    """
+    Line profiler recording separate statistics for each context.
+
+    It is used like a LineProfiler, as the ``profile`` decorator.
+    """
+
+    def __init__(self):
+        self.functions = []
+        self._profilers = {}   # Context: LineProfiler
+        self._suspended = {}   # Context: {(filename, first line, line): s}
+        self._lock = threading.Lock()
+
+    def get_profiler(self, context):
+        """
+        Return the profiler of `context`, creating it if needed.
+
+        Adding functions to a new profiler changes their code objects, so
+        the profiler must exist before a generator or coroutine is created
+        to see it run.
+        """
+        profiler = self._profilers.get(context)
+        if profiler is not None:
+            return profiler
+        with self._lock:
+            profiler = self._profilers.get(context)
+            if profiler is None:
+                profiler = line_profiler.LineProfiler()
+                for func in self.functions:
+                    profiler.add_function(func)
+                self._profilers[context] = profiler
+        return profiler
+
+    def add_function(self, func):
+        with self._lock:
+            self.functions.append(func)
+            for profiler in self._profilers.values():
+                profiler.add_function(func)
+
+    def __call__(self, func):
+        self.add_function(func)
+        if inspect.iscoroutinefunction(func):
+            return self.wrap_coroutine(func)
+        if inspect.isgeneratorfunction(func):
+            return self.wrap_generator(func)
+        return self.wrap_function(func)
+
+    def wrap_function(self, func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwds):
+            profiler = self.get_profiler(get_context())
+            profiler.enable_by_count()
+            try:
+                return func(*args, **kwds)
+            finally:
+                profiler.disable_by_count()
+        return wrapper
+
+    def wrap_generator(self, func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwds):
+            self.get_profiler(get_context())
+            gen = func(*args, **kwds)
+            value, error = None, None
+            while True:
+                # Generators can be resumed from any context
+                profiler = self.get_profiler(get_context())
+                profiler.enable_by_count()
+                try:
+                    if error is None:
+                        item = gen.send(value)
+                    else:
+                        item = gen.throw(error)
+                except StopIteration as stop:
+                    return stop.value
+                finally:
+                    profiler.disable_by_count()
+                try:
+                    value, error = (yield item), None
+                except BaseException as exc:
+                    value, error = None, exc
+        return wrapper
+
+    def wrap_coroutine(self, func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwds):
+            context = get_context()
+            profiler = self.get_profiler(context)
+            return await self._drive(func(*args, **kwds), profiler, context)
+        return wrapper
+
+    @types.coroutine
+    def _drive(self, coro, profiler, context):
+        """
+        Run `coro`, profiling it only while it executes.
+
+        The profiler is disabled while the coroutine is suspended, when
+        the time spent is added to the suspended time of its line.
+        """
+        code = coro.cr_code
+        value, error = None, None
+        while True:
+            profiler.enable_by_count()
+            try:
+                if error is None:
+                    item = coro.send(value)
+                else:
+                    item = coro.throw(error)
+            except StopIteration as stop:
+                return stop.value
+            finally:
+                profiler.disable_by_count()
+            frame = coro.cr_frame
+            line_no = frame.f_lineno if frame is not None else None
+            start = time.perf_counter()
+            try:
+                value, error = (yield item), None
+            except BaseException as exc:
+                value, error = None, exc
+            if line_no is not None:
+                self._add_suspended(
+                    context,
+                    (code.co_filename, code.co_firstlineno, line_no),
+                    time.perf_counter() - start)
+
+    def _add_suspended(self, context, key, seconds):
+        with self._lock:
+            suspended = self._suspended.setdefault(context, {})
+            suspended[key] = suspended.get(key, 0.0) + seconds
+
+    def get_contexts(self):
+        """
+        Return the statistics of each context, as saved in breakdown
+        files.
+        """
+        with self._lock:
+            profilers = list(self._profilers.items())
+            suspended = {context: dict(times)
+                         for context, times in self._suspended.items()}
+        contexts = []
+        for (thread, task), profiler in profilers:
+            stats = profiler.get_stats()
+            if not any(stats.timings.values()):
+                continue
+            contexts.append({
+                'thread': thread,
+                'task': task,
+                'stats': stats,
+                'suspended': suspended.get((thread, task), {}),
+            })
+        return contexts
+
+    def get_stats(self):
+        """Return the statistics of all contexts together."""
+        totals = {}
+        unit = None
+        with self._lock:
+            profilers = list(self._profilers.values())
+        for profiler in profilers:
+            stats = profiler.get_stats()
+            unit = stats.unit
+            for func_info, line_stats in stats.timings.items():
+                func_totals = totals.setdefault(func_info, {})
+                for line_no, hits, line_time in line_stats:
+                    old_hits, old_time = func_totals.get(line_no, (0, 0))
+                    func_totals[line_no] = (old_hits + hits,
+                                            old_time + line_time)
+        if unit is None:
+            unit = line_profiler.LineProfiler().get_stats().unit
+        timings = {
+            func_info: [(line_no, hits, line_time)
+                        for line_no, (hits, line_time)
+                        in sorted(func_totals.items())]
+            for func_info, func_totals in totals.items()}
+        return line_profiler.LineStats(timings, unit)
+
+    def dump_stats(self, filename):
+        with open(filename, 'wb') as f:
+            pickle.dump(self.get_stats(), f, pickle.HIGHEST_PROTOCOL)
+
+    def dump_breakdown(self, filename):
+        """Save the statistics of each context to `filename`."""
+        tmp_filename = filename + '.tmp'
+        with open(tmp_filename, 'wb') as f:
+            pickle.dump(self.get_contexts(), f, pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_filename, filename)
+
+    def print_stats(self, stream=None):
+        stats = self.get_stats()
+        line_profiler.show_text(stats.timings, stats.unit, stream=stream)
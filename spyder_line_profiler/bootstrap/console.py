@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+#
+# -----------------------------------------------------------------------------
+# Copyright (c) 2013- Spyder Project Contributors
+#
+# Released under the terms of the MIT License
+# (see LICENSE.txt in the project root directory for details)
+# -----------------------------------------------------------------------------
+
+"""
+Line profiling of a statement in the namespace of a running console.
+
+This is loaded by path in the kernel of an IPython console, like the
+``%lprun`` magic of line_profiler, so that the data of the console can
+be used without being loaded again. The functions to profile are given
+as expressions evaluated in the namespace of the console.
+
+Results are stored in the namespace, under a name given by Spyder, as a
+dict with the ``timings`` and ``unit`` of the statistics, laid out like
+those of line_profiler but with lists instead of tuples, and the
+``error`` raised by the statement (a formatted traceback) or None. They
+are then sent to Spyder as they are, through the comm of the kernel.
+"""
+
+# Standard library imports
+import inspect
+import traceback
+
+# Third party imports
+import line_profiler
+
+
+def get_functions(obj):
+    """Return the functions to profile for `obj`."""
+    if isinstance(obj, (staticmethod, classmethod)):
+        obj = obj.__func__
+    elif isinstance(obj, property):
+        obj = obj.fget
+    if inspect.ismethod(obj):
+        obj = obj.__func__
+    if inspect.isclass(obj):
+        return [func for value in vars(obj).values()
+                for func in get_functions(value)
+                if not inspect.isclass(value)]
+    obj = inspect.unwrap(obj)
+    if inspect.isfunction(obj):
+        return [obj]
+    return []
+
+
+def profile_statement(statement, expressions, namespace):
+    """
+    Run `statement` in `namespace`, profiling the functions of
+    `expressions`.
+
+    Returns the results, as described above. The statement can be
+    interrupted, which gives the results collected so far.
+    """
+    profiler = line_profiler.LineProfiler()
+    errors = []
+    for expression in expressions:
+        try:
+            functions = get_functions(eval(expression, namespace))
+        except Exception as error:
+            errors.append('Could not evaluate {}: {}'.format(
+                expression, error))
+            continue
+        if not functions:
+            errors.append('No function to profile in {}'.format(expression))
+        for func in functions:
+            profiler.add_function(func)
+
+    if not errors:
+        code = compile(statement, '<console>', 'exec')
+        profiler.enable_by_count()
+        try:
+            exec(code, namespace)
+        except BaseException:
+            errors.append(traceback.format_exc())
+        finally:
+            profiler.disable_by_count()
+
+    stats = profiler.get_stats()
+    return {
+        'timings': {func_info: [list(line) for line in lines]
+                    for func_info, lines in stats.timings.items()},
+        'unit': stats.unit,
+        'error': '\n'.join(errors) or None,
+    }
+
+
+def run_request(statement, expressions, namespace, name):
+    """Profile `statement`, storing the results in `namespace[name]`."""
+    namespace[name] = profile_statement(statement, expressions, namespace)
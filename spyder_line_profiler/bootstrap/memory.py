@@ -0,0 +1,200 @@
+# -*- coding: utf-8 -*-
+#
+# -----------------------------------------------------------------------------
+# Copyright (c) 2013- Spyder Project Contributors
+#
+# Released under the terms of the MIT License
+# (see LICENSE.txt in the project root directory for details)
+# -----------------------------------------------------------------------------
+
+"""
+Line profiling of the memory allocated by each line, as well as its time.
+
+Lines of profiled functions are traced with sys.settrace, as done by
+memory_profiler, and tracemalloc gives the memory allocated by Python
+when each line starts and ends. For each line, the net memory it
+allocated is summed over its hits, and its peak is the most memory it
+used above what was allocated when it started. Like times, these include
+the functions the line calls.
+
+Tracing and tracemalloc slow down the profiled code, which inflates
+times, so this is meant to find the lines that allocate rather than to
+time them precisely. Memory is that of the whole process, so lines
+running at the same time in other threads contribute to it. Each thread
+keeps its own lines being run, and peaks measured in a thread, when its
+lines start and end, are only charged to those lines. As measuring the
+peak resets it, a peak reached while several threads run lines is only
+charged to the lines of the first thread measuring it.
+
+Statistics are laid out like those of line_profiler, with a ``memory``
+attribute mapping the (filename, first line, function name) of each
+function to the (line, net bytes, peak bytes) of its lines.
+"""
+
+# Standard library imports
+import pickle
+import sys
+import threading
+import time
+import tracemalloc
+import types
+
+# Third party imports
+import line_profiler
+
+UNIT = 1e-9  # Unit of times in the statistics, in seconds
+
+# Not available before Python 3.9, peaks are then only measured when
+# lines start and end
+reset_peak = getattr(tracemalloc, 'reset_peak', None)
+
+
+class _Line:
+    """A line being run, with the time and memory when it started."""
+    __slots__ = ('line_no', 'start_time', 'start_memory', 'peak')
+
+    def __init__(self, line_no, memory):
+        self.line_no = line_no
+        self.start_memory = memory
+        self.peak = memory
+        self.start_time = time.perf_counter_ns()
+
+
+class MemoryProfiler:
+    """
+    Profiler tracing the time and memory of the lines of functions.
+
+    It is used like a LineProfiler, as the ``profile`` decorator, but
+    only traces the threads where it is enabled, with `enable_by_count`.
+    Functions are then traced wherever they are called from, which also
+    covers generators and coroutines resumed later.
+    """
+
+    def __init__(self):
+        self.functions = []
+        self._codes = {}    # Code: (filename, first line, name)
+        self._lines = {}    # (filename, first line, name): {line: stats}
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    def add_function(self, func):
+        code = func.__code__
+        # Qualified names, as line_profiler >= 4.2 gives them
+        name = getattr(code, 'co_qualname', code.co_name)
+        with self._lock:
+            self.functions.append(func)
+            self._codes[code] = (code.co_filename, code.co_firstlineno, name)
+
+    def __call__(self, func):
+        self.add_function(func)
+        return func
+
+    def enable_by_count(self):
+        """Trace the current thread, if it was not already."""
+        count = getattr(self._local, 'count', 0)
+        if count == 0:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+            self._local.previous = sys.gettrace()
+            sys.settrace(self._trace)
+        self._local.count = count + 1
+
+    def disable_by_count(self):
+        count = getattr(self._local, 'count', 0)
+        if count == 0:
+            return
+        self._local.count = count - 1
+        if count == 1:
+            sys.settrace(self._local.previous)
+
+    def _get_running(self):
+        """Return the lines run by the current thread, innermost last."""
+        running = getattr(self._local, 'running', None)
+        if running is None:
+            running = self._local.running = []
+        return running
+
+    def _checkpoint(self):
+        """
+        Return the memory in use, updating the peaks of the lines run by
+        the current thread.
+        """
+        memory, peak = tracemalloc.get_traced_memory()
+        running = self._get_running()
+        if reset_peak is not None:
+            for line in running:
+                if peak > line.peak:
+                    line.peak = peak
+            reset_peak()
+        else:
+            for line in running:
+                if memory > line.peak:
+                    line.peak = memory
+        return memory
+
+    def _trace(self, frame, event, arg):
+        if event != 'call':
+            return None
+        func_info = self._codes.get(frame.f_code)
+        if func_info is None:
+            return None
+        current = [None]  # Line of this frame being run
+
+        def trace_lines(frame, event, arg):
+            if event == 'line' or event == 'return':
+                memory = self._checkpoint()
+                line = current[0]
+                if line is not None:
+                    self._end_line(func_info, line, memory)
+                    current[0] = None
+                if event == 'line':
+                    line = _Line(frame.f_lineno, memory)
+                    self._get_running().append(line)
+                    current[0] = line
+            return trace_lines
+
+        return trace_lines
+
+    def _end_line(self, func_info, line, memory):
+        elapsed = time.perf_counter_ns() - line.start_time
+        try:
+            self._get_running().remove(line)
+        except ValueError:
+            pass
+        with self._lock:
+            lines = self._lines.setdefault(func_info, {})
+            hits, total_time, net, peak = lines.get(
+                line.line_no, (0, 0, 0, 0))
+            lines[line.line_no] = (
+                hits + 1, total_time + elapsed,
+                net + memory - line.start_memory,
+                max(peak, line.peak - line.start_memory))
+
+    def get_stats(self):
+        """Return the statistics collected so far."""
+        with self._lock:
+            timings = {}
+            memory = {}
+            for func_info, lines in self._lines.items():
+                timings[func_info] = [
+                    (line_no, hits, total_time)
+                    for line_no, (hits, total_time, _net, _peak)
+                    in sorted(lines.items())]
+                memory[func_info] = [
+                    (line_no, net, peak)
+                    for line_no, (_hits, _time, net, peak)
+                    in sorted(lines.items())]
+            for func_info in self._codes.values():
+                timings.setdefault(func_info, [])
+        # A plain namespace, as the module of any other class may not be
+        # importable where the statistics are loaded
+        return types.SimpleNamespace(timings=timings, unit=UNIT,
+                                     memory=memory)
+
+    def dump_stats(self, filename):
+        with open(filename, 'wb') as f:
+            pickle.dump(self.get_stats(), f, pickle.HIGHEST_PROTOCOL)
+
+    def print_stats(self, stream=None):
+        stats = self.get_stats()
+        line_profiler.show_text(stats.timings, stats.unit, stream=stream)
@@ -0,0 +1,231 @@
+# -*- coding: utf-8 -*-
+#
+# -----------------------------------------------------------------------------
+# Copyright (c) 2013- Spyder Project Contributors
+#
+# Released under the terms of the MIT License
+# (see LICENSE.txt in the project root directory for details)
+# -----------------------------------------------------------------------------
+
+"""
+Run a script under line_profiler, like ``kernprof -lvb -o OUTFILE``.
+
+In addition to what kernprof does, the statistics collected so far can
+be written periodically to a snapshot file while the script is running,
+so that they can be displayed before profiling finishes. The child
+processes of the script can also be profiled, each writing its own
+statistics to a directory (see shards.py), and statistics can be broken
+down by thread and asyncio task (see breakdown.py). Functions can be
+profiled without decorators by naming them as targets (see targets.py),
+lines can be sampled instead of traced (see sampler.py) and the memory
+allocated by each line can be profiled (see memory.py).
+
+Usage::
+
+    python runner.py -o OUTFILE [--snapshot FILE] [--interval SECONDS]
+                     [--children DIRECTORY] [--breakdown FILE]
+                     [--target TARGET ...] [--sampling SECONDS]
+                     [--memory] script.py [script arguments]
+"""
+
+# Standard library imports
+import argparse
+import importlib.util
+import os
+import os.path as osp
+import pickle
+import sys
+import threading
+import types
+
+# Third party imports
+import line_profiler
+
+
+def dump_stats(stats, filename):
+    """
+    Pickle `stats` to `filename`.
+
+    The data is first written to a temporary file which then replaces
+    `filename`, so that readers never see a partially written file.
+    """
+    tmp_filename = filename + '.tmp'
+    with open(tmp_filename, 'wb') as f:
+        pickle.dump(stats, f, pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_filename, filename)
+
+
+class SnapshotWriter(threading.Thread):
+    """Thread writing the statistics of a profiler at regular intervals."""
+
+    def __init__(self, profiler, filename, interval):
+        super().__init__(name='lineprofiler-snapshot', daemon=True)
+        self.profiler = profiler
+        self.filename = filename
+        self.interval = interval
+        self._stopped = threading.Event()
+
+    def run(self):
+        while not self._stopped.wait(self.interval):
+            self.write()
+
+    def write(self):
+        try:
+            dump_stats(self.profiler.get_stats(), self.filename)
+        except Exception as error:
+            # Never let a failing snapshot interrupt the profiled script
+            print(f'Could not write snapshot: {error}', file=sys.stderr)
+
+    def stop(self):
+        self._stopped.set()
+
+
+def load_module(name, path):
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+# Not imported by name, which could clash with the modules of the script
+shards = load_module(
+    '_spyder_line_profiler_shards',
+    osp.join(osp.dirname(osp.abspath(__file__)), 'shards.py'))
+breakdown = load_module(
+    '_spyder_line_profiler_breakdown',
+    osp.join(osp.dirname(osp.abspath(__file__)), 'breakdown.py'))
+targets = load_module(
+    '_spyder_line_profiler_targets',
+    osp.join(osp.dirname(osp.abspath(__file__)), 'targets.py'))
+sampler = load_module(
+    '_spyder_line_profiler_sampler',
+    osp.join(osp.dirname(osp.abspath(__file__)), 'sampler.py'))
+memory = load_module(
+    '_spyder_line_profiler_memory',
+    osp.join(osp.dirname(osp.abspath(__file__)), 'memory.py'))
+
+
+def execfile(filename, namespace, instrumenter=None):
+    """
+    Execute the Python file `filename` in `namespace`.
+
+    Its targeted functions are profiled if an `instrumenter` is given.
+    """
+    with open(filename, 'rb') as f:
+        code = compile(f.read(), filename, 'exec')
+    if instrumenter is not None:
+        code = instrumenter.instrument(code, '__main__', filename)
+    exec(code, namespace, namespace)
+
+
+def run_script(profiler, script, args, instrumenter=None):
+    """Run `script` with command line arguments `args` as __main__."""
+    script = osp.abspath(script)
+    sys.argv = [script] + list(args)
+
+    # The script directory replaces the bootstrap one in sys.path
+    sys.path[0] = osp.dirname(script)
+
+    # The script replaces this module as __main__, so that its functions
+    # can be pickled by reference, as multiprocessing does
+    main_module = types.ModuleType('__main__')
+    main_module.__file__ = script
+    sys.modules['__main__'] = main_module
+    execfile(script, main_module.__dict__, instrumenter)
+
+
+def get_parser():
+    parser = argparse.ArgumentParser(
+        description='Run a script under line_profiler.')
+    parser.add_argument('-o', '--outfile', required=True,
+                        help='File where the final results are saved.')
+    parser.add_argument('--snapshot', default=None,
+                        help='File where partial results are saved.')
+    parser.add_argument('--interval', type=float, default=2.0,
+                        help='Seconds between two partial results.')
+    parser.add_argument('--children', default=None,
+                        help='Directory where child processes save their '
+                             'results, if they are profiled.')
+    parser.add_argument('--breakdown', default=None,
+                        help='File where the results of each thread and '
+                             'asyncio task are saved.')
+    parser.add_argument('--target', action='append', default=[],
+                        help='Module, file or functions to profile without '
+                             'decorators, as MODULE_OR_FILE[:PATTERN]. Can '
+                             'be given several times.')
+    parser.add_argument('--sampling', type=float, default=None,
+                        metavar='SECONDS',
+                        help='Sample the running lines at this interval '
+                             'instead of timing every line.')
+    parser.add_argument('--memory', action='store_true',
+                        help='Also profile the memory allocated by each '
+                             'line.')
+    parser.add_argument('script', help='Script to profile.')
+    parser.add_argument('args', nargs=argparse.REMAINDER,
+                        help='Arguments passed to the script.')
+    return parser
+
+
+def main(argv=None):
+    parser = get_parser()
+    options = parser.parse_args(argv)
+    if options.breakdown and options.target:
+        parser.error('--breakdown cannot be used with --target')
+    if options.sampling is not None and (options.breakdown
+                                         or options.children):
+        parser.error('--sampling cannot be used with --breakdown or '
+                     '--children')
+    if options.memory and (options.sampling is not None or options.breakdown
+                           or options.children):
+        parser.error('--memory cannot be used with --sampling, --breakdown '
+                     'or --children')
+    if options.memory:
+        profiler = memory.MemoryProfiler()
+    elif options.sampling is not None:
+        profiler = sampler.SamplingProfiler(max(options.sampling, 1e-4))
+    elif options.breakdown:
+        profiler = breakdown.ContextProfiler()
+    else:
+        profiler = line_profiler.LineProfiler()
+    shards.install_profiler(profiler)
+    if options.children:
+        os.makedirs(options.children, exist_ok=True)
+        shards.profile_children(profiler, options.children)
+
+    writer = None
+    if options.snapshot:
+        writer = SnapshotWriter(
+            profiler, options.snapshot, max(options.interval, 0.1))
+        writer.start()
+
+    instrumenter = None
+    if options.target:
+        instrumenter = targets.Instrumenter(profiler, options.target)
+        instrumenter.install()
+    # Targets have no decorator enabling the profiler when called, and
+    # the decorators of the memory profiler don't enable it
+    enable_all = bool(options.target) or options.memory
+    if enable_all:
+        profiler.enable_by_count()
+        targets.profile_threads(profiler)
+
+    if options.sampling is not None:
+        profiler.start()
+    try:
+        run_script(profiler, options.script, options.args, instrumenter)
+    finally:
+        if options.sampling is not None:
+            profiler.stop()
+        if enable_all:
+            profiler.disable_by_count()
+        if writer is not None:
+            writer.stop()
+        profiler.dump_stats(options.outfile)
+        if options.breakdown:
+            profiler.dump_breakdown(options.breakdown)
+        print(f'Wrote profile results to {options.outfile}')
+        profiler.print_stats()
+
+
+if __name__ == '__main__':
+    main()
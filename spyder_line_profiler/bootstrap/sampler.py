@@ -0,0 +1,154 @@
+# -*- coding: utf-8 -*-
+#
+# -----------------------------------------------------------------------------
+# Copyright (c) 2013- Spyder Project Contributors
+#
+# Released under the terms of the MIT License
+# (see LICENSE.txt in the project root directory for details)
+# -----------------------------------------------------------------------------
+
+"""
+Statistical line profiling, with a low overhead.
+
+Instead of timing every line that runs, as line_profiler does, a thread
+wakes up at regular intervals and looks at the line each thread of the
+script is running. Each profiled function on the stack of a thread gets
+a sample for its current line, which is charged with the time elapsed
+since the previous sample. Like with line_profiler, the time of a line
+thus includes that of the functions it calls.
+
+Profiled functions run unchanged, so that tight loops are not slowed
+down, but lines that take less time than the interval between samples
+may be missed. Statistics are laid out like those of line_profiler,
+with the number of samples instead of hits, and have a ``sampled``
+attribute set to True.
+"""
+
+# Standard library imports
+import pickle
+import sys
+import threading
+import time
+import types
+
+# Third party imports
+import line_profiler
+
+UNIT = 1e-9  # Unit of times in the statistics, in seconds
+
+
+class SamplingProfiler:
+    """
+    Profiler sampling the lines run by the profiled functions.
+
+    It is used like a LineProfiler, as the ``profile`` decorator, but
+    only collects samples between calls to `start` and `stop`.
+    """
+
+    def __init__(self, interval=0.001):
+        self.interval = interval
+        self.functions = []
+        self._codes = {}     # Code: (filename, first line, name)
+        self._samples = {}   # (filename, first line, name): {line: [n, t]}
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stopped = threading.Event()
+        self._switch_interval = None
+
+    def add_function(self, func):
+        code = func.__code__
+        # Qualified names, as line_profiler >= 4.2 gives them
+        name = getattr(code, 'co_qualname', code.co_name)
+        with self._lock:
+            self.functions.append(func)
+            self._codes[code] = (code.co_filename, code.co_firstlineno, name)
+
+    def __call__(self, func):
+        self.add_function(func)
+        return func
+
+    def enable_by_count(self):
+        """Do nothing, as functions are always sampled."""
+
+    def disable_by_count(self):
+        """Do nothing, as functions are always sampled."""
+
+    def start(self):
+        """Start sampling in a background thread."""
+        # The sampling thread waits for the GIL at most this long before
+        # taking a sample of threads running Python code
+        self._switch_interval = sys.getswitchinterval()
+        sys.setswitchinterval(min(self._switch_interval, self.interval))
+        self._stopped.clear()
+        self._thread = threading.Thread(
+            target=self._run, name='lineprofiler-sampler', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop sampling, waiting for the sampling thread to finish."""
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        if self._switch_interval is not None:
+            sys.setswitchinterval(self._switch_interval)
+            self._switch_interval = None
+
+    def _run(self):
+        own_id = threading.get_ident()
+        last = time.perf_counter()
+        while not self._stopped.wait(self.interval):
+            now = time.perf_counter()
+            # The time since the last sample, which can be longer than the
+            # interval when other threads hold the GIL
+            self.sample(sys._current_frames(), now - last, own_id)
+            last = now
+
+    def sample(self, frames, elapsed, own_id=None):
+        """
+        Record a sample of the lines of `frames`, taking `elapsed` seconds.
+
+        `frames` maps thread ids to their current frame, as given by
+        sys._current_frames(). The thread `own_id` is not sampled.
+        """
+        codes = self._codes
+        with self._lock:
+            for thread_id, frame in frames.items():
+                if thread_id == own_id:
+                    continue
+                seen = set()
+                while frame is not None:
+                    func_info = codes.get(frame.f_code)
+                    if func_info is not None:
+                        key = (func_info, frame.f_lineno)
+                        # Recursive calls are sampled once
+                        if key not in seen:
+                            seen.add(key)
+                            line = self._samples.setdefault(
+                                func_info, {}).setdefault(
+                                    frame.f_lineno, [0, 0.0])
+                            line[0] += 1
+                            line[1] += elapsed
+                    frame = frame.f_back
+
+    def get_stats(self):
+        """Return the statistics collected so far."""
+        with self._lock:
+            timings = {
+                func_info: [(line_no, count, round(seconds / UNIT))
+                            for line_no, (count, seconds)
+                            in sorted(lines.items())]
+                for func_info, lines in self._samples.items()}
+            for func_info in self._codes.values():
+                timings.setdefault(func_info, [])
+        # A plain namespace, as the module of any other class may not be
+        # importable where the statistics are loaded
+        return types.SimpleNamespace(timings=timings, unit=UNIT, sampled=True)
+
+    def dump_stats(self, filename):
+        with open(filename, 'wb') as f:
+            pickle.dump(self.get_stats(), f, pickle.HIGHEST_PROTOCOL)
+
+    def print_stats(self, stream=None):
+        stats = self.get_stats()
+        line_profiler.show_text(stats.timings, stats.unit, stream=stream)
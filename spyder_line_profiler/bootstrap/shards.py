@@ -0,0 +1,171 @@
+# -*- coding: utf-8 -*-
+#
+# -----------------------------------------------------------------------------
+# Copyright (c) 2013- Spyder Project Contributors
+#
+# Released under the terms of the MIT License
+# (see LICENSE.txt in the project root directory for details)
+# -----------------------------------------------------------------------------
+
+"""
+Line profiling of the child processes of a profiled script.
+
+Children started by spawning a new interpreter (``multiprocessing`` with
+the spawn or forkserver methods, ``subprocess``) find the directory
+SITE_DIR in their ``PYTHONPATH``, whose ``sitecustomize`` module calls
+`start_child`. Children started by forking get their own profiler from
+the hook installed by `profile_forks`. Each child then writes the
+statistics it collected to a shard file in the directory given by the
+ENV_VAR environment variable when it exits, named after its process id.
+
+Shards are pickled dicts with the ``pid`` and ``name`` of the process
+and its ``stats``.
+"""
+
+# Standard library imports
+import atexit
+import builtins
+import os
+import os.path as osp
+import pickle
+import signal
+import sys
+import threading
+
+# Third party imports
+import line_profiler
+
+ENV_VAR = 'SPYDER_LINE_PROFILER_SHARDS'
+
+SITE_DIR = osp.join(osp.dirname(osp.abspath(__file__)), 'site')
+
+
+def install_profiler(profiler):
+    """Make `profiler` available to the profiled code."""
+    builtins.__dict__['profile'] = profiler
+
+    # Also activate `from line_profiler import profile`, as kernprof does
+    explicit_profiler = getattr(line_profiler, 'profile', None)
+    overwrite = getattr(explicit_profiler, '_kernprof_overwrite', None)
+    if overwrite is not None:
+        overwrite(profiler)
+
+
+def subtract_stats(stats, baseline):
+    """
+    Return the timings in `stats` that are not in `baseline`.
+
+    Both are statistics of the same profiler, `baseline` being taken
+    earlier. Lines whose timings did not change are dropped.
+    """
+    timings = {}
+    for func_info, line_stats in stats.timings.items():
+        before = {line_no: (hits, time) for line_no, hits, time
+                  in baseline.timings.get(func_info, [])}
+        func_timings = []
+        for line_no, hits, time in line_stats:
+            old_hits, old_time = before.get(line_no, (0, 0))
+            if hits > old_hits:
+                func_timings.append((line_no, hits - old_hits,
+                                     time - old_time))
+        if func_timings:
+            timings[func_info] = func_timings
+    return type(stats)(timings, stats.unit)
+
+
+class ShardWriter:
+    """Write the statistics of a child process when it exits."""
+
+    def __init__(self, profiler, directory, baseline=None):
+        self.profiler = profiler
+        self.directory = directory
+        self.baseline = baseline
+        self.pid = os.getpid()
+
+    def register(self):
+        """Write the shard on exit, including termination by SIGTERM."""
+        atexit.register(self.write)
+
+        # Children of multiprocessing which were forked exit without
+        # running atexit callbacks, but run its own finalizers. These are
+        # cleared when the child starts, so they are set again then.
+        mp_util = sys.modules.get('multiprocessing.util')
+        if mp_util is not None:
+            self._finalize_on_exit()
+            mp_util.register_after_fork(self, ShardWriter._finalize_on_exit)
+
+        # Pools terminate their workers
+        if threading.current_thread() is threading.main_thread():
+            try:
+                signal.signal(signal.SIGTERM, self._on_sigterm)
+            except (ValueError, OSError):
+                pass
+
+    def write(self):
+        # Forked children inherit the writers of their parent
+        if os.getpid() != self.pid:
+            return
+        stats = self.profiler.get_stats()
+        if self.baseline is not None:
+            stats = subtract_stats(stats, self.baseline)
+        if not any(stats.timings.values()):
+            return
+        mp = sys.modules.get('multiprocessing')
+        name = mp.current_process().name if mp is not None else 'Process'
+        filename = osp.join(self.directory, '{}.lprof'.format(self.pid))
+        tmp_filename = filename + '.tmp'
+        try:
+            with open(tmp_filename, 'wb') as f:
+                pickle.dump({'pid': self.pid, 'name': name, 'stats': stats},
+                            f, pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_filename, filename)
+        except OSError as error:
+            print(f'Could not write profiling results of process '
+                  f'{self.pid}: {error}', file=sys.stderr)
+
+    def _finalize_on_exit(self):
+        sys.modules['multiprocessing.util'].Finalize(
+            None, self.write, exitpriority=-100)
+
+    def _on_sigterm(self, signum, frame):
+        self.write()
+        signal.signal(signum, signal.SIG_DFL)
+        os.kill(os.getpid(), signum)
+
+
+def profile_forks(profiler, directory):
+    """Write the statistics of the children forked from this process."""
+    if not hasattr(os, 'register_at_fork'):
+        return
+
+    def after_in_child():
+        # The child starts with a copy of the statistics of its parent
+        ShardWriter(profiler, directory,
+                    baseline=profiler.get_stats()).register()
+
+    os.register_at_fork(after_in_child=after_in_child)
+
+
+def profile_children(profiler, directory):
+    """
+    Profile the children of this process, writing shards to `directory`.
+
+    `profiler` is the one of this process, shared with forked children.
+    """
+    os.environ[ENV_VAR] = directory
+    python_path = os.environ.get('PYTHONPATH')
+    os.environ['PYTHONPATH'] = (
+        SITE_DIR if not python_path
+        else os.pathsep.join([SITE_DIR, python_path]))
+    profile_forks(profiler, directory)
+
+
+def start_child():
+    """Profile this process if its parent asked for it."""
+    directory = os.environ.get(ENV_VAR)
+    if not directory:
+        return
+    profiler = line_profiler.LineProfiler()
+    install_profiler(profiler)
+    ShardWriter(profiler, directory).register()
+    profile_forks(profiler, directory)
@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+#
+# -----------------------------------------------------------------------------
+# Copyright (c) 2013- Spyder Project Contributors
+#
+# Released under the terms of the MIT License
+# (see LICENSE.txt in the project root directory for details)
+# -----------------------------------------------------------------------------
+
+"""
+Start line profiling in the children of a profiled script.
+
+This module is imported by the site module of the children, as its
+directory is first in their PYTHONPATH.
+"""
+
+# Standard library imports
+import importlib.machinery
+import importlib.util
+import os
+import os.path as osp
+import sys
+
+SITE_DIR = osp.dirname(osp.abspath(__file__))
+
+
+def load_module(name, path):
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def run_shadowed_sitecustomize():
+    """Run the sitecustomize module that this one hides, if any."""
+    path = [entry for entry in sys.path
+            if osp.abspath(entry or os.getcwd()) != SITE_DIR]
+    spec = importlib.machinery.PathFinder.find_spec('sitecustomize', path)
+    if spec is not None and spec.loader is not None:
+        spec.loader.exec_module(importlib.util.module_from_spec(spec))
+
+
+try:
+    load_module('_spyder_line_profiler_shards',
+                osp.join(osp.dirname(SITE_DIR), 'shards.py')).start_child()
+except Exception as error:
+    # Never prevent the child from running
+    print(f'Could not start line profiling: {error}', file=sys.stderr)
+
+run_shadowed_sitecustomize()
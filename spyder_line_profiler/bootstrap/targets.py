@@ -0,0 +1,215 @@
+# -*- coding: utf-8 -*-
+#
+# -----------------------------------------------------------------------------
+# Copyright (c) 2013- Spyder Project Contributors
+#
+# Released under the terms of the MIT License
+# (see LICENSE.txt in the project root directory for details)
+# -----------------------------------------------------------------------------
+
+"""
+Line profiling of functions named on the command line, without decorators.
+
+Targets are given as ``WHERE[:PATTERN]``, where WHERE is a module name
+(which includes its submodules) or the path of a Python file, and PATTERN
+is a glob matched against the qualified names of the functions defined
+there, such as ``Model`` (all the methods of a class), ``Model.fit`` or
+``solve_*``. All functions match if there is no pattern.
+
+The code of target modules is registered with the profiler when it is
+imported, before it runs, so that every function, method and nested
+function is profiled from its first call on.
+"""
+
+# Standard library imports
+import fnmatch
+import importlib.abc
+import inspect
+import os
+import os.path as osp
+import sys
+import threading
+import types
+
+# Flags of the code of functions, as opposed to that of classes and modules
+FUNCTION_FLAGS = inspect.CO_OPTIMIZED | inspect.CO_NEWLOCALS
+
+
+class Target:
+    """A module or file, and the functions to profile in it."""
+
+    def __init__(self, spec):
+        where, pattern = spec, '*'
+        head, sep, tail = spec.rpartition(':')
+        # Colons of Windows drives are not pattern separators
+        if sep and len(head) > 1 and '/' not in tail and '\\' not in tail:
+            where, pattern = head, tail or '*'
+        self.pattern = pattern
+        if where.endswith('.py') or '/' in where or os.sep in where:
+            self.filename = osp.normcase(osp.abspath(where))
+            self.module = None
+        else:
+            self.filename = None
+            self.module = where
+
+    def matches_module(self, name, filename):
+        """Whether the module `name` in `filename` is targeted."""
+        if self.module is not None:
+            return name == self.module or name.startswith(self.module + '.')
+        return (filename is not None
+                and osp.normcase(osp.abspath(filename)) == self.filename)
+
+    def matches_function(self, qualname):
+        """
+        Whether the function `qualname` is targeted.
+
+        Functions also match if they are defined in a class or function
+        that matches, such as methods of a targeted class.
+        """
+        parts = qualname.split('.')
+        return any(
+            fnmatch.fnmatchcase('.'.join(parts[:length]), self.pattern)
+            for length in range(1, len(parts) + 1))
+
+
+class Instrumenter:
+    """Register the code of targeted functions with a profiler."""
+
+    def __init__(self, profiler, specs):
+        self.profiler = profiler
+        self.targets = [Target(spec) for spec in specs]
+
+    def get_targets(self, name, filename):
+        return [target for target in self.targets
+                if target.matches_module(name, filename)]
+
+    def instrument(self, code, name, filename):
+        """
+        Register the targeted functions of the code of module `name`.
+
+        Returns the code to run instead of `code`, as registering code
+        with line_profiler can change it.
+        """
+        targets = self.get_targets(name, filename)
+        if not targets:
+            return code
+        return self._instrument_code(code, '', targets)
+
+    def _instrument_code(self, code, qualname, targets):
+        is_function = code.co_flags & FUNCTION_FLAGS == FUNCTION_FLAGS
+        consts = list(code.co_consts)
+        changed = False
+        for index, const in enumerate(consts):
+            if not isinstance(const, types.CodeType):
+                continue
+            if not qualname:
+                child_qualname = const.co_name
+            elif is_function:
+                child_qualname = qualname + '.<locals>.' + const.co_name
+            else:
+                child_qualname = qualname + '.' + const.co_name
+            new_const = self._instrument_code(const, child_qualname, targets)
+            if new_const is not const:
+                consts[index] = new_const
+                changed = True
+        if changed:
+            code = code.replace(co_consts=tuple(consts))
+
+        # Lambdas and comprehensions are timed as part of their line
+        if (is_function and qualname and not code.co_name.startswith('<')
+                and any(target.matches_function(qualname)
+                        for target in targets)):
+            # Profilers only accept functions, whose code they may replace
+            func = types.FunctionType(
+                code, {}, closure=tuple(
+                    types.CellType() for _name in code.co_freevars))
+            self.profiler.add_function(func)
+            code = func.__code__
+        return code
+
+    def instrument_loaded(self, module):
+        """Register the targeted functions of an already loaded module."""
+        targets = self.get_targets(
+            module.__name__, getattr(module, '__file__', None))
+        if targets:
+            self._instrument_namespace(module, module.__name__, targets,
+                                       set())
+
+    def _instrument_namespace(self, namespace, module_name, targets, seen):
+        for value in list(vars(namespace).values()):
+            if isinstance(value, (staticmethod, classmethod)):
+                value = value.__func__
+            elif isinstance(value, property):
+                value = value.fget
+            if id(value) in seen:
+                continue
+            if (isinstance(value, type)
+                    and value.__module__ == module_name):
+                seen.add(id(value))
+                self._instrument_namespace(value, module_name, targets,
+                                           seen)
+            elif (isinstance(value, types.FunctionType)
+                  and value.__module__ == module_name
+                  and any(target.matches_function(value.__qualname__)
+                          for target in targets)):
+                seen.add(id(value))
+                self.profiler.add_function(value)
+
+    def install(self):
+        """Instrument target modules now, or when they are imported."""
+        for module in list(sys.modules.values()):
+            if isinstance(module, types.ModuleType):
+                self.instrument_loaded(module)
+        sys.meta_path.insert(0, TargetFinder(self))
+
+
+class TargetFinder(importlib.abc.MetaPathFinder):
+    """Import hook instrumenting target modules as they are imported."""
+
+    def __init__(self, instrumenter):
+        self.instrumenter = instrumenter
+
+    def find_spec(self, name, path, target=None):
+        for finder in sys.meta_path:
+            if finder is self or not hasattr(finder, 'find_spec'):
+                continue
+            spec = finder.find_spec(name, path, target)
+            if spec is not None:
+                break
+        else:
+            return None
+        if (hasattr(spec.loader, 'get_code')
+                and self.instrumenter.get_targets(name, spec.origin)):
+            spec.loader = TargetLoader(spec.loader, self.instrumenter)
+        return spec
+
+
+class TargetLoader(importlib.abc.Loader):
+    """Loader running the instrumented code of a module."""
+
+    def __init__(self, loader, instrumenter):
+        self.loader = loader
+        self.instrumenter = instrumenter
+
+    def __getattr__(self, name):
+        return getattr(self.loader, name)
+
+    def create_module(self, spec):
+        return self.loader.create_module(spec)
+
+    def exec_module(self, module):
+        code = self.loader.get_code(module.__name__)
+        if code is None:
+            return self.loader.exec_module(module)
+        code = self.instrumenter.instrument(
+            code, module.__name__, module.__spec__.origin)
+        exec(code, module.__dict__)
+
+
+def profile_threads(profiler):
+    """Enable `profiler` in the threads started from now on."""
+    def start_profiling(frame, event, arg):
+        sys.setprofile(None)
+        profiler.enable_by_count()
+
+    threading.setprofile(start_profiling)
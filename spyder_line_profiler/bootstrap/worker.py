@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+#
+# -----------------------------------------------------------------------------
+# Copyright (c) 2013- Spyder Project Contributors
+#
+# Released under the terms of the MIT License
+# (see LICENSE.txt in the project root directory for details)
+# -----------------------------------------------------------------------------
+
+"""
+Warm interpreter waiting to profile a script with runner.py.
+
+Spyder starts workers ahead of time, so that the interpreter, the
+runner and the modules given with ``--preload`` are already imported
+when a script is profiled. A worker then waits for a single job on its
+standard input: a line with the JSON object ``{"wdir": ..., "args":
+[...]}``, where ``args`` are the arguments of runner.py. The job is run
+in the worker, which then exits like the runner would have.
+
+If a module imported by the worker was changed, moved or deleted since
+then, the job is run by a new interpreter instead, so that the script
+never sees outdated code.
+
+Usage::
+
+    python worker.py [--preload MODULE ...]
+"""
+
+# Standard library imports
+import argparse
+import importlib
+import importlib.util
+import json
+import os
+import os.path as osp
+import subprocess
+import sys
+
+RUNNER_PATH = osp.join(osp.dirname(osp.abspath(__file__)), 'runner.py')
+
+
+def load_runner():
+    spec = importlib.util.spec_from_file_location(
+        '_spyder_line_profiler_runner', RUNNER_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def preload(names):
+    """Import the modules `names`, reporting those that fail."""
+    for name in names:
+        try:
+            importlib.import_module(name)
+        except Exception as error:
+            print(f'Could not preload {name}: {error}', file=sys.stderr)
+
+
+def get_module_files():
+    """Return the modification time of the file of each imported module."""
+    mtimes = {}
+    for module in list(sys.modules.values()):
+        filename = getattr(module, '__file__', None)
+        if not filename or filename in mtimes:
+            continue
+        try:
+            mtimes[filename] = os.stat(filename).st_mtime_ns
+        except OSError:
+            pass
+    return mtimes
+
+
+def is_outdated(mtimes):
+    """Whether a file of `mtimes` was changed since it was imported."""
+    for filename, mtime in mtimes.items():
+        try:
+            if os.stat(filename).st_mtime_ns != mtime:
+                return True
+        except OSError:
+            return True
+    return False
+
+
+def run_fresh(args):
+    """Run the runner with `args` in a new interpreter, then exit."""
+    argv = [sys.executable, '-X', 'utf8', RUNNER_PATH] + list(args)
+    sys.stdout.flush()
+    sys.stderr.flush()
+    if os.name == 'nt':
+        # The process seen by Spyder would exit right away with execv
+        sys.exit(subprocess.call(argv))
+    os.execv(sys.executable, argv)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Wait to profile a script with runner.py.')
+    parser.add_argument('--preload', action='append', default=[],
+                        metavar='MODULE', help='Module to import ahead.')
+    options = parser.parse_args(argv)
+
+    runner = load_runner()
+    preload(options.preload)
+    mtimes = get_module_files()
+
+    line = sys.stdin.readline()
+    if not line.strip():
+        # Spyder stopped the worker without a job
+        return
+    job = json.loads(line)
+    os.chdir(job['wdir'])
+    if is_outdated(mtimes):
+        run_fresh(job['args'])
+    runner.main(job['args'])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,234 @@
+# -*- coding: utf-8 -*-
+#
+# -----------------------------------------------------------------------------
+# Copyright (c) 2013- Spyder Project Contributors
+#
+# Released under the terms of the MIT License
+# (see LICENSE.txt in the project root directory for details)
+# -----------------------------------------------------------------------------
+
+"""
+Performance budgets checked against line profiler results.
+
+Budgets are declared in a ``line_profiler_budgets.json`` file at the root
+of a project, for instance::
+
+    {"budgets": [
+        {"function": "solve", "max_time": 50},
+        {"file": "pkg/model.py", "line": 42, "max_percent": 10},
+        {"file": "pkg/model.py", "function": "fit", "max_hits": 1000}
+    ]}
+
+A budget applies to a function if it has a ``function`` name, and to a
+line if it has a ``line`` number, which requires a ``file``. Files are
+relative to the directory of the budget file. Limits are ``max_time``
+(in milliseconds), ``max_percent`` (of the time of the function, for
+lines only) and ``max_hits`` (the number of calls, for functions).
+"""
+
+# Standard library imports
+from collections import namedtuple
+import json
+import os
+import os.path as osp
+
+BUDGET_FILENAME = 'line_profiler_budgets.json'
+
+LIMITS = ('max_time', 'max_percent', 'max_hits')
+
+
+class BudgetError(ValueError):
+    """A budget file is not valid."""
+
+
+Budget = namedtuple(
+    'Budget', ['file', 'function', 'line', 'max_time', 'max_percent',
+               'max_hits'])
+Budget.__doc__ = """
+A performance budget of a function or a line.
+
+`file` is an absolute path, or None to match functions in any file.
+Limits that are not set are None.
+"""
+
+
+class Violation:
+    """A measure of a function or line of code exceeding its budget."""
+    __slots__ = ('budget', 'func_info', 'line_no', 'measure', 'value',
+                 'limit')
+
+    def __init__(self, budget, func_info, line_no, measure, value, limit):
+        self.budget = budget
+        self.func_info = func_info
+        self.line_no = line_no  # None if the budget is for the function
+        self.measure = measure  # One of LIMITS
+        self.value = value
+        self.limit = limit
+
+    def message(self):
+        """Describe the violation in a short sentence."""
+        filename, _start_line_no, func_name = self.func_info
+        if self.line_no is None:
+            where = '{} in {}'.format(func_name, filename)
+        else:
+            where = 'Line {} of {}'.format(self.line_no, filename)
+        if self.measure == 'max_time':
+            amount = '{:.3f} ms > {:g} ms'.format(self.value, self.limit)
+        elif self.measure == 'max_percent':
+            amount = '{:.1f}% > {:g}% of the function time'.format(
+                self.value, self.limit)
+        else:
+            amount = '{:d} hits > {:g}'.format(self.value, self.limit)
+        return '{}: {}'.format(where, amount)
+
+    def to_dict(self):
+        filename, start_line_no, func_name = self.func_info
+        return {
+            'file': filename,
+            'function': func_name,
+            'start_line_no': start_line_no,
+            'line': self.line_no,
+            'measure': self.measure,
+            'value': self.value,
+            'limit': self.limit,
+            'message': self.message(),
+        }
+
+
+def find_budget_file(directory):
+    """
+    Find the budget file of the project containing `directory`.
+
+    The directory and its parents are searched in turn. Returns None if
+    there is no budget file.
+    """
+    directory = osp.abspath(directory)
+    while True:
+        path = osp.join(directory, BUDGET_FILENAME)
+        if osp.isfile(path):
+            return path
+        parent = osp.dirname(directory)
+        if parent == directory:
+            return None
+        directory = parent
+
+
+def load_budgets(path):
+    """Load the budgets declared in the file `path`."""
+    try:
+        with open(path, encoding='utf-8') as f:
+            data = json.load(f)
+        entries = data['budgets']
+    except (OSError, ValueError, TypeError, KeyError) as error:
+        raise BudgetError(
+            'Could not read budgets from {}: {}'.format(path, error))
+
+    root = osp.dirname(osp.abspath(path))
+    budgets = []
+    for index, entry in enumerate(entries):
+        def invalid(reason):
+            return BudgetError('Invalid budget {} in {}: {}'.format(
+                index + 1, path, reason))
+
+        if not isinstance(entry, dict):
+            raise invalid('not an object')
+        unknown = set(entry) - {'file', 'function', 'line'} - set(LIMITS)
+        if unknown:
+            raise invalid('unknown keys {}'.format(sorted(unknown)))
+        if entry.get('function') is None and entry.get('line') is None:
+            raise invalid('a function or a line is needed')
+        if entry.get('line') is not None and entry.get('file') is None:
+            raise invalid('a file is needed for line budgets')
+        if all(entry.get(limit) is None for limit in LIMITS):
+            raise invalid('no limit given')
+        if entry.get('line') is None and entry.get('max_percent') is not None:
+            raise invalid('max_percent only applies to lines')
+        for limit in LIMITS:
+            value = entry.get(limit)
+            if value is not None and (
+                    not isinstance(value, (int, float)) or value < 0):
+                raise invalid('{} must be a positive number'.format(limit))
+
+        filename = entry.get('file')
+        if filename is not None:
+            filename = osp.normpath(osp.join(root, filename))
+        budgets.append(Budget(
+            filename, entry.get('function'), entry.get('line'),
+            entry.get('max_time'), entry.get('max_percent'),
+            entry.get('max_hits')))
+    return budgets
+
+
+def _same_file(budget_file, filename):
+    return (osp.normcase(budget_file)
+            == osp.normcase(osp.normpath(osp.abspath(filename))))
+
+
+def check_budgets(budgets, result):
+    """
+    Check the results of a run against `budgets`.
+
+    `result` is a ProfileResult. Returns the list of violations, in the
+    order of the functions and then of the budgets.
+    """
+    violations = []
+    for func in result.values():
+        for budget in budgets:
+            if budget.file is not None and not _same_file(budget.file,
+                                                          func.filename):
+                continue
+            if (budget.function is not None
+                    and budget.function != func.func_name):
+                continue
+
+            if budget.line is None:
+                measures = {'max_time': func.total_time * 1e3,
+                            'max_hits': None}
+                if budget.max_hits is not None:
+                    # Calls are the hits of the first line that ran
+                    measures['max_hits'] = next(
+                        (hits for hits in func.hits if hits), 0)
+                line_no = None
+            else:
+                if budget.line not in func.line_nos:
+                    continue
+                pos = budget.line - func.start_line_no
+                time = func.get_time(pos)
+                percent = func.get_percent(pos)
+                measures = {
+                    'max_time': None if time is None else time * 1e3,
+                    'max_percent': None if percent is None else percent * 100,
+                    'max_hits': func.get_hits(pos),
+                }
+                line_no = budget.line
+
+            for measure, value in measures.items():
+                limit = getattr(budget, measure)
+                if limit is not None and value is not None and value > limit:
+                    violations.append(Violation(
+                        budget, func.func_info, line_no, measure, value,
+                        limit))
+    return violations
+
+
+def write_report(violations, f, budget_file=None):
+    """Write a JSON report of `violations` to the text file `f`."""
+    json.dump({
+        'budget_file': budget_file,
+        'passed': not violations,
+        'violations': [violation.to_dict() for violation in violations],
+    }, f, indent=2)
+    f.write('\n')
+
+
+def get_budgets_for(path):
+    """
+    Return the budgets of the project of `path` and their file.
+
+    Returns ([], None) if there is no budget file.
+    """
+    directory = path if osp.isdir(path) else osp.dirname(path)
+    budget_file = find_budget_file(directory or os.getcwd())
+    if budget_file is None:
+        return [], None
+    return load_budgets(budget_file), budget_file
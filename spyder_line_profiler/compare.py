@@ -0,0 +1,314 @@
+# -*- coding: utf-8 -*-
+#
+# -----------------------------------------------------------------------------
+# Copyright (c) 2013- Spyder Project Contributors
+#
+# Released under the terms of the MIT License
+# (see LICENSE.txt in the project root directory for details)
+# -----------------------------------------------------------------------------
+
+"""
+Comparison of the results of two profiling runs.
+"""
+
+# Standard library imports
+from array import array
+import bisect
+import math
+
+
+def align_lines(old_lines, new_lines):
+    """
+    Align two versions of the lines of code of a function by content.
+
+    Returns a list of (old position, new position) pairs, in the order in
+    which lines should be shown. Lines only in the old version have None
+    as new position, and conversely.
+
+    Lines that appear once in both versions are used as anchors, of which
+    the longest increasing sequence is kept, and matches are extended to
+    their neighbours (as in Heckel's and patience diff). This takes linear
+    time, apart from a binary search per anchor.
+    """
+    old_keys = [line.strip() for line in old_lines]
+    new_keys = [line.strip() for line in new_lines]
+
+    # Common first and last lines are matched directly, which is all that
+    # is needed for functions that didn't change
+    prefix = 0
+    limit = min(len(old_keys), len(new_keys))
+    while prefix < limit and old_keys[prefix] == new_keys[prefix]:
+        prefix += 1
+    suffix = 0
+    while (suffix < limit - prefix
+           and old_keys[-1 - suffix] == new_keys[-1 - suffix]):
+        suffix += 1
+
+    pairs = [(pos, pos) for pos in range(prefix)]
+    pairs.extend(
+        (old_pos + prefix if old_pos is not None else None,
+         new_pos + prefix if new_pos is not None else None)
+        for old_pos, new_pos in _align_keys(
+            old_keys[prefix:len(old_keys) - suffix],
+            new_keys[prefix:len(new_keys) - suffix]))
+    pairs.extend((len(old_keys) - pos, len(new_keys) - pos)
+                 for pos in range(suffix, 0, -1))
+    return pairs
+
+
+def _align_keys(old_keys, new_keys):
+    """Align lines given by their keys, see `align_lines`."""
+    # Count occurrences of each line in both versions
+    counts = {}
+    for pos, key in enumerate(old_keys):
+        entry = counts.setdefault(key, [0, 0, pos])
+        entry[0] += 1
+    for key in new_keys:
+        entry = counts.get(key)
+        if entry is not None:
+            entry[1] += 1
+
+    # Anchors, in the order of the new lines
+    anchors = []
+    for new_pos, key in enumerate(new_keys):
+        entry = counts.get(key)
+        if entry is not None and entry[0] == 1 and entry[1] == 1:
+            anchors.append((entry[2], new_pos))
+
+    # Longest sequence of anchors that is also increasing in old lines
+    tails = []        # Smallest old position ending a sequence of length i
+    tail_indexes = []
+    previous = [None] * len(anchors)
+    for index, (old_pos, _new_pos) in enumerate(anchors):
+        length = bisect.bisect_left(tails, old_pos)
+        if length == len(tails):
+            tails.append(old_pos)
+            tail_indexes.append(index)
+        else:
+            tails[length] = old_pos
+            tail_indexes[length] = index
+        previous[index] = tail_indexes[length - 1] if length else None
+    kept = []
+    index = tail_indexes[-1] if tail_indexes else None
+    while index is not None:
+        kept.append(anchors[index])
+        index = previous[index]
+    kept.reverse()
+
+    # Extend matches to the equal lines around anchors
+    matches = []
+    last_old, last_new = -1, -1
+    for old_pos, new_pos in kept + [(len(old_keys), len(new_keys))]:
+        first_old, first_new = last_old + 1, last_new + 1
+        while (first_old < old_pos and first_new < new_pos
+               and old_keys[first_old] == new_keys[first_new]):
+            matches.append((first_old, first_new))
+            first_old += 1
+            first_new += 1
+        backward = []
+        end_old, end_new = old_pos - 1, new_pos - 1
+        while (end_old >= first_old and end_new >= first_new
+               and old_keys[end_old] == new_keys[end_new]):
+            backward.append((end_old, end_new))
+            end_old -= 1
+            end_new -= 1
+        matches.append((first_old, first_new, end_old + 1, end_new + 1))
+        matches.extend(reversed(backward))
+        if old_pos < len(old_keys):
+            matches.append((old_pos, new_pos))
+        last_old, last_new = old_pos, new_pos
+
+    # Unmatched lines are shown before the next match, old ones first
+    pairs = []
+    for match in matches:
+        if len(match) == 2:
+            pairs.append(match)
+        else:
+            first_old, first_new, end_old, end_new = match
+            pairs.extend((pos, None) for pos in range(first_old, end_old))
+            pairs.extend((None, pos) for pos in range(first_new, end_new))
+    return pairs
+
+
+class FunctionDiff:
+    """
+    Comparison of the results of a function in two runs.
+
+    `old` and `new` are the FunctionResult of the function in each run,
+    or None if it was only profiled in one of them. Lines are aligned by
+    content, so that each position refers to a line in one run or both.
+    """
+    __slots__ = ('old', 'new', 'old_pos', 'new_pos')
+
+    def __init__(self, old, new):
+        self.old = old
+        self.new = new
+        pairs = align_lines(old.lines if old is not None else (),
+                            new.lines if new is not None else ())
+        self.old_pos = array('q', (-1 if old_pos is None else old_pos
+                                   for old_pos, _new_pos in pairs))
+        self.new_pos = array('q', (-1 if new_pos is None else new_pos
+                                   for _old_pos, new_pos in pairs))
+
+    @property
+    def result(self):
+        """The newest result of the function."""
+        return self.new if self.new is not None else self.old
+
+    @property
+    def func_info(self):
+        return self.result.func_info
+
+    @property
+    def filename(self):
+        return self.result.filename
+
+    @property
+    def start_line_no(self):
+        return self.result.start_line_no
+
+    @property
+    def func_name(self):
+        return self.result.func_name
+
+    @property
+    def old_total_time(self):
+        return self.old.total_time if self.old is not None else 0.0
+
+    @property
+    def new_total_time(self):
+        return self.new.total_time if self.new is not None else 0.0
+
+    def __len__(self):
+        return len(self.old_pos)
+
+    def get_line_no(self, pos):
+        """Line number of `pos`, in the newest run that has it."""
+        if self.new_pos[pos] >= 0:
+            return self.new.get_line_no(self.new_pos[pos])
+        return self.old.get_line_no(self.old_pos[pos])
+
+    def get_code(self, pos):
+        if self.new_pos[pos] >= 0:
+            return self.new.get_code(self.new_pos[pos])
+        return self.old.get_code(self.old_pos[pos])
+
+    def in_new(self, pos):
+        """Whether line `pos` is part of the new run."""
+        return self.new_pos[pos] >= 0
+
+    def get_old_hits(self, pos):
+        """Hits of line `pos` in the old run, or None if it didn't run."""
+        if self.old_pos[pos] < 0:
+            return None
+        return self.old.get_hits(self.old_pos[pos])
+
+    def get_new_hits(self, pos):
+        """Hits of line `pos` in the new run, or None if it didn't run."""
+        if self.new_pos[pos] < 0:
+            return None
+        return self.new.get_hits(self.new_pos[pos])
+
+    def get_old_time(self, pos):
+        """Time of line `pos` in the old run, or None if it didn't run."""
+        if self.old_pos[pos] < 0:
+            return None
+        return self.old.get_time(self.old_pos[pos])
+
+    def get_new_time(self, pos):
+        """Time of line `pos` in the new run, or None if it didn't run."""
+        if self.new_pos[pos] < 0:
+            return None
+        return self.new.get_time(self.new_pos[pos])
+
+    def get_hits_delta(self, pos):
+        """Change in hits of line `pos`, or None if it never ran."""
+        old, new = self.get_old_hits(pos), self.get_new_hits(pos)
+        if old is None and new is None:
+            return None
+        return (new or 0) - (old or 0)
+
+    def get_time_delta(self, pos):
+        """Change in time of line `pos` in seconds, or None."""
+        old, new = self.get_old_time(pos), self.get_new_time(pos)
+        if old is None and new is None:
+            return None
+        return (new or 0.0) - (old or 0.0)
+
+    def get_old_memory(self, pos):
+        """Memory allocated by line `pos` in the old run, or None."""
+        if self.old_pos[pos] < 0:
+            return None
+        return self.old.get_memory(self.old_pos[pos])
+
+    def get_new_memory(self, pos):
+        """Memory allocated by line `pos` in the new run, or None."""
+        if self.new_pos[pos] < 0:
+            return None
+        return self.new.get_memory(self.new_pos[pos])
+
+    def get_memory_delta(self, pos):
+        """
+        Change in memory allocated by line `pos` in bytes, or None.
+
+        This is None unless the memory of one of the runs was profiled.
+        """
+        old, new = self.get_old_memory(pos), self.get_new_memory(pos)
+        if old is None and new is None:
+            return None
+        return (new or 0.0) - (old or 0.0)
+
+    def get_error(self, pos):
+        """
+        Noise of the change in time of line `pos` in seconds, or None.
+
+        This is the half-width of the 95% confidence interval of the
+        change, which is only known if a run was repeated. The error of a
+        single run is taken as zero if the other one was repeated.
+        """
+        old_error = (self.old.get_error(self.old_pos[pos])
+                     if self.old_pos[pos] >= 0 else None)
+        new_error = (self.new.get_error(self.new_pos[pos])
+                     if self.new_pos[pos] >= 0 else None)
+        if old_error is None and new_error is None:
+            return None
+        return math.hypot(old_error or 0.0, new_error or 0.0)
+
+    def is_noise(self, pos):
+        """Whether the change in time of line `pos` is within noise."""
+        delta, error = self.get_time_delta(pos), self.get_error(pos)
+        return delta is not None and error is not None and abs(delta) <= error
+
+    def get_ratio(self, pos):
+        """Ratio of the new time of line `pos` to its old time, or None."""
+        old, new = self.get_old_time(pos), self.get_new_time(pos)
+        if not old or new is None:
+            return None
+        return new / old
+
+
+def compare_results(old, new):
+    """
+    Compare the ProfileResults `old` and `new` of two runs.
+
+    Functions are matched by file and name, so that they are still
+    matched if they moved within their file. Returns a dict mapping the
+    (filename, first line, function name) of each function to its
+    FunctionDiff, with the functions of the new run first.
+    """
+    old_functions = {}
+    for result in sorted(old.values(), key=lambda result: result.func_info):
+        key = (result.filename, result.func_name)
+        old_functions.setdefault(key, []).append(result)
+
+    matched = {}
+    for result in sorted(new.values(), key=lambda result: result.func_info):
+        candidates = old_functions.get((result.filename, result.func_name))
+        matched[result.func_info] = candidates.pop(0) if candidates else None
+
+    diffs = {func_info: FunctionDiff(matched[func_info], result)
+             for func_info, result in new.items()}
+    for results in old_functions.values():
+        for result in results:
+            diffs.setdefault(result.func_info, FunctionDiff(result, None))
+    return diffs
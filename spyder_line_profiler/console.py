@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+#
+# -----------------------------------------------------------------------------
+# Copyright (c) 2013- Spyder Project Contributors
+#
+# Released under the terms of the MIT License
+# (see LICENSE.txt in the project root directory for details)
+# -----------------------------------------------------------------------------
+
+"""
+Line profiling of statements in a running IPython console.
+
+Commands are given like to the ``%lprun`` magic of line_profiler, as
+``[-f FUNCTION ...] STATEMENT``, and run in the kernel of the console
+by bootstrap/console.py.
+"""
+
+# Standard library imports
+import ast
+import types
+
+# Local imports
+from spyder_line_profiler.bootstrap import get_bootstrap_path
+from spyder_line_profiler.statsfile import write_stats_file
+
+# Name of the results in the namespace of the console
+RESULT_NAME = '_spyder_line_profiler_result'
+
+
+def parse_command(text):
+    """
+    Return the (function expressions, statement) of the command `text`.
+
+    If no function is given with ``-f``, the function called by the
+    statement is profiled. Raises ValueError if there is no statement or
+    no function to profile.
+    """
+    expressions = []
+    rest = text.strip()
+    while rest.startswith('-f') and rest[2:3].isspace():
+        parts = rest[2:].split(None, 1)
+        expressions.append(parts[0])
+        rest = parts[1].strip() if len(parts) > 1 else ''
+    if not rest:
+        raise ValueError('No statement to profile')
+    if not expressions:
+        try:
+            body = ast.parse(rest).body
+        except SyntaxError:
+            body = []
+        if (len(body) == 1 and isinstance(body[0], ast.Expr)
+                and isinstance(body[0].value, ast.Call)):
+            expressions.append(
+                ast.get_source_segment(rest, body[0].value.func))
+        else:
+            raise ValueError('No function to profile, name it with -f')
+    return expressions, rest
+
+
+def get_request_code(statement, expressions):
+    """
+    Return the code profiling `statement` when run in a console.
+
+    The functions of `expressions` are profiled and the results are left
+    in the namespace of the console, under RESULT_NAME.
+    """
+    # Only the results are left in the namespace
+    return (
+        'def _spyder_line_profiler_run():\n'
+        '    import importlib.util\n'
+        '    spec = importlib.util.spec_from_file_location(\n'
+        '        "_spyder_line_profiler_console", {path!r})\n'
+        '    module = importlib.util.module_from_spec(spec)\n'
+        '    spec.loader.exec_module(module)\n'
+        '    module.run_request({statement!r}, {expressions!r}, globals(),\n'
+        '                       {name!r})\n'
+        '_spyder_line_profiler_run()\n'
+        'del _spyder_line_profiler_run\n'
+    ).format(path=get_bootstrap_path('console'), statement=statement,
+             expressions=list(expressions), name=RESULT_NAME)
+
+
+def save_console_data(data, profdatafile):
+    """
+    Save the results sent by the console to `profdatafile`.
+
+    The file is a stats file (see statsfile.py), which can be loaded by
+    `load_profile_data`. Returns the error of the statement, if any.
+    """
+    timings = {tuple(func_info): [tuple(line) for line in lines]
+               for func_info, lines in data['timings'].items()}
+    stats = types.SimpleNamespace(timings=timings, unit=data['unit'])
+    write_stats_file(stats, profdatafile)
+    return data.get('error')
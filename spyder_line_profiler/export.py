@@ -0,0 +1,192 @@
+# -*- coding: utf-8 -*-
+#
+# -----------------------------------------------------------------------------
+# Copyright (c) 2013- Spyder Project Contributors
+#
+# Released under the terms of the MIT License
+# (see LICENSE.txt in the project root directory for details)
+# -----------------------------------------------------------------------------
+
+"""
+Export of line profiler results to text, JSON, JSON Lines, CSV and Parquet.
+
+JSON Lines, CSV and Parquet have a record for each line of code, which
+are written as they are produced, so that large results are not held
+in memory a second time.
+"""
+
+# Standard library imports
+import csv
+import itertools
+import json
+
+# Third party imports
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+# Local imports
+from spyder_line_profiler.results import MemoryFunctionResult
+
+FORMATS = ('text', 'json', 'jsonl', 'csv', 'parquet')
+
+# Formats written to binary files
+BINARY_FORMATS = ('parquet',)
+
+# Fields of the record of each line
+CSV_COLUMNS = ['path', 'filename', 'func_name', 'start_line_no', 'line_no',
+               'hits', 'time', 'perhit', 'percent', 'memory', 'peak',
+               'code']
+
+# Number of records written at once to Parquet files
+PARQUET_BATCH_SIZE = 2**16
+
+TEXT_HEADER = '{:>8} {:>9} {:>12} {:>13} {:>8}  {}'.format(
+    'Line #', 'Hits', 'Time (ms)', 'Per hit (ms)', '% Time',
+    'Line contents')
+
+
+def format_function_text(func):
+    """Format the results of a function as a text table, like the tree."""
+    lines = [
+        '{func_name} ({time_ms:.3f}ms) in file "{filename}", '
+        'line {line_no}'.format(
+            func_name=func.func_name, time_ms=func.total_time * 1e3,
+            filename=func.filename, line_no=func.start_line_no),
+        '',
+        TEXT_HEADER,
+        '=' * len(TEXT_HEADER)]
+    for line_no, code, time, perhit, hits, percent in func.rows():
+        if hits is None:
+            lines.append('{:>8} {:>9} {:>12} {:>13} {:>8}  {}'.format(
+                line_no, '', '', '', '', code))
+        else:
+            lines.append(
+                '{:>8} {:>9} {:>12.3f} {:>13.3f} {:>8.1f}  {}'.format(
+                    line_no, hits, time * 1e3, perhit * 1e3,
+                    percent * 100, code))
+    return '\n'.join(lines) + '\n'
+
+
+def is_format_available(format):
+    """Whether results can be exported to `format` (see FORMATS)."""
+    if format == 'parquet':
+        return pq is not None
+    return format in FORMATS
+
+
+def iter_rows(func):
+    """
+    Iterate over the lines of the FunctionResult `func`.
+
+    Lines are given like by `FunctionResult.rows`, followed by the memory
+    and peak of the line in bytes, which are None without memory
+    statistics.
+    """
+    has_memory = isinstance(func, MemoryFunctionResult)
+    for pos, row in enumerate(func.rows()):
+        if has_memory:
+            yield row + (func.get_memory(pos), func.get_peak(pos))
+        else:
+            yield row + (None, None)
+
+
+def iter_records(results):
+    """
+    Iterate over the lines of an iterable of ProfileResult.
+
+    Each line is given as a tuple of the fields of CSV_COLUMNS.
+    """
+    for result in results:
+        for func in result.values():
+            for (line_no, code, time, perhit, hits, percent, memory,
+                 peak) in iter_rows(func):
+                yield (result.path, func.filename, func.func_name,
+                       func.start_line_no, line_no, hits, time, perhit,
+                       percent, memory, peak, code)
+
+
+def write_parquet(results, f, batch_size=PARQUET_BATCH_SIZE):
+    """
+    Write the records of an iterable of ProfileResult to the binary file
+    `f` in Parquet format.
+
+    Records are written in row groups of `batch_size` lines. Line numbers
+    and hits are integers, and the other numbers are floats. Raises
+    ImportError if pyarrow is not installed.
+    """
+    if pq is None:
+        raise ImportError('pyarrow is needed to export to Parquet')
+    types = {name: pa.int64() for name in ('start_line_no', 'line_no', 'hits')}
+    for name in ('path', 'filename', 'func_name', 'code'):
+        types[name] = pa.string()
+    schema = pa.schema([(name, types.get(name, pa.float64()))
+                        for name in CSV_COLUMNS])
+    records = iter_records(results)
+    with pq.ParquetWriter(f, schema) as writer:
+        while True:
+            batch = list(itertools.islice(records, batch_size))
+            if not batch:
+                break
+            columns = [pa.array(column, type=field.type)
+                       for column, field in zip(zip(*batch), schema)]
+            writer.write_table(pa.Table.from_arrays(columns, schema=schema))
+
+
+def result_to_dict(result):
+    """Convert a ProfileResult to a JSON-serializable dict."""
+    return {
+        'path': result.path,
+        'functions': [
+            {
+                'filename': func.filename,
+                'func_name': func.func_name,
+                'start_line_no': func.start_line_no,
+                'total_time': func.total_time,
+                'lines': [
+                    {'line_no': line_no, 'code': code, 'hits': hits,
+                     'time': time, 'perhit': perhit, 'percent': percent,
+                     'memory': memory, 'peak': peak}
+                    for line_no, code, time, perhit, hits, percent, memory,
+                    peak in iter_rows(func)],
+            }
+            for func in result.values()],
+    }
+
+
+def write_results(results, f, format='text'):
+    """
+    Write an iterable of ProfileResult to the text file `f`.
+
+    `format` is one of FORMATS, and `f` is a binary file for those of
+    BINARY_FORMATS. Results are written as they are produced by
+    `results`. Times are in milliseconds in text and in seconds
+    otherwise, and lines that didn't run have no values.
+    """
+    if format == 'text':
+        for result in results:
+            f.write('Results of {}\n\n'.format(result.path))
+            for func in result.values():
+                f.write(format_function_text(func))
+                f.write('\n')
+    elif format == 'json':
+        f.write('[')
+        for index, result in enumerate(results):
+            if index:
+                f.write(',\n')
+            json.dump(result_to_dict(result), f)
+        f.write(']\n')
+    elif format == 'jsonl':
+        for record in iter_records(results):
+            json.dump(dict(zip(CSV_COLUMNS, record)), f)
+            f.write('\n')
+    elif format == 'csv':
+        writer = csv.writer(f, lineterminator='\n')
+        writer.writerow(CSV_COLUMNS)
+        writer.writerows(iter_records(results))
+    elif format == 'parquet':
+        write_parquet(results, f)
+    else:
+        raise ValueError('Unknown format: {}'.format(format))
@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+#
+# -----------------------------------------------------------------------------
+# Copyright (c) 2013- Spyder Project Contributors
+#
+# Released under the terms of the MIT License
+# (see LICENSE.txt in the project root directory for details)
+# -----------------------------------------------------------------------------
+
+"""
+Heat of the lines of profiled files, as shown next to the code in editors.
+"""
+
+# Standard library imports
+from collections import namedtuple
+import os.path as osp
+
+
+LineHeat = namedtuple('LineHeat', ['heat', 'hits', 'time', 'code'])
+LineHeat.__doc__ = """
+Profiling results of a line of a file.
+
+`heat` is the time of the line relative to the line of the file which
+took the most time, `hits` and `time` are its hits and total time in
+seconds, and `code` is the code of the line when it was profiled,
+without trailing whitespace.
+"""
+
+
+def normalize_path(filename):
+    """Return the path used to look up the heat of `filename`."""
+    return osp.normcase(osp.normpath(osp.abspath(filename)))
+
+
+def get_file_functions(result):
+    """
+    Return the functions of each file profiled in `result`.
+
+    `result` is a ProfileResult. Returns a dict mapping the normalized
+    path (see `normalize_path`) of each file to the list of its
+    FunctionResults. The lines of the functions are not read.
+    """
+    files = {}
+    for func in result.values():
+        files.setdefault(normalize_path(func.filename), []).append(func)
+    return files
+
+
+def compute_heatmap(functions):
+    """
+    Compute the heat of the lines of a file from its `functions`.
+
+    `functions` are the FunctionResults of the file, as returned by
+    `get_file_functions`. Returns a dict mapping the line number of each
+    line that ran to its LineHeat, which is empty if no line ran. Lines
+    of several functions, such as the definition of a nested function,
+    add up.
+    """
+    lines = {}
+    for func in functions:
+        for pos in range(len(func.lines)):
+            hits = func.get_hits(pos)
+            if hits is None:
+                continue
+            line_no = func.get_line_no(pos)
+            time = func.get_time(pos)
+            if line_no in lines:
+                other_hits, other_time, _code = lines[line_no]
+                hits += other_hits
+                time += other_time
+            lines[line_no] = (hits, time, func.get_code(pos).rstrip())
+    if not lines:
+        return {}
+    largest = max(time for _hits, time, _code in lines.values())
+    return {line_no: LineHeat(time / largest if largest > 0 else 0.0,
+                              hits, time, code)
+            for line_no, (hits, time, code) in lines.items()}
@@ -0,0 +1,253 @@
+# -*- coding: utf-8 -*-
+#
+# -----------------------------------------------------------------------------
+# Copyright (c) 2013- Spyder Project Contributors
+#
+# Released under the terms of the MIT License
+# (see LICENSE.txt in the project root directory for details)
+# -----------------------------------------------------------------------------
+
+"""
+On-disk history of profiling runs.
+"""
+
+# Standard library imports
+import json
+import logging
+import os
+import os.path as osp
+import threading
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
+
+# Number of slowest functions kept in the index for each run
+TOP_FUNCTIONS = 5
+
+
+def summarize(result, count=TOP_FUNCTIONS):
+    """
+    Summarize a ProfileResult for the history index.
+
+    Returns the total time of the run and its `count` slowest functions,
+    as (function name, filename, first line, total time) lists.
+    """
+    functions = sorted(result.values(), key=lambda func: func.total_time,
+                       reverse=True)
+    top_functions = [
+        [func.func_name, func.filename, func.start_line_no, func.total_time]
+        for func in functions[:count]]
+    return sum(func.total_time for func in functions), top_functions
+
+
+def save_code(path, result):
+    """Save the lines of code of the functions of `result` to `path`."""
+    code = [[func.filename, func.start_line_no, list(func.lines)]
+            for func in result.values()]
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(code, f)
+
+
+def load_code(path):
+    """
+    Load the lines of code saved by `save_code`.
+
+    Returns a dict mapping the (filename, first line) of each function to
+    its lines of code, which is empty if they could not be read.
+    """
+    try:
+        with open(path, encoding='utf-8') as f:
+            return {(filename, start_line_no): lines
+                    for filename, start_line_no, lines in json.load(f)}
+    except (OSError, ValueError, TypeError):
+        logger.debug('Could not load code of run', exc_info=True)
+        return {}
+
+
+class RunHistory:
+    """
+    Store of the results of past profiling runs.
+
+    The results of each run are kept in `root` together with the output
+    of the profiled script and the code of the profiled functions at the
+    time of the run. Runs are described in a small JSON index, so that
+    they can be listed without reading their results. At most `max_runs`
+    runs are kept for each script and the whole store is kept under
+    `max_size` bytes, evicting the least recently used runs first.
+    """
+    INDEX_NAME = 'index.json'
+
+    def __init__(self, root, max_runs=10, max_size=100 * 2**20):
+        self.root = root
+        self.max_runs = max_runs
+        self.max_size = max_size
+        self._runs = {}  # run id: index entry, from oldest to newest used
+        self._lock = threading.Lock()
+        self.load()
+
+    @property
+    def index_path(self):
+        return osp.join(self.root, self.INDEX_NAME)
+
+    def get_data_path(self, run_id):
+        """Return the path of the line profiler results of run `run_id`."""
+        return osp.join(self.root, run_id + '.lprof')
+
+    def get_output_path(self, run_id):
+        """Return the path of the output of run `run_id`."""
+        return osp.join(self.root, run_id + '.txt')
+
+    def get_code_path(self, run_id):
+        """Return the path of the code of the functions of run `run_id`."""
+        return osp.join(self.root, run_id + '.code.json')
+
+    def get_runs(self, script=None):
+        """
+        Return the index entries of the stored runs, newest first.
+
+        Only the runs of `script` are returned if it is given. Entries are
+        dicts with the id, script, args, wdir, timestamp, total_time,
+        top_functions and size of each run.
+        """
+        with self._lock:
+            runs = [dict(run) for run in self._runs.values()
+                    if script is None or run['script'] == script]
+        runs.sort(key=lambda run: run['timestamp'], reverse=True)
+        return runs
+
+    def get_run(self, run_id):
+        """Return the index entry of run `run_id`, or None."""
+        with self._lock:
+            run = self._runs.get(run_id)
+        return None if run is None else dict(run)
+
+    def add_run(self, datafile, result, script, args=None, wdir=None,
+                output=None, timestamp=None):
+        """
+        Add a run whose results were saved in `datafile`.
+
+        The file is moved into the store. `result` is the ProfileResult
+        loaded from it, used to summarize the run in the index. Returns
+        the index entry of the new run.
+        """
+        os.makedirs(self.root, exist_ok=True)
+        run_id = uuid.uuid4().hex
+        data_path = self.get_data_path(run_id)
+        os.replace(datafile, data_path)
+        size = os.stat(data_path).st_size
+        if output:
+            with open(self.get_output_path(run_id), 'w',
+                      encoding='utf-8') as f:
+                f.write(output)
+            size += os.stat(self.get_output_path(run_id)).st_size
+        save_code(self.get_code_path(run_id), result)
+        size += os.stat(self.get_code_path(run_id)).st_size
+
+        total_time, top_functions = summarize(result)
+        run = {
+            'id': run_id,
+            'script': script,
+            'args': args or '',
+            'wdir': wdir or '',
+            'timestamp': time.time() if timestamp is None else timestamp,
+            'total_time': total_time,
+            'top_functions': top_functions,
+            'size': size,
+        }
+        with self._lock:
+            self._runs[run_id] = run
+            evicted = self._evict()
+        self._remove_files(evicted)
+        self.save()
+        return dict(run)
+
+    def touch(self, run_id):
+        """Mark run `run_id` as the most recently used one."""
+        with self._lock:
+            run = self._runs.pop(run_id, None)
+            if run is None:
+                return
+            self._runs[run_id] = run
+        self.save()
+
+    def remove_run(self, run_id):
+        """Remove run `run_id` from the store."""
+        with self._lock:
+            if self._runs.pop(run_id, None) is None:
+                return
+        self._remove_files([run_id])
+        self.save()
+
+    def clear(self, script=None):
+        """Remove all runs, or only those of `script` if given."""
+        with self._lock:
+            removed = [run_id for run_id, run in self._runs.items()
+                       if script is None or run['script'] == script]
+            for run_id in removed:
+                del self._runs[run_id]
+        self._remove_files(removed)
+        self.save()
+
+    def prune(self):
+        """Evict runs until the store fits its limits again."""
+        with self._lock:
+            evicted = self._evict()
+        if evicted:
+            self._remove_files(evicted)
+            self.save()
+
+    def load(self):
+        """Load the index from disk, dropping runs whose data is missing."""
+        try:
+            with open(self.index_path, encoding='utf-8') as f:
+                runs = json.load(f)['runs']
+            self._runs = {run['id']: run for run in runs
+                          if osp.isfile(self.get_data_path(run['id']))}
+        except (OSError, ValueError, TypeError, KeyError):
+            self._runs = {}
+
+    def save(self):
+        """Save the index to disk."""
+        tmp_path = self.index_path + '.tmp'
+        # Runs are added in the thread loading their results, so saves of
+        # other threads must not write to the same temporary file
+        with self._lock:
+            try:
+                os.makedirs(self.root, exist_ok=True)
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    json.dump({'runs': list(self._runs.values())}, f)
+                os.replace(tmp_path, self.index_path)
+            except OSError:
+                logger.debug('Could not save run history index',
+                             exc_info=True)
+
+    def _evict(self):
+        """Drop the least recently used runs exceeding the limits."""
+        evicted = []
+        counts = {}
+        for run in self._runs.values():
+            counts[run['script']] = counts.get(run['script'], 0) + 1
+        total_size = sum(run['size'] for run in self._runs.values())
+
+        # Dicts keep insertion order, so runs go from least to most
+        # recently used. The last run is always kept.
+        for run_id, run in list(self._runs.items())[:-1]:
+            if (counts[run['script']] <= self.max_runs
+                    and total_size <= self.max_size):
+                continue
+            del self._runs[run_id]
+            counts[run['script']] -= 1
+            total_size -= run['size']
+            evicted.append(run_id)
+        return evicted
+
+    def _remove_files(self, run_ids):
+        for run_id in run_ids:
+            for path in (self.get_data_path(run_id),
+                         self.get_output_path(run_id),
+                         self.get_code_path(run_id)):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
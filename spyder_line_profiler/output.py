@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+#
+# -----------------------------------------------------------------------------
+# Copyright (c) 2013- Spyder Project Contributors
+#
+# Released under the terms of the MIT License
+# (see LICENSE.txt in the project root directory for details)
+# -----------------------------------------------------------------------------
+
+"""
+Bounded capture of the output of profiling processes.
+
+Processes write their output in chunks of bytes which can split UTF-8
+characters, so these are decoded incrementally, with a decoder for each
+process. Text is stored in chunks, and once the output exceeds its
+maximum size only its start and its end are kept, as they have the
+errors of the script and the profiling results.
+"""
+
+# Standard library imports
+import codecs
+import collections
+
+# Text replacing the part of the output that was not kept
+OMITTED_TEXT = '\n[... {count} characters omitted ...]\n'
+
+# Number of characters shown at once by output viewers
+PAGE_SIZE = 2**16
+
+
+class OutputBuffer:
+    """
+    Output of profiling processes, keeping at most `max_size` characters.
+
+    The first half of the characters are the start of the output, and the
+    other half are its latest characters.
+    """
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self.omitted = 0  # Number of characters that were not kept
+        self._head = []   # Chunks of the start of the output
+        self._head_size = 0
+        self._tail = collections.deque()  # Chunks of the end of the output
+        self._tail_size = 0
+        self._decoders = {}
+
+    def __len__(self):
+        return self._head_size + self._tail_size
+
+    def write(self, data, source=None):
+        """
+        Add the bytes `data` written by `source`.
+
+        Characters split between chunks of the same source are added with
+        the chunk completing them. Invalid bytes are replaced.
+        """
+        decoder = self._decoders.get(source)
+        if decoder is None:
+            decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+            self._decoders[source] = decoder
+        self.append(decoder.decode(data))
+
+    def flush(self):
+        """Add the incomplete characters left by sources, if any."""
+        decoders, self._decoders = self._decoders, {}
+        for decoder in decoders.values():
+            self.append(decoder.decode(b'', final=True))
+
+    def append(self, text):
+        """Add `text`, dropping the oldest characters beyond the end."""
+        head_room = self.max_size // 2 - self._head_size
+        if head_room > 0:
+            head = text[:head_room]
+            if head:
+                self._head.append(head)
+                self._head_size += len(head)
+            text = text[head_room:]
+        if not text:
+            return
+        self._tail.append(text)
+        self._tail_size += len(text)
+        excess = self._tail_size - (self.max_size - self.max_size // 2)
+        while excess > 0:
+            first = self._tail.popleft()
+            dropped = min(len(first), excess)
+            if dropped < len(first):
+                self._tail.appendleft(first[dropped:])
+            self._tail_size -= dropped
+            self.omitted += dropped
+            excess -= dropped
+
+    def getvalue(self):
+        """Return the text kept, noting where characters were omitted."""
+        text = ''.join(self._head)
+        if self.omitted:
+            text += OMITTED_TEXT.format(count=self.omitted)
+        return text + ''.join(self._tail)
+
+
+def iter_pages(text, size=PAGE_SIZE):
+    """Iterate over `text` in pages of `size` characters."""
+    for start in range(0, len(text), size):
+        yield text[start:start + size]
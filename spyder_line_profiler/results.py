@@ -0,0 +1,1214 @@
+# -*- coding: utf-8 -*-
+#
+# -----------------------------------------------------------------------------
+# Copyright (c) 2013- Spyder Project Contributors
+#
+# Released under the terms of the MIT License
+# (see LICENSE.txt in the project root directory for details)
+# -----------------------------------------------------------------------------
+
+"""
+Compact representation of line profiler results.
+"""
+
+# Standard library imports
+from array import array
+from collections.abc import Mapping
+import functools
+import itertools
+import linecache
+import math
+import multiprocessing
+import os
+import os.path as osp
+import pickle
+import types
+
+# Third party imports
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Local imports
+from spyder_line_profiler.sourcecache import BlockCache
+from spyder_line_profiler.statsfile import (
+    StatsFile, can_store, is_stats_file, write_stats_file)
+
+
+NOT_RUN = math.nan  # Time of the lines that didn't run
+
+
+class LoadingCancelled(Exception):
+    """Loading of profiling results was cancelled."""
+
+
+class FunctionResult:
+    """
+    Line profiler results of a function.
+
+    Timings are stored in typed arrays with one item per line of code:
+    `times` in seconds (NaN for lines that didn't run) and `hits` (zero
+    for lines that didn't run). Lines of code are references to the lines
+    read from the source file, shared with other functions of that file.
+    """
+    __slots__ = ('filename', 'start_line_no', 'func_name', 'total_time',
+                 'lines', 'times', 'hits')
+
+    def __init__(self, func_info, lines, times, hits, total_time):
+        self.filename, self.start_line_no, self.func_name = func_info
+        self.lines = tuple(lines)
+        self.times = times
+        self.hits = hits
+        self.total_time = total_time
+
+    @property
+    def func_info(self):
+        """The (filename, first line, function name) of the function."""
+        return (self.filename, self.start_line_no, self.func_name)
+
+    @property
+    def line_nos(self):
+        """The line numbers of the function, starting at 1."""
+        return range(self.start_line_no,
+                     self.start_line_no + len(self.lines))
+
+    def __len__(self):
+        return len(self.lines)
+
+    def __eq__(self, other):
+        if not isinstance(other, FunctionResult):
+            return NotImplemented
+        return (self.func_info == other.func_info
+                and self.lines == other.lines
+                and self.hits == other.hits
+                and self.total_time == other.total_time
+                and all(t1 == t2 or (t1 != t1 and t2 != t2)
+                        for t1, t2 in zip(self.times, other.times)))
+
+    def get_line_no(self, pos):
+        return self.start_line_no + pos
+
+    def get_code(self, pos):
+        return self.lines[pos].rstrip('\n')
+
+    def get_hits(self, pos):
+        """Number of hits of line `pos`, or None if it didn't run."""
+        return self.hits[pos] or None
+
+    def get_time(self, pos):
+        """Total time of line `pos` in seconds, or None if it didn't run."""
+        return self.times[pos] if self.hits[pos] else None
+
+    def get_perhit(self, pos):
+        """Time per hit of line `pos` in seconds, or None."""
+        hits = self.hits[pos]
+        return self.times[pos] / hits if hits else None
+
+    def get_percent(self, pos):
+        """Fraction of the function time taken by line `pos`, or None."""
+        if not self.hits[pos]:
+            return None
+        if not self.total_time:
+            return 0.0
+        return self.times[pos] / self.total_time
+
+    def get_error(self, pos):
+        """
+        Half-width of the confidence interval of the time of line `pos`.
+
+        This is None as the noise of a single run is unknown.
+        """
+        return None
+
+    def get_memory(self, pos):
+        """
+        Net memory allocated by line `pos` in bytes, or None.
+
+        This is None unless the memory of the run was profiled.
+        """
+        return None
+
+    def get_peak(self, pos):
+        """
+        Peak memory used by line `pos` in bytes, or None.
+
+        This is None unless the memory of the run was profiled.
+        """
+        return None
+
+    def rows(self):
+        """
+        Iterate over the lines of the function.
+
+        Each line is given as a (line number, code, total time, time per
+        hit, hits, percent) tuple, where values are None for lines that
+        didn't run.
+        """
+        for pos in range(len(self.lines)):
+            yield (self.get_line_no(pos), self.get_code(pos),
+                   self.get_time(pos), self.get_perhit(pos),
+                   self.get_hits(pos), self.get_percent(pos))
+
+
+class RepeatedFunctionResult(FunctionResult):
+    """
+    Line profiler results of a function over several runs of a script.
+
+    `times`, `hits` and `total_time` are the means of the runs. The
+    standard deviation, minimum and half-width of the 95% confidence
+    interval of the time of each line are also kept, in seconds.
+    """
+    __slots__ = ('runs', 'stddevs', 'mins', 'errors', 'total_error')
+
+    def __init__(self, func_info, lines, times, hits, total_time, runs,
+                 stddevs, mins, errors, total_error):
+        super().__init__(func_info, lines, times, hits, total_time)
+        self.runs = runs
+        self.stddevs = stddevs
+        self.mins = mins
+        self.errors = errors
+        self.total_error = total_error
+
+    @classmethod
+    def from_runs(cls, results):
+        """
+        Combine the FunctionResult of a function in several runs.
+
+        Lines that ran in some runs only count as taking no time in the
+        others.
+        """
+        first = results[0]
+        nruns = len(results)
+        nlines = len(first)
+        times = array('d', itertools.repeat(NOT_RUN, nlines))
+        hits = array('q', itertools.repeat(0, nlines))
+        stddevs = array('d', itertools.repeat(NOT_RUN, nlines))
+        mins = array('d', itertools.repeat(NOT_RUN, nlines))
+        errors = array('d', itertools.repeat(NOT_RUN, nlines))
+        for pos in range(nlines):
+            line_hits = [result.hits[pos] for result in results]
+            if not any(line_hits):
+                continue
+            samples = [result.times[pos] if result.hits[pos] else 0.0
+                       for result in results]
+            times[pos], stddevs[pos], errors[pos] = mean_and_error(samples)
+            mins[pos] = min(samples)
+            hits[pos] = max(round(sum(line_hits) / nruns), 1)
+        total_time, _total_stddev, total_error = mean_and_error(
+            [result.total_time for result in results])
+        return cls(first.func_info, first.lines, times, hits, total_time,
+                   nruns, stddevs, mins, errors, total_error)
+
+    def get_stddev(self, pos):
+        """Standard deviation of the time of line `pos`, or None."""
+        return self.stddevs[pos] if self.hits[pos] else None
+
+    def get_min(self, pos):
+        """Shortest time of line `pos` among the runs, or None."""
+        return self.mins[pos] if self.hits[pos] else None
+
+    def get_error(self, pos):
+        return self.errors[pos] if self.hits[pos] else None
+
+
+class ProcessFunctionResult(FunctionResult):
+    """
+    Line profiler results of a function in a script and its children.
+
+    The timings are the totals of all processes. `processes` lists the
+    (process label, FunctionResult) of the processes where the function
+    ran.
+    """
+    __slots__ = ('processes',)
+
+    def __init__(self, func_info, lines, times, hits, total_time,
+                 processes):
+        super().__init__(func_info, lines, times, hits, total_time)
+        self.processes = processes
+
+    @classmethod
+    def from_processes(cls, total, results):
+        """
+        Combine the total result of a function with that of each process.
+
+        `results` are (process label, FunctionResult) pairs.
+        """
+        processes = [(label, result) for label, result in results
+                     if any(result.hits)]
+        return cls(total.func_info, total.lines, total.times, total.hits,
+                   total.total_time, processes)
+
+    def get_process_times(self, pos):
+        """
+        Return the (process label, time, hits) of each process which ran
+        line `pos`.
+        """
+        return [(label, result.get_time(pos), result.get_hits(pos))
+                for label, result in self.processes if result.hits[pos]]
+
+
+class ContextFunctionResult(FunctionResult):
+    """
+    Line profiler results of a function, broken down by thread and task.
+
+    `suspended` has the time in seconds each line spent suspended in an
+    await, which is not part of its time, and zero for other lines.
+    `context` is the label of the thread or task of the results, or None
+    if they are the totals of all contexts. `contexts` lists the
+    (thread, task, ContextFunctionResult) of the contexts which ran the
+    function, `task` being None for code that didn't run in a task.
+    """
+    __slots__ = ('suspended', 'context', 'contexts')
+
+    def __init__(self, func_info, lines, times, hits, total_time, suspended,
+                 context=None, contexts=()):
+        super().__init__(func_info, lines, times, hits, total_time)
+        self.suspended = suspended
+        self.context = context
+        self.contexts = contexts
+
+    @classmethod
+    def from_contexts(cls, contexts, context=None):
+        """
+        Sum the results of a function in several contexts.
+
+        `contexts` are (thread, task, ContextFunctionResult) tuples.
+        """
+        first = contexts[0][2]
+        nlines = len(first)
+        times = array('d', itertools.repeat(NOT_RUN, nlines))
+        hits = array('q', itertools.repeat(0, nlines))
+        suspended = array('d', itertools.repeat(0.0, nlines))
+        for _thread, _task, result in contexts:
+            for pos in range(nlines):
+                suspended[pos] += result.suspended[pos]
+                if not result.hits[pos]:
+                    continue
+                if hits[pos]:
+                    times[pos] += result.times[pos]
+                else:
+                    times[pos] = result.times[pos]
+                hits[pos] += result.hits[pos]
+        total_time = math.fsum(result.total_time
+                               for _thread, _task, result in contexts)
+        return cls(first.func_info, first.lines, times, hits, total_time,
+                   suspended, context, list(contexts))
+
+    def get_suspended(self, pos):
+        """Time line `pos` spent suspended in seconds, or None."""
+        return self.suspended[pos] or None
+
+
+class MemoryFunctionResult(FunctionResult):
+    """
+    Line profiler results of a function, with the memory of its lines.
+
+    `memory` has the net memory allocated by each line over all its hits,
+    and `peaks` the most memory each line used above what was allocated
+    when it started, both in bytes and zero for lines that didn't run.
+    """
+    __slots__ = ('memory', 'peaks')
+
+    def __init__(self, func_info, lines, times, hits, total_time, memory,
+                 peaks):
+        super().__init__(func_info, lines, times, hits, total_time)
+        self.memory = memory
+        self.peaks = peaks
+
+    @property
+    def total_memory(self):
+        """Net memory allocated by the function in bytes."""
+        return sum(self.memory)
+
+    def get_memory(self, pos):
+        return self.memory[pos] if self.hits[pos] else None
+
+    def get_peak(self, pos):
+        return self.peaks[pos] if self.hits[pos] else None
+
+    def get_memory_percent(self, pos):
+        """
+        Memory allocated by line `pos` relative to the line of the
+        function allocating the most, or None.
+
+        Lines that freed memory count as allocating none.
+        """
+        if not self.hits[pos]:
+            return None
+        largest = max(self.memory, default=0.0)
+        if largest <= 0:
+            return 0.0
+        return max(self.memory[pos], 0.0) / largest
+
+    def get_peak_percent(self, pos):
+        """
+        Peak of line `pos` relative to the highest peak of the function,
+        or None.
+        """
+        if not self.hits[pos]:
+            return None
+        largest = max(self.peaks, default=0.0)
+        if largest <= 0:
+            return 0.0
+        return self.peaks[pos] / largest
+
+
+class _StoredColumns:
+    """
+    Mixin for results whose arrays are read from a stats file when they
+    are first used, by calling `_read_columns`.
+    """
+    __slots__ = ()
+    STORED_COLUMNS = ()
+
+    def __getattr__(self, name):
+        # Only called for the arrays that were not read yet
+        if name not in self.STORED_COLUMNS:
+            raise AttributeError(name)
+        for column_name, column in self._read_columns().items():
+            setattr(self, column_name, column)
+        return getattr(self, name)
+
+
+class StoredFunctionResult(_StoredColumns, FunctionResult):
+    """FunctionResult whose timings are read from a stats file."""
+    __slots__ = ('_read_columns',)
+    STORED_COLUMNS = ('times', 'hits')
+
+    def __init__(self, func_info, lines, total_time, read_columns):
+        self.filename, self.start_line_no, self.func_name = func_info
+        self.lines = tuple(lines)
+        self.total_time = total_time
+        self._read_columns = read_columns
+
+
+class StoredMemoryFunctionResult(_StoredColumns, MemoryFunctionResult):
+    """MemoryFunctionResult whose lines are read from a stats file."""
+    __slots__ = ('_read_columns',)
+    STORED_COLUMNS = ('times', 'hits', 'memory', 'peaks')
+
+    def __init__(self, func_info, lines, total_time, read_columns):
+        self.filename, self.start_line_no, self.func_name = func_info
+        self.lines = tuple(lines)
+        self.total_time = total_time
+        self._read_columns = read_columns
+
+
+class ProcessStats:
+    """
+    Line profiler statistics of a script and of its child processes.
+
+    `timings` and `unit` are the summed statistics, laid out like those of
+    `line_profiler.LineStats`. `processes` are the (label, timings) of
+    each process, with timings in the same unit. `sampled` is whether the
+    processes were sampled, in which case hits are numbers of samples.
+    """
+
+    def __init__(self, timings, unit, processes, sampled=False):
+        self.timings = timings
+        self.unit = unit
+        self.processes = processes
+        self.sampled = sampled
+
+
+class ContextStats:
+    """
+    Line profiler statistics broken down by thread and asyncio task.
+
+    `timings` and `unit` are the summed statistics, laid out like those of
+    `line_profiler.LineStats`. `contexts` are the (thread, task, timings,
+    suspended) of each context, with timings in the same unit and
+    suspended times in seconds, by (filename, first line, line).
+    """
+
+    def __init__(self, timings, unit, contexts):
+        self.timings = timings
+        self.unit = unit
+        self.contexts = contexts
+
+
+class RepeatedStats:
+    """
+    Line profiler statistics of several runs of a script.
+
+    `timings` and `unit` are the summed statistics, laid out like those of
+    `line_profiler.LineStats`. `repeats` are the timings of each run, in
+    the same unit. `sampled` is whether the runs were sampled, in which
+    case hits are numbers of samples.
+    """
+
+    def __init__(self, timings, unit, repeats, sampled=False):
+        self.timings = timings
+        self.unit = unit
+        self.repeats = repeats
+        self.sampled = sampled
+
+
+class _RunStats:
+    """Timings of a single run, as needed by `compute_results`."""
+    __slots__ = ('timings', 'unit')
+
+    def __init__(self, timings, unit):
+        self.timings = timings
+        self.unit = unit
+
+
+class ProfileResult(Mapping):
+    """
+    Line profiler results of a run, loaded from `path`.
+
+    This maps the (filename, first line, function name) of each profiled
+    function to its FunctionResult. If the run was `sampled` (see
+    bootstrap/sampler.py), hits are numbers of samples and times are
+    estimated from them. If the lines of functions are read from the
+    StatsFile `stats_file`, it is moved along when `path` is set, which
+    is done after moving the file.
+    """
+    __slots__ = ('_path', '_functions', 'sampled', '_stats_file')
+
+    def __init__(self, path, functions, sampled=False, stats_file=None):
+        self._path = path
+        self._functions = functions
+        self.sampled = sampled
+        self._stats_file = stats_file
+
+    @property
+    def path(self):
+        return self._path
+
+    @path.setter
+    def path(self, path):
+        self._path = path
+        if self._stats_file is not None:
+            self._stats_file.path = path
+
+    def __getitem__(self, func_info):
+        return self._functions[func_info]
+
+    def __iter__(self):
+        return iter(self._functions)
+
+    def __len__(self):
+        return len(self._functions)
+
+
+# Two-sided 95% quantiles of Student's t distribution by degrees of freedom
+T_QUANTILES = (
+    12.706, 4.303, 3.182, 2.776, 2.571, 2.447, 2.365, 2.306, 2.262, 2.228,
+    2.201, 2.179, 2.160, 2.145, 2.131, 2.120, 2.110, 2.101, 2.093, 2.086,
+    2.080, 2.074, 2.069, 2.064, 2.060, 2.056, 2.052, 2.048, 2.045, 2.042)
+NORMAL_QUANTILE = 1.960
+
+
+def mean_and_error(samples):
+    """
+    Return the mean, standard deviation and confidence interval of samples.
+
+    The confidence interval is given by the half-width of the 95% interval
+    of the mean, using Student's t distribution. The standard deviation
+    and interval are zero if there is a single sample.
+    """
+    count = len(samples)
+    mean = math.fsum(samples) / count
+    if count < 2:
+        return mean, 0.0, 0.0
+    stddev = math.sqrt(
+        math.fsum((sample - mean) ** 2 for sample in samples) / (count - 1))
+    if count - 1 <= len(T_QUANTILES):
+        quantile = T_QUANTILES[count - 2]
+    else:
+        quantile = NORMAL_QUANTILE
+    return mean, stddev, quantile * stddev / math.sqrt(count)
+
+
+def _scale_timings(lstats, unit):
+    """Return the timings of `lstats` converted to `unit` seconds."""
+    scale = lstats.unit / unit
+    return {func_info: [(line_no, hits, time * scale)
+                        for line_no, hits, time in stats]
+            for func_info, stats in lstats.timings.items()}
+
+
+def _sum_timings(timings_list):
+    """Sum timings given in the same unit."""
+    totals = {}
+    for timings in timings_list:
+        for func_info, stats in timings.items():
+            func_totals = totals.setdefault(func_info, {})
+            for line_no, hits, time in stats:
+                line_hits, line_time = func_totals.get(line_no, (0, 0))
+                func_totals[line_no] = (line_hits + hits, line_time + time)
+    return {
+        func_info: [(line_no, hits, time)
+                    for line_no, (hits, time) in sorted(func_totals.items())]
+        for func_info, func_totals in totals.items()}
+
+
+class _StatsUnpickler(pickle.Unpickler):
+    """
+    Unpickler of line profiler statistics, which only creates the classes
+    they are made of, so that loading files shared by others can't run
+    any code.
+    """
+    SAFE_CLASSES = {
+        ('line_profiler.line_profiler', 'LineStats'),
+        ('line_profiler', 'LineStats'),
+        # Statistics of bootstrap/sampler.py and bootstrap/memory.py
+        ('types', 'SimpleNamespace'),
+    } | {('builtins', name) for name in (
+        'bool', 'bytes', 'complex', 'dict', 'float', 'frozenset', 'int',
+        'list', 'set', 'str', 'tuple')}
+
+    def find_class(self, module, name):
+        if (module, name) not in self.SAFE_CLASSES:
+            raise pickle.UnpicklingError(
+                'Profiling results cannot contain {}.{}'.format(module, name))
+        return super().find_class(module, name)
+
+
+def _load_pickle(profdatafile):
+    """
+    Load the pickled statistics saved in `profdatafile`, such as those
+    saved by kernprof.
+
+    Raises pickle.UnpicklingError if the file has objects other than line
+    profiler statistics.
+    """
+    with open(profdatafile, 'rb') as fid:
+        return _StatsUnpickler(fid).load()
+
+
+def _read_stats_file(stats):
+    """
+    Read back the statistics of the StatsFile `stats`, with their
+    breakdown, if any.
+
+    Times are in seconds, and the memory of lines is not read.
+    """
+    def get_timings(func_info, columns):
+        return [(func_info[1] + pos, hits, time)
+                for pos, (hits, time) in enumerate(zip(columns['hits'],
+                                                       columns['times']))
+                if time == time]
+
+    timings = {}
+    part_timings = [{} for _labels in stats.parts]
+    part_suspended = [{} for _labels in stats.parts]
+    for index, func_info in enumerate(stats.functions):
+        columns = stats.read_columns(index, stats.get_nlines(index))
+        timings[func_info] = get_timings(func_info, columns)
+        filename, start_line_no = func_info[:2]
+        for part_index, columns in stats.read_breakdown(index):
+            part_timings[part_index][func_info] = get_timings(func_info,
+                                                              columns)
+            suspended = part_suspended[part_index]
+            for pos, seconds in enumerate(columns.get('suspended', ())):
+                if seconds:
+                    suspended[filename, start_line_no,
+                              start_line_no + pos] = seconds
+
+    if stats.breakdown == 'repeats':
+        return RepeatedStats(timings, 1.0, part_timings, stats.sampled)
+    if stats.breakdown == 'processes':
+        return ProcessStats(
+            timings, 1.0,
+            [(label, process_timings) for (label, _task), process_timings
+             in zip(stats.parts, part_timings)],
+            stats.sampled)
+    if stats.breakdown == 'contexts':
+        return ContextStats(
+            timings, 1.0,
+            [(thread, task, context_timings, suspended)
+             for (thread, task), context_timings, suspended
+             in zip(stats.parts, part_timings, part_suspended)])
+    return types.SimpleNamespace(timings=timings, unit=1.0,
+                                 sampled=stats.sampled)
+
+
+def read_stats(profdatafile):
+    """
+    Read the line profiler statistics saved in `profdatafile`.
+
+    The statistics of stats files (see statsfile.py) are read back with
+    times in seconds, without the memory of lines. Those broken down are
+    read back as a RepeatedStats, ProcessStats or ContextStats.
+    """
+    if not is_stats_file(profdatafile):
+        return _load_pickle(profdatafile)
+    return _read_stats_file(StatsFile(profdatafile))
+
+
+def _report_progress(done, total, progress, cancelled):
+    """
+    Call `progress` with the number of files read so far, if given, or
+    raise LoadingCancelled if the event `cancelled` is set.
+    """
+    if cancelled is not None and cancelled.is_set():
+        raise LoadingCancelled
+    if progress is not None:
+        progress(done, total)
+
+
+def merge_stats(lstats_list):
+    """
+    Merge the line profiler statistics of several runs of a script.
+
+    Returns a RepeatedStats in the unit of the first run.
+    """
+    unit = lstats_list[0].unit
+    repeats = [_scale_timings(lstats, unit) for lstats in lstats_list]
+    sampled = all(getattr(lstats, 'sampled', False)
+                  for lstats in lstats_list)
+    return RepeatedStats(_sum_timings(repeats), unit, repeats, sampled)
+
+
+def merge_process_data(profdatafile, shardfiles, outfile, progress=None,
+                       cancelled=None):
+    """
+    Merge the statistics of a script with those of its child processes.
+
+    `profdatafile` has the statistics of the script and `shardfiles` those
+    written by its children, as described in bootstrap/shards.py. The
+    merged statistics are saved to `outfile`, which can be the same file
+    as `profdatafile`, and is a stats file (see statsfile.py).
+
+    `progress` is called with the number of shard files read so far and
+    the total number of shard files. Raises LoadingCancelled if the event
+    `cancelled` is set.
+    """
+    lstats = read_stats(profdatafile)
+    unit = lstats.unit
+    processes = [('Main process', _scale_timings(lstats, unit))]
+    for index, shardfile in enumerate(shardfiles):
+        _report_progress(index, len(shardfiles), progress, cancelled)
+        shard = _load_pickle(shardfile)
+        processes.append((
+            '{name} (pid {pid})'.format(name=shard['name'], pid=shard['pid']),
+            _scale_timings(shard['stats'], unit)))
+    _report_progress(len(shardfiles), len(shardfiles), progress, cancelled)
+    merged = ProcessStats(
+        _sum_timings([timings for _label, timings in processes]), unit,
+        processes)
+    write_stats_file(merged, outfile)
+
+
+def merge_context_data(profdatafile, breakdownfile, outfile,
+                       progress=None, cancelled=None):
+    """
+    Merge the statistics of a script with their breakdown by context.
+
+    `breakdownfile` is written by the ContextProfiler of the profiled
+    script, as described in bootstrap/breakdown.py. The merged statistics
+    are saved to `outfile`, which can be the same file as `profdatafile`,
+    and is a stats file (see statsfile.py).
+
+    `progress` is called with the number of contexts merged so far and
+    the total number of contexts. Raises LoadingCancelled if the event
+    `cancelled` is set.
+    """
+    lstats = read_stats(profdatafile)
+    breakdown = _load_pickle(breakdownfile)
+    unit = lstats.unit
+    contexts = []
+    for index, context in enumerate(breakdown):
+        _report_progress(index, len(breakdown), progress, cancelled)
+        contexts.append((context['thread'], context['task'],
+                         _scale_timings(context['stats'], unit),
+                         context['suspended']))
+    _report_progress(len(breakdown), len(breakdown), progress, cancelled)
+    merged = ContextStats(_scale_timings(lstats, unit), unit, contexts)
+    write_stats_file(merged, outfile)
+
+
+def merge_profile_data(profdatafiles, outfile, progress=None,
+                       cancelled=None):
+    """
+    Merge the statistics saved by several runs of kernprof into `outfile`.
+
+    The merged file is a stats file (see statsfile.py), which
+    `load_profile_data` loads as statistics over the runs.
+
+    `progress` is called with the number of files read so far and the
+    total number of files. Raises LoadingCancelled if the event
+    `cancelled` is set.
+    """
+    lstats_list = []
+    for profdatafile in profdatafiles:
+        _report_progress(len(lstats_list), len(profdatafiles), progress,
+                         cancelled)
+        lstats_list.append(read_stats(profdatafile))
+    _report_progress(len(lstats_list), len(profdatafiles), progress,
+                     cancelled)
+    write_stats_file(merge_stats(lstats_list), outfile)
+
+
+def _merge_shards(shards, breakdown):
+    """
+    Read and sum the statistics of `shards`, a list of (label, path).
+
+    Returns the unit of the first shard, the summed timings and the
+    (label, timings) of each shard in that unit if `breakdown` is True,
+    and whether all shards were sampled.
+    """
+    unit = None
+    shard_timings = []
+    sampled = True
+    for label, path in shards:
+        lstats = read_stats(path)
+        if unit is None:
+            unit = lstats.unit
+        shard_timings.append((label, _scale_timings(lstats, unit)))
+        sampled = sampled and getattr(lstats, 'sampled', False)
+    totals = _sum_timings([timings for _label, timings in shard_timings])
+    return unit, totals, shard_timings if breakdown else [], sampled
+
+
+def merge_shard_data(shardfiles, outfile, breakdown=False, jobs=None,
+                     progress=None, cancelled=None):
+    """
+    Merge the statistics saved by separate runs into `outfile`.
+
+    `shardfiles` are files saved by kernprof, such as those of jobs run
+    on other machines, or stats files. Hits and times are summed for
+    each line. The files are read in chunks by a pool of `jobs`
+    processes (by default, one per CPU) if there are several chunks.
+
+    `outfile` is a stats file (see statsfile.py). If `breakdown` is
+    True, the statistics of each file are also kept, labelled with its
+    path, and `load_profile_data` gives a ProcessFunctionResult for each
+    function.
+
+    `progress` is called with the number of files read so far and the
+    total number of files. Raises LoadingCancelled if the event
+    `cancelled` is set.
+    """
+    if not shardfiles:
+        raise ValueError('No files to merge')
+    if len(shardfiles) > 1:
+        root = osp.commonpath([osp.abspath(path) for path in shardfiles])
+        labels = [osp.relpath(osp.abspath(path), root)
+                  for path in shardfiles]
+    else:
+        labels = [osp.basename(shardfiles[0])]
+    shards = list(zip(labels, shardfiles))
+    if jobs is None:
+        jobs = os.cpu_count() or 1
+    # Several chunks per process, so that processes are kept busy
+    chunk_size = max(1, math.ceil(len(shards) / (4 * jobs)))
+    chunks = [shards[start:start + chunk_size]
+              for start in range(0, len(shards), chunk_size)]
+
+    def check_cancelled(done):
+        if cancelled is not None and cancelled.is_set():
+            raise LoadingCancelled
+        if progress is not None:
+            progress(done, len(shards))
+
+    merged = []
+    if len(chunks) < 2 or jobs == 1:
+        for chunk in chunks:
+            check_cancelled(len(merged) * chunk_size)
+            merged.append(_merge_shards(chunk, breakdown))
+    else:
+        # Forking a process running Qt threads can deadlock. The workers
+        # are terminated when leaving the pool, so that they stop reading
+        # files as soon as loading is cancelled.
+        with multiprocessing.get_context('spawn').Pool(jobs) as pool:
+            pending = [pool.apply_async(_merge_shards, (chunk, breakdown))
+                       for chunk in chunks]
+            for chunk_result in pending:
+                check_cancelled(len(merged) * chunk_size)
+                while not chunk_result.ready():
+                    chunk_result.wait(0.1)
+                    check_cancelled(len(merged) * chunk_size)
+                merged.append(chunk_result.get())
+    check_cancelled(len(shards))
+
+    unit = merged[0][0]
+    shard_timings = [
+        (label, _scale_timings(_RunStats(timings, chunk_unit), unit))
+        for chunk_unit, _totals, chunk_timings, _sampled in merged
+        for label, timings in chunk_timings]
+    totals = _sum_timings([
+        _scale_timings(_RunStats(chunk_totals, chunk_unit), unit)
+        for chunk_unit, chunk_totals, _timings, _sampled in merged])
+    sampled = all(chunk[3] for chunk in merged)
+    write_stats_file(ProcessStats(totals, unit, shard_timings, sampled),
+                     outfile)
+
+
+def compute_function_result(func_info, stats, unit, block_lines):
+    """
+    Compute the results of a function.
+
+    `stats` are the (line number, hits, time) timings of the function in
+    `unit` seconds and `block_lines` its lines of code.
+    """
+    start_line_no = func_info[1]
+    times = array('d', itertools.repeat(NOT_RUN, len(block_lines)))
+    hits = array('q', itertools.repeat(0, len(block_lines)))
+
+    # Loop on each line of code
+    func_total_time = 0.0
+    next_stat_line = 0
+    for pos in range(len(block_lines)):
+        line_no = start_line_no + pos
+        if (next_stat_line >= len(stats)
+                or line_no != stats[next_stat_line][0]):
+            continue  # Line didn't run
+
+        # Compute line times
+        line_hits, line_total_time = stats[next_stat_line][1:]
+        line_total_time *= unit
+        times[pos] = line_total_time
+        hits[pos] = line_hits
+        func_total_time += line_total_time
+        next_stat_line += 1
+
+    return FunctionResult(func_info, block_lines, times, hits,
+                          func_total_time)
+
+
+def compute_results_numpy(lstats, blocks):
+    """
+    Compute the results of all functions at once with NumPy.
+
+    The timings of all functions are concatenated in a single array, in
+    which each function is a segment given by its offset. `blocks` are
+    the lines of code of the functions. Gives the same result as calling
+    `compute_function_result` for each function.
+    """
+    timings = lstats.timings
+    func_infos = list(timings)
+    nfuncs = len(func_infos)
+    start_line_nos = np.fromiter(
+        (func_info[1] for func_info in func_infos), np.int64, nfuncs)
+    block_sizes = np.fromiter(
+        (len(block_lines) for block_lines in blocks), np.int64, nfuncs)
+    block_offsets = np.zeros(nfuncs + 1, np.int64)
+    np.cumsum(block_sizes, out=block_offsets[1:])
+    stat_sizes = np.fromiter(
+        (len(stats) for stats in timings.values()), np.int64, nfuncs)
+    records = np.fromiter(
+        itertools.chain.from_iterable(timings.values()),
+        dtype=[('line_no', np.int64), ('hits', np.int64),
+               ('time', np.float64)],
+        count=int(stat_sizes.sum()))
+
+    # Position of each timing in the concatenated lines of code
+    stat_funcs = np.repeat(np.arange(nfuncs), stat_sizes)
+    positions = records['line_no'] - start_line_nos[stat_funcs]
+    valid = (positions >= 0) & (positions < block_sizes[stat_funcs])
+    stat_funcs = stat_funcs[valid]
+    positions = block_offsets[stat_funcs] + positions[valid]
+    stat_times = records['time'][valid] * lstats.unit
+
+    # Segmented sums giving the total time of each function
+    func_total_times = np.bincount(
+        stat_funcs, weights=stat_times, minlength=nfuncs)
+
+    nlines = int(block_offsets[-1])
+    times = np.full(nlines, NOT_RUN)
+    times[positions] = stat_times
+    hits = np.zeros(nlines, np.int64)
+    hits[positions] = records['hits'][valid]
+
+    results = dict()
+    for func_index, func_info in enumerate(func_infos):
+        first, last = block_offsets[func_index:func_index + 2].tolist()
+        func_times = array('d')
+        func_times.frombytes(times[first:last].tobytes())
+        func_hits = array('q')
+        func_hits.frombytes(hits[first:last].tobytes())
+        results[func_info] = FunctionResult(
+            func_info, blocks[func_index], func_times, func_hits,
+            float(func_total_times[func_index]))
+    return results
+
+
+def compute_results(lstats, blocks):
+    """
+    Compute the results of all functions in `lstats`.
+
+    `blocks` are the lines of code of the functions. NumPy is used if it
+    is available.
+    """
+    if np is not None:
+        return compute_results_numpy(lstats, blocks)
+    return {
+        func_info: compute_function_result(
+            func_info, stats, lstats.unit, block_lines)
+        for (func_info, stats), block_lines in zip(lstats.timings.items(),
+                                                   blocks)}
+
+
+def compute_repeated_results(lstats, blocks):
+    """
+    Compute the results of all functions over the runs of a RepeatedStats.
+
+    `blocks` are the lines of code of the functions in `lstats.timings`.
+    """
+    runs = [
+        compute_results(
+            _RunStats({func_info: timings.get(func_info, [])
+                       for func_info in lstats.timings}, lstats.unit),
+            blocks)
+        for timings in lstats.repeats]
+    return {func_info: RepeatedFunctionResult.from_runs(
+                [results[func_info] for results in runs])
+            for func_info in lstats.timings}
+
+
+def compute_process_results(lstats, blocks):
+    """
+    Compute the results of all functions of a ProcessStats, with the
+    results of each process.
+
+    `blocks` are the lines of code of the functions in `lstats.timings`.
+    """
+    totals = compute_results(lstats, blocks)
+    processes = [
+        (label, compute_results(
+            _RunStats({func_info: timings.get(func_info, [])
+                       for func_info in lstats.timings}, lstats.unit),
+            blocks))
+        for label, timings in lstats.processes]
+    return {func_info: ProcessFunctionResult.from_processes(
+                total, [(label, results[func_info])
+                        for label, results in processes])
+            for func_info, total in totals.items()}
+
+
+def compute_memory_results(lstats, blocks):
+    """
+    Compute the results of all functions of statistics with memory, as
+    saved by the memory profiler of bootstrap/memory.py.
+
+    `blocks` are the lines of code of the functions in `lstats.timings`.
+    """
+    results = {}
+    for func_info, result in compute_results(lstats, blocks).items():
+        start_line_no = result.start_line_no
+        nlines = len(result)
+        memory = array('d', itertools.repeat(0.0, nlines))
+        peaks = array('d', itertools.repeat(0.0, nlines))
+        for line_no, net, peak in lstats.memory.get(func_info, []):
+            pos = line_no - start_line_no
+            if 0 <= pos < nlines:
+                memory[pos] += net
+                peaks[pos] = max(peaks[pos], peak)
+        results[func_info] = MemoryFunctionResult(
+            func_info, result.lines, result.times, result.hits,
+            result.total_time, memory, peaks)
+    return results
+
+
+def compute_stored_results(stats, blocks):
+    """
+    Compute the results of all functions of the StatsFile `stats`.
+
+    `blocks` are the lines of code of the functions. The lines of each
+    function are only read from `stats` when they are first used.
+    """
+    result_class = (StoredMemoryFunctionResult if stats.has_memory
+                    else StoredFunctionResult)
+    results = {}
+    for index, (func_info, block_lines) in enumerate(zip(stats.functions,
+                                                         blocks)):
+        read_columns = functools.partial(
+            stats.read_columns, index, len(block_lines))
+        total_time = stats.total_times[index]
+        if stats.get_nlines(index) > len(block_lines):
+            # The code changed, only its lines count in the total
+            total_time = math.fsum(
+                time for time in read_columns()['times'] if time == time)
+        results[func_info] = result_class(
+            func_info, block_lines, total_time, read_columns)
+    return results
+
+
+def compute_context_results(lstats, blocks):
+    """
+    Compute the results of all functions of a ContextStats, with the
+    results of each context.
+
+    `blocks` are the lines of code of the functions in `lstats.timings`.
+    """
+    func_infos = list(lstats.timings)
+    contexts = []
+    for thread, task, timings, suspended in lstats.contexts:
+        results = compute_results(
+            _RunStats({func_info: timings.get(func_info, [])
+                       for func_info in func_infos}, lstats.unit),
+            blocks)
+        for func_info, result in results.items():
+            if not any(result.hits):
+                continue
+            filename, start_line_no = func_info[:2]
+            func_suspended = array(
+                'd', (suspended.get((filename, start_line_no, line_no), 0.0)
+                      for line_no in result.line_nos))
+            contexts.append((thread, task, ContextFunctionResult(
+                func_info, result.lines, result.times, result.hits,
+                result.total_time, func_suspended)))
+
+    by_function = {func_info: [] for func_info in func_infos}
+    for thread, task, result in contexts:
+        by_function[result.func_info].append((thread, task, result))
+    totals = compute_results(lstats, blocks)
+    results = {}
+    for func_info, func_contexts in by_function.items():
+        if func_contexts:
+            results[func_info] = ContextFunctionResult.from_contexts(
+                func_contexts)
+        else:
+            results[func_info] = totals[func_info]
+    return results
+
+
+NO_TASK = 'No task'  # Label of the code that didn't run in a task
+
+PIVOTS = ('total', 'thread', 'task')
+
+
+def pivot_results(result, by='total'):
+    """
+    Break down the ProfileResult `result` by thread or by asyncio task.
+
+    `by` is one of PIVOTS. The breakdown of each function into contexts
+    gives a ContextFunctionResult for each thread or task, labelled by
+    its name, and the returned ProfileResult maps the (filename, first
+    line, function name, label) of these to them. Functions without a
+    breakdown are kept as they are.
+    """
+    if by == 'total':
+        return result
+    if by not in PIVOTS:
+        raise ValueError('Unknown pivot: {}'.format(by))
+    functions = {}
+    for func_info, func in result.items():
+        if not isinstance(func, ContextFunctionResult) or not func.contexts:
+            functions[func_info] = func
+            continue
+        groups = {}
+        for thread, task, context_result in func.contexts:
+            if by == 'thread':
+                label = thread
+            else:
+                label = NO_TASK if task is None else task
+            groups.setdefault(label, []).append(
+                (thread, task, context_result))
+        for label, contexts in groups.items():
+            functions[func_info + (label,)] = (
+                ContextFunctionResult.from_contexts(contexts, label))
+    return ProfileResult(result.path, functions, result.sampled)
+
+
+def convert_profile_data(profdatafile):
+    """
+    Convert the pickled statistics of `profdatafile` to a stats file.
+
+    The file is replaced by a stats file (see statsfile.py), which is
+    faster to load. Returns False if the statistics can't be stored in a
+    stats file, which leaves the file unchanged.
+    """
+    if is_stats_file(profdatafile):
+        return True
+    lstats = _load_pickle(profdatafile)
+    if not can_store(lstats):
+        return False
+    write_stats_file(lstats, profdatafile)
+    return True
+
+
+def _read_blocks(func_infos, block_cache, code, progress, cancelled):
+    """Read the code of the functions `func_infos`."""
+    # Read the code of each function, including the @profile decorator
+    if block_cache is None:
+        block_cache = BlockCache()
+    blocks = []
+    linecache.checkcache()
+    nfuncs = len(func_infos)
+    for func_index, func_info in enumerate(func_infos):
+        if cancelled is not None and cancelled.is_set():
+            raise LoadingCancelled
+        if progress is not None:
+            progress(func_index, nfuncs)
+
+        # func_info is a tuple containing (filename, line, function anme)
+        filename, start_line_no = func_info[:2]
+        if code is not None and (filename, start_line_no) in code:
+            blocks.append(code[filename, start_line_no])
+        else:
+            blocks.append(block_cache.get_block(filename, start_line_no))
+    block_cache.save()
+
+    if cancelled is not None and cancelled.is_set():
+        raise LoadingCancelled
+    return blocks
+
+
+def load_profile_data(profdatafile, block_cache=None, progress=None,
+                      cancelled=None, code=None, convert=False):
+    """
+    Load line profiler data saved by kernprof module, or a stats file.
+
+    Files written by `merge_profile_data` give RepeatedFunctionResult for
+    each function, those written by `merge_process_data` give
+    ProcessFunctionResult and those written by `merge_context_data` give
+    ContextFunctionResult. Statistics with the memory of lines give
+    MemoryFunctionResult. Other stats files (see statsfile.py) give
+    StoredFunctionResult or StoredMemoryFunctionResult, whose lines are
+    only read when they are used. If `convert` is True, pickled
+    statistics are first converted to a stats file, when possible.
+
+    `block_cache` is the BlockCache used to find the code of functions in
+    source files. A new one is used if not given.
+
+    `code` maps the (filename, first line) of functions to their lines of
+    code, which are then used instead of the current source files. This
+    is needed for results of runs of older versions of the code.
+
+    `progress` is called with the number of functions processed so far
+    and the total number of functions. If the `cancelled` event is set,
+    loading stops by raising LoadingCancelled.
+    """
+    # lstats has the following layout :
+    # lstats.timings =
+    #     {(filename1, line_no1, function_name1):
+    #         [(line_no1, hits1, total_time1),
+    #          (line_no2, hits2, total_time2)],
+    #      (filename2, line_no2, function_name2):
+    #         [(line_no1, hits1, total_time1),
+    #          (line_no2, hits2, total_time2),
+    #          (line_no3, hits3, total_time3)]}
+    # lstats.unit = time_factor
+    if convert:
+        convert_profile_data(profdatafile)
+    if is_stats_file(profdatafile):
+        stats = StatsFile(profdatafile)
+        if stats.breakdown is None:
+            blocks = _read_blocks(stats.functions, block_cache, code,
+                                  progress, cancelled)
+            return ProfileResult(profdatafile,
+                                 compute_stored_results(stats, blocks),
+                                 stats.sampled, stats_file=stats)
+        # The results of each part are computed from all their lines
+        lstats = _read_stats_file(stats)
+    else:
+        lstats = _load_pickle(profdatafile)
+    blocks = _read_blocks(list(lstats.timings), block_cache, code,
+                          progress, cancelled)
+    if getattr(lstats, 'repeats', None):
+        functions = compute_repeated_results(lstats, blocks)
+    elif getattr(lstats, 'processes', None):
+        functions = compute_process_results(lstats, blocks)
+    elif getattr(lstats, 'contexts', None):
+        functions = compute_context_results(lstats, blocks)
+    elif getattr(lstats, 'memory', None):
+        functions = compute_memory_results(lstats, blocks)
+    else:
+        functions = compute_results(lstats, blocks)
+    return ProfileResult(profdatafile, functions,
+                         getattr(lstats, 'sampled', False))
@@ -0,0 +1,206 @@
+# -*- coding: utf-8 -*-
+#
+# -----------------------------------------------------------------------------
+# Copyright (c) 2013- Spyder Project Contributors
+#
+# Released under the terms of the MIT License
+# (see LICENSE.txt in the project root directory for details)
+# -----------------------------------------------------------------------------
+
+"""
+Cache of the lines spanned by the functions of source files.
+"""
+
+# Standard library imports
+import inspect
+import json
+import linecache
+import logging
+import os
+import threading
+import tokenize
+
+logger = logging.getLogger(__name__)
+
+
+def find_blocks(lines):
+    """
+    Find the extents of all function and class blocks in `lines`.
+
+    The source is tokenized only once. Returns a dict mapping the first
+    line of each block (its first decorator if any, as well as the line
+    of the ``def`` or ``class`` statement) to its last line, with the
+    same result as ``inspect.getblock``. Lines start at 1.
+    """
+    blocks = {}
+    stack = []           # Open blocks: [first lines, depth, body col, last]
+    depth = 0            # Current indentation level
+    new_statement = True
+    decorator_line = None
+    header = None        # Block whose `def` or `class` line is being read
+    header_done = False  # Whether the header line has ended
+
+    def close(block):
+        for first_line in block[0]:
+            blocks[first_line] = block[3]
+        if stack:
+            stack[-1][3] = max(stack[-1][3], block[3])
+
+    try:
+        for token in tokenize.generate_tokens(iter(lines).__next__):
+            token_type, string, (row, col), (_, end_col), _ = token
+            if token_type in (tokenize.NL, tokenize.COMMENT):
+                if token_type == tokenize.COMMENT:
+                    # Include comments indented at least as much as the body
+                    for block in stack:
+                        if col >= block[2]:
+                            block[3] = max(block[3], row)
+                continue
+
+            if header_done:
+                header_done = False
+                if token_type == tokenize.INDENT:
+                    header[2] = end_col
+                    stack.append(header)
+                else:
+                    close(header)  # Block on a single line
+                header = None
+
+            if token_type == tokenize.NEWLINE:
+                new_statement = True
+                if header is not None:
+                    header[3] = row
+                    header_done = True
+                elif stack:
+                    stack[-1][3] = row
+                continue
+            elif token_type == tokenize.INDENT:
+                depth += 1
+                new_statement = True
+                continue
+            elif token_type == tokenize.DEDENT:
+                depth -= 1
+                while stack and stack[-1][1] >= depth:
+                    close(stack.pop())
+                new_statement = True
+                continue
+            elif token_type == tokenize.ENDMARKER:
+                break
+
+            if new_statement:
+                new_statement = False
+                if string == '@':
+                    if decorator_line is None:
+                        decorator_line = row
+                elif string == 'async':
+                    # The statement is given by the keyword that follows
+                    new_statement = True
+                elif string in ('def', 'class'):
+                    first_lines = {row}
+                    if decorator_line is not None:
+                        first_lines.add(decorator_line)
+                    header = [first_lines, depth, None, row]
+                    decorator_line = None
+                else:
+                    decorator_line = None
+    except (tokenize.TokenError, SyntaxError):
+        # Blocks that can't be found are handled by inspect.getblock
+        logger.debug('Could not tokenize source', exc_info=True)
+
+    if header is not None and header_done:
+        close(header)
+    while stack:
+        close(stack.pop())
+    return blocks
+
+
+class BlockCache:
+    """
+    Cache of the function and class blocks of source files.
+
+    Each file is tokenized once to find all its blocks, and the result is
+    kept as long as its modification time and size don't change. If
+    `path` is given, the cache is loaded from and saved to that file so
+    that it persists across sessions. The cache can be used from several
+    threads.
+    """
+    MAX_FILES = 1000
+
+    def __init__(self, path=None):
+        self.path = path
+        self._files = {}  # filename: (mtime_ns, size, {first: last line})
+        self._modified = False
+        self._lock = threading.Lock()
+        if path is not None:
+            self.load()
+
+    def get_block(self, filename, start_line_no):
+        """
+        Return the lines of the block starting at line `start_line_no`.
+
+        This is equivalent to ``inspect.getblock`` applied to the lines of
+        `filename` from `start_line_no` (starting at 1) onwards.
+        """
+        all_lines = linecache.getlines(filename)
+        last_line_no = self.get_blocks(filename, all_lines).get(
+            start_line_no)
+        if last_line_no is None:
+            return inspect.getblock(all_lines[start_line_no - 1:])
+        return all_lines[start_line_no - 1:last_line_no]
+
+    def get_blocks(self, filename, lines):
+        """
+        Return the blocks of `filename`, whose contents are `lines`.
+
+        See `find_blocks` for the format of the result.
+        """
+        try:
+            stat = os.stat(filename)
+        except OSError:
+            # Not a real file, e.g. code typed in a console
+            return {}
+        key = (stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            entry = self._files.get(filename)
+        if entry is not None and entry[:2] == key:
+            return entry[2]
+
+        blocks = find_blocks(lines)
+        with self._lock:
+            self._files.pop(filename, None)
+            self._files[filename] = key + (blocks,)
+            while len(self._files) > self.MAX_FILES:
+                # Dicts keep insertion order, so this drops the oldest file
+                del self._files[next(iter(self._files))]
+            self._modified = True
+        return blocks
+
+    def load(self):
+        """Load the cache from its file, if any."""
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                data = json.load(f)
+            self._files = {
+                filename: (mtime, size,
+                           {int(first): last for first, last in blocks})
+                for filename, (mtime, size, blocks) in data.items()}
+        except (OSError, ValueError, TypeError):
+            self._files = {}
+        self._modified = False
+
+    def save(self):
+        """Save the cache to its file if it was modified."""
+        with self._lock:
+            if self.path is None or not self._modified:
+                return
+            data = {filename: (mtime, size, list(blocks.items()))
+                    for filename, (mtime, size, blocks)
+                    in self._files.items()}
+            self._modified = False
+        tmp_path = self.path + '.tmp'
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f)
+            os.replace(tmp_path, self.path)
+        except OSError:
+            logger.debug('Could not save block cache', exc_info=True)
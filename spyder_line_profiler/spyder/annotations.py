@@ -0,0 +1,224 @@
+# -*- coding: utf-8 -*-
+#
+# -----------------------------------------------------------------------------
+# Copyright (c) 2013- Spyder Project Contributors
+#
+# Released under the terms of the MIT License
+# (see LICENSE.txt in the project root directory for details)
+# -----------------------------------------------------------------------------
+
+"""
+Heatmap of the profiled lines in the gutter of the Spyder editor.
+"""
+
+# Standard library imports
+import weakref
+
+# Third party imports
+from qtpy.QtCore import QObject, QSize, Signal
+from qtpy.QtGui import QColor, QPainter
+from qtpy.QtWidgets import QToolTip
+
+# Spyder imports
+from spyder.api.translations import get_translation
+from spyder.plugins.editor.api.panel import Panel
+from spyder.utils.palette import SpyderPalette
+
+# Local imports
+from spyder_line_profiler.heatmap import (
+    compute_heatmap, get_file_functions, normalize_path)
+
+# Localization
+_ = get_translation("spyder_line_profiler.spyder")
+
+HEAT_COLOR = SpyderPalette.COLOR_ERROR_2
+
+# Opacity of the lines that ran but took no time compared to others
+MIN_HEAT_ALPHA = 0.15
+
+
+class LineHeatmap(QObject):
+    """
+    Heat of the lines of the files profiled in the results shown.
+
+    The heat of a file is only computed when it is first requested by
+    the HeatmapPanel of an editor showing it, and then kept until other
+    results are shown.
+    """
+
+    sig_changed = Signal(object)
+    """
+    This signal is emitted when the heat of files shown by panels changed.
+
+    Parameters
+    ----------
+    paths: set
+        Normalized paths of the files whose heat changed.
+    """
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._result = None
+        self._functions = {}  # Functions of each profiled file
+        self._lines = {}  # Heat of the files that were requested
+        self._panels = weakref.WeakSet()
+
+    def is_profiled(self, filename):
+        """Return True if `filename` was profiled in the results shown."""
+        return bool(filename) and normalize_path(filename) in self._functions
+
+    def get_lines(self, filename):
+        """
+        Return the LineHeat of the lines of `filename` by line number, or
+        None if the file was not profiled.
+        """
+        if not filename:
+            return None
+        path = normalize_path(filename)
+        functions = self._functions.get(path)
+        if functions is None:
+            return None
+        lines = self._lines.get(path)
+        if lines is None:
+            lines = self._lines[path] = compute_heatmap(functions)
+        return lines
+
+    def set_result(self, result):
+        """
+        Show the heat of the ProfileResult `result`, or none if None.
+
+        Only the panels showing files of the previous or new results are
+        repainted.
+        """
+        if result is self._result:
+            return
+        functions = get_file_functions(result) if result is not None else {}
+        changed = self._functions.keys() | functions.keys()
+        self._result = result
+        self._functions = functions
+        self._lines = {}
+        changed &= self._get_panel_paths()
+        if changed:
+            self.sig_changed.emit(changed)
+
+    def add_panel(self, panel):
+        """Notify `panel` when the heat of the file it shows changes."""
+        self._panels.add(panel)
+
+    def remove_panel(self, panel):
+        self._panels.discard(panel)
+
+    def _get_panel_paths(self):
+        """Return the normalized paths of the files shown by panels."""
+        return {normalize_path(panel.editor.filename)
+                for panel in self._panels
+                if panel.editor is not None and panel.editor.filename}
+
+    def clear(self):
+        self.set_result(None)
+
+
+class HeatmapPanel(Panel):
+    """
+    Gutter of an editor shading the lines of the file by their time.
+
+    The panel is only shown for files with results, and only paints the
+    lines that are visible. Lines whose code changed since they were
+    profiled are not shaded.
+    """
+
+    def __init__(self, heatmap):
+        Panel.__init__(self)
+        self.heatmap = heatmap
+        self.scrollable = True
+        self.setMouseTracking(True)
+        heatmap.sig_changed.connect(self._on_heatmap_changed)
+
+    def on_install(self, editor):
+        super().on_install(editor)
+        self.heatmap.add_panel(self)
+        self.setVisible(self.heatmap.is_profiled(editor.filename))
+
+    def on_uninstall(self):
+        self.heatmap.remove_panel(self)
+        self.heatmap.sig_changed.disconnect(self._on_heatmap_changed)
+        super().on_uninstall()
+
+    def sizeHint(self):
+        """Override Qt method."""
+        return QSize(max(self.editor.fontMetrics().height() // 3, 4), 0)
+
+    def paintEvent(self, event):
+        """Override Qt method."""
+        painter = QPainter(self)
+        painter.fillRect(event.rect(), self.editor.sideareas_color)
+        lines = self._get_lines()
+        if not lines:
+            return
+        line_height = self.editor.fontMetrics().height()
+        for top, line_number, block in self.editor.visible_blocks:
+            line = self._get_line(lines, line_number, block)
+            if line is None:
+                continue
+            color = QColor(HEAT_COLOR)
+            color.setAlphaF(MIN_HEAT_ALPHA + (1 - MIN_HEAT_ALPHA) * line.heat)
+            painter.fillRect(0, top, self.width(), line_height, color)
+
+    def mouseMoveEvent(self, event):
+        """Override Qt method."""
+        lines = self._get_lines()
+        line_number = self.editor.get_linenumber_from_mouse_event(event)
+        block = self.editor.document().findBlockByNumber(line_number - 1)
+        line = (self._get_line(lines, line_number, block)
+                if lines else None)
+        if line is None:
+            QToolTip.hideText()
+            return
+        QToolTip.showText(
+            event.globalPos(),
+            _('{hits} hits, {time_ms:.3f}ms').format(
+                hits=line.hits, time_ms=line.time * 1e3),
+            self)
+
+    def leaveEvent(self, event):
+        """Override Qt method."""
+        QToolTip.hideText()
+
+    def _get_lines(self):
+        if self.editor is None:
+            return None
+        return self.heatmap.get_lines(self.editor.filename)
+
+    def _get_line(self, lines, line_number, block):
+        """Return the LineHeat of a line, if its code didn't change."""
+        line = lines.get(line_number)
+        if line is None or line.code != block.text().rstrip():
+            return None
+        return line
+
+    def _on_heatmap_changed(self, paths):
+        if self.editor is None or not self.editor.filename:
+            return
+        if normalize_path(self.editor.filename) not in paths:
+            return
+        visible = self.heatmap.is_profiled(self.editor.filename)
+        if visible == self.isHidden():
+            self.setVisible(visible)
+        else:
+            self.update()
+
+
+def install_heatmap_panel(codeeditor, heatmap):
+    """Add a HeatmapPanel showing `heatmap` to `codeeditor`, if needed."""
+    try:
+        return codeeditor.panels.get(HeatmapPanel)
+    except KeyError:
+        return codeeditor.panels.register(HeatmapPanel(heatmap))
+
+
+def uninstall_heatmap_panel(codeeditor):
+    """Remove the HeatmapPanel of `codeeditor`, if any."""
+    try:
+        codeeditor.panels.remove(HeatmapPanel)
+    except KeyError:
+        pass
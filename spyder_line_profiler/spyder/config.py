@@ -15,6 +15,18 @@ CONF_DEFAULTS = [
     (CONF_SECTION,
      {
       'use_colors': True,
+      'editor_heatmap': True,
+      'live_update': False,
+      'live_update_interval': 2,
+      'profile_children': False,
+      'context_breakdown': False,
+      'memory_profiling': False,
+      'warm_workers': 0,
+      'preload_modules': '',
+      'output_max_size': 10,
+      'history_max_runs': 10,
+      'history_max_size': 100,
+      'shard_breakdown': False,
      }
      ),
     ('shortcuts',
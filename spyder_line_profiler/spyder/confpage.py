@@ -34,32 +34,118 @@ class SpyderLineProfilerConfigPage(PluginConfigPage):
         use_color_box = self.create_checkbox(
             _("Use deterministic colors to differentiate functions"),
             'use_colors', default=True)
+        editor_heatmap_box = self.create_checkbox(
+            _("Shade the profiled lines in the gutter of the editor"),
+            'editor_heatmap', default=True,
+            tip=_("Lines are shaded by their time relative to the slowest "
+                  "line of the file, unless their code changed since they "
+                  "were profiled"))
+        live_update_box = self.create_checkbox(
+            _("Show partial results while profiling"),
+            'live_update', default=False,
+            tip=_("The profiled script is run by a wrapper around "
+                  "line_profiler which saves the timings collected so far "
+                  "at regular intervals"))
+        live_update_spin = self.create_spinbox(
+            _("Update partial results every"), _("seconds"),
+            'live_update_interval', default=2, min_=1, max_=3600, step=1)
+        live_update_box.checkbox.toggled.connect(live_update_spin.setEnabled)
+        live_update_spin.setEnabled(self.get_option('live_update'))
+        profile_children_box = self.create_checkbox(
+            _("Also profile child processes"),
+            'profile_children', default=False,
+            tip=_("Functions decorated with @profile are also profiled in "
+                  "the processes started by the script, for instance with "
+                  "multiprocessing or concurrent.futures"))
+        context_breakdown_box = self.create_checkbox(
+            _("Break down timings by thread and asyncio task"),
+            'context_breakdown', default=False,
+            tip=_("Timings can then be shown per thread or per task, and "
+                  "the time coroutines spend suspended in await is shown "
+                  "apart. This is not available with repeated runs or "
+                  "when child processes are profiled"))
+        memory_profiling_box = self.create_checkbox(
+            _("Also profile the memory allocated by each line"),
+            'memory_profiling', default=False,
+            tip=_("Memory is measured with tracemalloc when each line "
+                  "starts and ends, which slows down the script and "
+                  "inflates timings. This is not available with repeated "
+                  "runs, sampling or when child processes are profiled"))
+
+        workers_group = QGroupBox(_("Startup"))
+        warm_workers_spin = self.create_spinbox(
+            _("Keep"), _("interpreters ready to profile"),
+            'warm_workers', default=0, min_=0, max_=16, step=1,
+            tip=_("Interpreters are started ahead of time, with the "
+                  "modules below already imported, so that profiling "
+                  "starts faster. Each one profiles a single run, and "
+                  "they are replaced when imported modules change"))
+        preload_edit = self.create_lineedit(
+            _("Modules imported ahead of time (separated by commas)"),
+            'preload_modules', default='',
+            placeholder=_("For instance: numpy, pandas"))
+        warm_workers_spin.spinbox.valueChanged.connect(
+            lambda value: preload_edit.setEnabled(value > 0))
+        preload_edit.setEnabled(self.get_option('warm_workers') > 0)
 
         results_group = QGroupBox(_("Results"))
+        output_size_spin = self.create_spinbox(
+            _("Keep at most"), _("MB of the output of each run"),
+            'output_max_size', default=10, min_=1, max_=1000, step=1,
+            tip=_("Beyond this size, only the start and the end of the "
+                  "output are kept"))
+        history_runs_spin = self.create_spinbox(
+            _("Keep the last"), _("runs of each script"),
+            'history_max_runs', default=10, min_=1, max_=1000, step=1)
+        history_size_spin = self.create_spinbox(
+            _("Limit the size of stored runs to"), _("MB"),
+            'history_max_size', default=100, min_=1, max_=100000, step=10)
+        shard_breakdown_box = self.create_checkbox(
+            _("Break down merged results by file"),
+            'shard_breakdown', default=False,
+            tip=_("When results saved by kernprof are loaded and merged, "
+                  "the timings of each file are shown in tooltips. This "
+                  "makes loading many files slower"))
         results_label1 = QLabel(_("Line profiler plugin results "
                                   "(the output of kernprof.py)\n"
-                                  "are stored here:"))
+                                  "of past runs are stored here:"))
         results_label1.setWordWrap(True)
 
         # Warning: do not try to regroup the following QLabel contents with
         # widgets above -- this string was isolated here in a single QLabel
         # on purpose: to fix Issue 863 of Profiler plugin
-        results_label2 = QLabel(SpyderLineProfilerWidget.DATAPATH)
+        results_label2 = QLabel(SpyderLineProfilerWidget.HISTORYPATH)
 
         results_label2.setTextInteractionFlags(Qt.TextSelectableByMouse)
         results_label2.setWordWrap(True)
 
         settings_layout = QVBoxLayout()
         settings_layout.addWidget(use_color_box)
+        settings_layout.addWidget(editor_heatmap_box)
+        settings_layout.addWidget(live_update_box)
+        settings_layout.addWidget(live_update_spin)
+        settings_layout.addWidget(profile_children_box)
+        settings_layout.addWidget(context_breakdown_box)
+        settings_layout.addWidget(memory_profiling_box)
         settings_group.setLayout(settings_layout)
 
+        workers_layout = QVBoxLayout()
+        workers_layout.addWidget(warm_workers_spin)
+        workers_layout.addWidget(preload_edit)
+        workers_group.setLayout(workers_layout)
+
         results_layout = QVBoxLayout()
+        results_layout.addWidget(output_size_spin)
+        results_layout.addWidget(history_runs_spin)
+        results_layout.addWidget(history_size_spin)
+        results_layout.addWidget(shard_breakdown_box)
         results_layout.addWidget(results_label1)
         results_layout.addWidget(results_label2)
         results_group.setLayout(results_layout)
 
         vlayout = QVBoxLayout()
         vlayout.addWidget(settings_group)
+        vlayout.addWidget(workers_group)
         vlayout.addWidget(results_group)
         vlayout.addStretch(1)
         self.setLayout(vlayout)
\ No newline at end of file
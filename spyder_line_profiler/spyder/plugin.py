@@ -21,15 +21,18 @@ from spyder.api.translations import get_translation
 from spyder.api.plugin_registration.decorators import (
     on_plugin_available, on_plugin_teardown)
 from spyder.plugins.mainmenu.api import ApplicationMenus, RunMenuSections
-from spyder.plugins.profiler.widgets.run_conf import (
-    ProfilerPyConfigurationGroup)
 from spyder.plugins.run.api import RunContext, RunExecutor, run_execute
 from spyder.utils.icon_manager import ima
 
 # Local imports
+from spyder_line_profiler.targets import get_function_at_line, split_targets
+from spyder_line_profiler.spyder.annotations import (
+    install_heatmap_panel, uninstall_heatmap_panel)
 from spyder_line_profiler.spyder.config import (
     CONF_SECTION, CONF_DEFAULTS, CONF_VERSION)
 from spyder_line_profiler.spyder.confpage import SpyderLineProfilerConfigPage
+from spyder_line_profiler.spyder.run_conf import (
+    LineProfilerPyConfigurationGroup)
 from spyder_line_profiler.spyder.widgets import (
     SpyderLineProfilerWidget, is_lineprofiler_installed)
 
@@ -37,6 +40,12 @@ from spyder_line_profiler.spyder.widgets import (
 _ = get_translation("spyder_line_profiler.spyder")
 
 
+class SpyderLineProfilerActions:
+    ProfileFileFunctions = 'profile_file_functions_action'
+    ProfileCurrentFunction = 'profile_current_function_action'
+    ProfileInConsole = 'profile_in_console_action'
+
+
 class SpyderLineProfiler(SpyderDockablePlugin, RunExecutor):
     """
     Spyder Line Profiler plugin for Spyder 5.
@@ -44,7 +53,7 @@ class SpyderLineProfiler(SpyderDockablePlugin, RunExecutor):
 
     NAME = "spyder_line_profiler"
     REQUIRES = [Plugins.Preferences, Plugins.Editor, Plugins.Run]
-    OPTIONAL = []
+    OPTIONAL = [Plugins.MainMenu, Plugins.IPythonConsole]
     TABIFY = [Plugins.Help]
     WIDGET_CLASS = SpyderLineProfilerWidget
     CONF_SECTION = CONF_SECTION
@@ -82,12 +91,34 @@ class SpyderLineProfiler(SpyderDockablePlugin, RunExecutor):
                     'name': 'File'
                 },
                 'output_formats': [],
-                'configuration_widget': ProfilerPyConfigurationGroup,
+                'configuration_widget': LineProfilerPyConfigurationGroup,
                 'requires_cwd': True,
                 'priority': 7
             }
         ]
 
+        self.create_action(
+            SpyderLineProfilerActions.ProfileFileFunctions,
+            text=_('Line profile all functions of the file'),
+            tip=_('Run line profiler on the current file, profiling all '
+                  'its functions without @profile decorators'),
+            triggered=self.profile_file_functions,
+        )
+        self.create_action(
+            SpyderLineProfilerActions.ProfileCurrentFunction,
+            text=_('Line profile the function at the cursor'),
+            tip=_('Run line profiler on the current file, profiling the '
+                  'function at the cursor without a @profile decorator'),
+            triggered=self.profile_current_function,
+        )
+        self.create_action(
+            SpyderLineProfilerActions.ProfileInConsole,
+            text=_('Line profile a statement in the console'),
+            tip=_('Run a statement in the current console with line '
+                  'profiler, using the data of the console'),
+            triggered=self.profile_in_console,
+        )
+
     @on_plugin_available(plugin=Plugins.Run)
     def on_run_available(self):
         run = self.get_plugin(Plugins.Run)
@@ -112,6 +143,22 @@ class SpyderLineProfiler(SpyderDockablePlugin, RunExecutor):
         widget = self.get_widget()
         editor = self.get_plugin(Plugins.Editor)
         widget.sig_edit_goto_requested.connect(editor.load)
+        editor.sig_codeeditor_created.connect(self._install_heatmap_panel)
+        for codeeditor in self._get_codeeditors():
+            self._install_heatmap_panel(codeeditor)
+
+    @on_plugin_available(plugin=Plugins.MainMenu)
+    def on_main_menu_available(self):
+        mainmenu = self.get_plugin(Plugins.MainMenu)
+        if not is_lineprofiler_installed():
+            return
+        for action_id in [SpyderLineProfilerActions.ProfileFileFunctions,
+                          SpyderLineProfilerActions.ProfileCurrentFunction,
+                          SpyderLineProfilerActions.ProfileInConsole]:
+            mainmenu.add_item_to_application_menu(
+                self.get_action(action_id),
+                menu_id=ApplicationMenus.Run,
+                section=RunMenuSections.RunInExecutors)
 
     @on_plugin_available(plugin=Plugins.Preferences)
     def on_preferences_available(self):
@@ -131,11 +178,23 @@ class SpyderLineProfiler(SpyderDockablePlugin, RunExecutor):
         preferences = self.get_plugin(Plugins.Preferences)
         preferences.deregister_plugin_preferences(self)
 
+    @on_plugin_teardown(plugin=Plugins.MainMenu)
+    def on_main_menu_teardown(self):
+        mainmenu = self.get_plugin(Plugins.MainMenu)
+        for action_id in [SpyderLineProfilerActions.ProfileFileFunctions,
+                          SpyderLineProfilerActions.ProfileCurrentFunction,
+                          SpyderLineProfilerActions.ProfileInConsole]:
+            mainmenu.remove_item_from_application_menu(
+                action_id, menu_id=ApplicationMenus.Run)
+
     @on_plugin_teardown(plugin=Plugins.Editor)
     def on_editor_teardown(self):
         widget = self.get_widget()
         editor = self.get_plugin(Plugins.Editor)
         widget.sig_edit_goto_requested.disconnect(editor.load)
+        editor.sig_codeeditor_created.disconnect(self._install_heatmap_panel)
+        for codeeditor in self._get_codeeditors():
+            uninstall_heatmap_panel(codeeditor)
 
     def check_compatibility(self):
         valid = True
@@ -143,6 +202,7 @@ class SpyderLineProfiler(SpyderDockablePlugin, RunExecutor):
         return valid, message
 
     def on_close(self, cancellable=True):
+        self.get_widget().stop_workers()
         return True
 
     # --- Public API
@@ -161,5 +221,76 @@ class SpyderLineProfiler(SpyderDockablePlugin, RunExecutor):
 
         wdir = cwd_opts['path']
         args = params['args']
+        repeat = params.get('repeat', 1)
+        parallel = params.get('parallel', 1)
+        targets = split_targets(params.get('targets', ''))
+        if params.get('profile_file', False):
+            targets.insert(0, filename)
+        auto_select = (
+            params.get('auto_count', 10) if params.get('auto_select', False)
+            else 0,
+            params.get('auto_by', 'cumulative'))
+        sampling = (params.get('sample_interval', 1) / 1000
+                    if params.get('sampling', False) else 0)
+
+        self.get_widget().analyze(filename, wdir=wdir, args=args,
+                                  repeat=repeat, parallel=parallel,
+                                  targets=targets, auto_select=auto_select,
+                                  sampling=sampling)
+
+    def _install_heatmap_panel(self, codeeditor):
+        install_heatmap_panel(codeeditor, self.get_widget().heatmap)
+
+    def _get_codeeditors(self):
+        """Return the code editors of the files open in the editor."""
+        editor = self.get_plugin(Plugins.Editor)
+        codeeditors = [editor.get_codeeditor_for_filename(filename)
+                       for filename in editor.get_filenames()]
+        return [codeeditor for codeeditor in codeeditors
+                if codeeditor is not None]
 
-        self.get_widget().analyze(filename, wdir=wdir, args=args)
+    def profile_file_functions(self):
+        """Profile all the functions of the file open in the editor."""
+        editor = self.get_plugin(Plugins.Editor)
+        filename = editor.get_current_filename()
+        if not filename or not editor.save():
+            return
+        self.switch_to_plugin()
+        # Explicit options, so that those of the previous run are not used
+        self.get_widget().analyze(filename, targets=[filename],
+                                  auto_select=(0, 'cumulative'), sampling=0)
+
+    def profile_current_function(self):
+        """Profile the function at the cursor of the editor."""
+        editor = self.get_plugin(Plugins.Editor)
+        filename = editor.get_current_filename()
+        codeeditor = editor.get_current_editor()
+        if not filename or codeeditor is None:
+            return
+        qualname = get_function_at_line(
+            codeeditor.toPlainText(), codeeditor.get_cursor_line_number())
+        if qualname is None:
+            self.get_widget().datelabel.setText(
+                _('The cursor is not in a function'))
+            return
+        if not editor.save():
+            return
+        self.switch_to_plugin()
+        self.get_widget().analyze(
+            filename, targets=['{}:{}'.format(filename, qualname)],
+            auto_select=(0, 'cumulative'), sampling=0)
+
+    def profile_in_console(self):
+        """Profile a statement in the current IPython console."""
+        widget = self.get_widget()
+        ipyconsole = self.get_plugin(Plugins.IPythonConsole, error=False)
+        shellwidget = (ipyconsole.get_current_shellwidget()
+                       if ipyconsole is not None else None)
+        if shellwidget is None or not shellwidget.spyder_kernel_ready:
+            widget.datelabel.setText(_('There is no console to profile in'))
+            return
+        command = widget.ask_console_command()
+        if command is None:
+            return
+        self.switch_to_plugin()
+        widget.analyze_in_console(shellwidget, command)
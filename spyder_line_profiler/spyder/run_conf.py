@@ -0,0 +1,194 @@
+# -*- coding: utf-8 -*-
+#
+# -----------------------------------------------------------------------------
+# Copyright (c) 2013- Spyder Project Contributors
+#
+# Released under the terms of the MIT License
+# (see LICENSE.txt in the project root directory for details)
+# -----------------------------------------------------------------------------
+
+"""
+Spyder Line Profiler run configuration.
+"""
+
+# Standard library imports
+import os
+
+# Third party imports
+from qtpy.QtWidgets import (
+    QCheckBox, QComboBox, QGridLayout, QGroupBox, QLabel, QLineEdit,
+    QSpinBox)
+from spyder.api.translations import get_translation
+from spyder.plugins.profiler.widgets.run_conf import (
+    ProfilerPyConfigurationGroup)
+
+# Localization
+_ = get_translation("spyder_line_profiler.spyder")
+
+MAX_REPEAT = 1000
+MAX_AUTO_COUNT = 100
+MAX_SAMPLE_INTERVAL = 1000  # In milliseconds
+
+
+class LineProfilerPyConfigurationGroup(ProfilerPyConfigurationGroup):
+    """Run configuration options of the line profiler for Python files."""
+
+    def __init__(self, parent, context, input_extension, input_metadata):
+        super().__init__(parent, context, input_extension, input_metadata)
+
+        repeat_group = QGroupBox(_("Repeated runs"))
+        repeat_layout = QGridLayout(repeat_group)
+
+        repeat_label = QLabel(_("Number of runs:"))
+        repeat_label.setToolTip(
+            _("Run the script several times and show the mean, standard "
+              "deviation, minimum and confidence interval of the time of "
+              "each line"))
+        self.repeat_spin = QSpinBox(self)
+        self.repeat_spin.setRange(1, MAX_REPEAT)
+        repeat_layout.addWidget(repeat_label, 0, 0)
+        repeat_layout.addWidget(self.repeat_spin, 0, 1)
+
+        parallel_label = QLabel(_("Concurrent runs:"))
+        parallel_label.setToolTip(
+            _("Runs done at the same time. Concurrent runs are faster "
+              "but may disturb each other's timings if there are not "
+              "enough idle cores"))
+        self.parallel_spin = QSpinBox(self)
+        self.parallel_spin.setRange(1, os.cpu_count() or 1)
+        repeat_layout.addWidget(parallel_label, 1, 0)
+        repeat_layout.addWidget(self.parallel_spin, 1, 1)
+        repeat_layout.setColumnStretch(2, 1)
+
+        self.repeat_spin.valueChanged.connect(
+            lambda value: self.parallel_spin.setEnabled(value > 1))
+        self.parallel_spin.setEnabled(False)
+
+        targets_group = QGroupBox(_("Functions to profile"))
+        targets_layout = QGridLayout(targets_group)
+
+        self.profile_file_cb = QCheckBox(
+            _("Profile all the functions of this file"))
+        self.profile_file_cb.setToolTip(
+            _("Functions are profiled without adding @profile decorators"))
+        targets_layout.addWidget(self.profile_file_cb, 0, 0, 1, 2)
+
+        targets_label = QLabel(_("Also profile:"))
+        self.targets_edit = QLineEdit(self)
+        self.targets_edit.setPlaceholderText(
+            _("package.module, package.module:Class, file.py:solve_*"))
+        self.targets_edit.setToolTip(
+            _("Comma separated modules or files, each optionally followed "
+              "by a colon and a pattern matching the names of functions, "
+              "classes or methods, such as <tt>Class.method</tt> or "
+              "<tt>solve_*</tt>. Their functions are profiled without "
+              "adding @profile decorators"))
+        targets_layout.addWidget(targets_label, 1, 0)
+        targets_layout.addWidget(self.targets_edit, 1, 1)
+
+        self.auto_select_cb = QCheckBox(
+            _("Also profile the slowest functions, found by a first run "
+              "with cProfile"))
+        self.auto_select_cb.setToolTip(
+            _("The script is first run with cProfile, which is faster, "
+              "to find the functions of the files of your project taking "
+              "the most time"))
+        targets_layout.addWidget(self.auto_select_cb, 2, 0, 1, 2)
+
+        auto_count_label = QLabel(_("Number of functions:"))
+        self.auto_count_spin = QSpinBox(self)
+        self.auto_count_spin.setRange(1, MAX_AUTO_COUNT)
+        targets_layout.addWidget(auto_count_label, 3, 0)
+        targets_layout.addWidget(self.auto_count_spin, 3, 1)
+
+        auto_by_label = QLabel(_("Time taken:"))
+        self.auto_by_combo = QComboBox(self)
+        self.auto_by_combo.addItem(_("Including called functions"),
+                                   'cumulative')
+        self.auto_by_combo.addItem(_("In the function itself"), 'self')
+        targets_layout.addWidget(auto_by_label, 4, 0)
+        targets_layout.addWidget(self.auto_by_combo, 4, 1)
+
+        self.auto_select_cb.toggled.connect(self.auto_count_spin.setEnabled)
+        self.auto_select_cb.toggled.connect(self.auto_by_combo.setEnabled)
+        self.auto_count_spin.setEnabled(False)
+        self.auto_by_combo.setEnabled(False)
+
+        backend_group = QGroupBox(_("Profiling method"))
+        backend_layout = QGridLayout(backend_group)
+
+        backend_label = QLabel(_("Method:"))
+        self.backend_combo = QComboBox(self)
+        self.backend_combo.addItem(_("Time every line"), False)
+        self.backend_combo.addItem(_("Sample the running lines"), True)
+        self.backend_combo.setToolTip(
+            _("Sampling slows down the script much less, in particular "
+              "tight loops, but times are estimated from the number of "
+              "samples of each line, and child processes are not "
+              "profiled"))
+        backend_layout.addWidget(backend_label, 0, 0)
+        backend_layout.addWidget(self.backend_combo, 0, 1)
+
+        interval_label = QLabel(_("Interval between samples:"))
+        self.interval_spin = QSpinBox(self)
+        self.interval_spin.setRange(1, MAX_SAMPLE_INTERVAL)
+        self.interval_spin.setSuffix(" ms")
+        backend_layout.addWidget(interval_label, 1, 0)
+        backend_layout.addWidget(self.interval_spin, 1, 1)
+        backend_layout.setColumnStretch(2, 1)
+
+        self.backend_combo.currentIndexChanged.connect(
+            lambda index: self.interval_spin.setEnabled(
+                bool(self.backend_combo.itemData(index))))
+        self.interval_spin.setEnabled(False)
+
+        # Below the file settings of the parent class, above the stretch
+        self.layout().insertWidget(1, repeat_group)
+        self.layout().insertWidget(2, targets_group)
+        self.layout().insertWidget(3, backend_group)
+
+    @staticmethod
+    def get_default_configuration() -> dict:
+        config = ProfilerPyConfigurationGroup.get_default_configuration()
+        config.update({
+            'repeat': 1,
+            'parallel': 1,
+            'profile_file': False,
+            'targets': '',
+            'auto_select': False,
+            'auto_count': 10,
+            'auto_by': 'cumulative',
+            'sampling': False,
+            'sample_interval': 1,
+        })
+        return config
+
+    def set_configuration(self, config: dict):
+        super().set_configuration(config)
+        self.repeat_spin.setValue(config.get('repeat', 1))
+        self.parallel_spin.setValue(config.get('parallel', 1))
+        self.profile_file_cb.setChecked(config.get('profile_file', False))
+        self.targets_edit.setText(config.get('targets', ''))
+        self.auto_select_cb.setChecked(config.get('auto_select', False))
+        self.auto_count_spin.setValue(config.get('auto_count', 10))
+        index = self.auto_by_combo.findData(
+            config.get('auto_by', 'cumulative'))
+        self.auto_by_combo.setCurrentIndex(max(index, 0))
+        self.backend_combo.setCurrentIndex(
+            1 if config.get('sampling', False) else 0)
+        self.interval_spin.setValue(config.get('sample_interval', 1))
+
+    def get_configuration(self) -> dict:
+        config = super().get_configuration()
+        config.update({
+            'repeat': self.repeat_spin.value(),
+            'parallel': self.parallel_spin.value(),
+            'profile_file': self.profile_file_cb.isChecked(),
+            'targets': self.targets_edit.text(),
+            'auto_select': self.auto_select_cb.isChecked(),
+            'auto_count': self.auto_count_spin.value(),
+            'auto_by': self.auto_by_combo.currentData(),
+            'sampling': self.backend_combo.currentData(),
+            'sample_interval': self.interval_spin.value(),
+        })
+        return config
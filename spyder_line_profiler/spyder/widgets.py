@@ -10,23 +10,27 @@
 Spyder Line Profiler Main Widget.
 """
 # Standard library imports
-import inspect
-import linecache
+import functools
+import glob
+import json
 import logging
 import os
 import os.path as osp
-import pickle
 import re
+import shutil
+import threading
 import time
 from datetime import datetime
 
 # Third party imports
 from qtpy.QtGui import QBrush, QColor, QFont
-from qtpy.QtCore import (QByteArray, QProcess, Qt,
-                         QProcessEnvironment, Signal, QTimer)
-from qtpy.QtWidgets import (QMessageBox, QVBoxLayout, QLabel,
-                            QTreeWidget, QTreeWidgetItem, QApplication)
-from qtpy.compat import getopenfilename, getsavefilename
+from qtpy.QtCore import (QAbstractItemModel, QModelIndex,
+                         QObject, QProcess, Qt, QProcessEnvironment,
+                         QRunnable, QThreadPool, Signal, QTimer)
+from qtpy.QtWidgets import (QComboBox, QInputDialog, QMessageBox,
+                            QVBoxLayout, QLabel, QTreeView)
+from qtpy.compat import (getexistingdirectory, getopenfilename,
+                         getopenfilenames, getsavefilename)
 
 # Spyder imports
 from spyder.api.config.decorators import on_conf_change
@@ -40,6 +44,26 @@ from spyder.utils.palette import SpyderPalette
 from spyder.widgets.comboboxes import PythonModulesComboBox
 
 # Local imports
+from spyder_line_profiler.bootstrap import get_bootstrap_path
+from spyder_line_profiler.spyder.annotations import LineHeatmap
+from spyder_line_profiler.budgets import (
+    BudgetError, check_budgets, get_budgets_for)
+from spyder_line_profiler.compare import compare_results
+from spyder_line_profiler.console import (
+    RESULT_NAME as CONSOLE_RESULT_NAME, get_request_code, parse_command,
+    save_console_data)
+from spyder_line_profiler.export import (
+    BINARY_FORMATS, is_format_available, write_results)
+from spyder_line_profiler.history import RunHistory, load_code
+from spyder_line_profiler.output import OutputBuffer, iter_pages
+from spyder_line_profiler.results import (
+    ContextFunctionResult, LoadingCancelled, MemoryFunctionResult,
+    ProcessFunctionResult, RepeatedFunctionResult, load_profile_data,
+    merge_context_data, merge_process_data, merge_profile_data,
+    merge_shard_data, pivot_results)
+from spyder_line_profiler.sourcecache import BlockCache
+from spyder_line_profiler.targets import (
+    load_call_stats, select_hot_functions)
 from spyder_line_profiler.spyder.config import CONF_SECTION
 
 # Localization and logging
@@ -51,11 +75,33 @@ COL_HITS = 1
 COL_TIME = 2
 COL_PERHIT = 3
 COL_PERCENT = 4
-COL_LINE = 5
+COL_MEM = 5
+COL_PEAK = 6
+COL_LINE = 7
 COL_POS = 0  # Position is not displayed but set as Qt.UserRole
+DIFF_COL_NO = 0
+DIFF_COL_HITS = 1
+DIFF_COL_DHITS = 2
+DIFF_COL_TIME = 3
+DIFF_COL_DTIME = 4
+DIFF_COL_RATIO = 5
+DIFF_COL_MEM = 6
+DIFF_COL_DMEM = 7
+DIFF_COL_LINE = 8
+SORT_ROLE = Qt.UserRole + 1  # Raw values used to sort rows
+
+# Sort key of the numeric columns for lines that didn't run
+NOT_RUN_SORT_KEY = float('-inf')
 
 CODE_NOT_RUN_COLOR = QBrush(QColor.fromRgb(128, 128, 128, 200))
 
+# Color of the functions and lines exceeding their performance budget
+BUDGET_VIOLATION_COLOR = QBrush(QColor(SpyderPalette.COLOR_ERROR_2))
+
+# Colors of changes in time when comparing runs
+DIFF_SLOWER_COLOR = QBrush(QColor(SpyderPalette.COLOR_ERROR_2))
+DIFF_FASTER_COLOR = QBrush(QColor(SpyderPalette.COLOR_SUCCESS_2))
+
 # Cycle to use when coloring lines from different functions
 COLOR_CYCLE = [
     SpyderPalette.GROUP_1,
@@ -77,35 +123,172 @@ def is_lineprofiler_installed():
             and programs.is_module_installed('kernprof'))
 
 
-class TreeWidgetItem(QTreeWidgetItem):
+def natural_sort_key(key):
     """
-    An extension of QTreeWidgetItem that replaces the sorting behaviour
-    such that the sorting is not purely by ASCII index but by natural
-    sorting, e.g. multi-digit numbers sorted based on their value instead
-    of individual digits.
-
-    Taken from
-    https://stackoverflow.com/questions/21030719/sort-a-pyside-qtgui-
-    qtreewidget-by-an-alpha-numeric-column/
+    Natural sorting for both numbers and strings containing numbers.
+
+    Multi-digit numbers are sorted based on their value instead of
+    individual digits.
     """
-    def __lt__(self, other):
-        """
-        Compare a widget text entry to another entry.
-        """
-        column = self.treeWidget().sortColumn()
-        key1 = self.text(column)
-        key2 = other.text(column)
-        return self.natural_sort_key(key1) < self.natural_sort_key(key2)
+    regex = r'(\d*\.\d+|\d+)'
+    parts = re.split(regex, key)
+    return tuple((e if i % 2 == 0 else float(e))
+                 for i, e in enumerate(parts))
 
-    @staticmethod
-    def natural_sort_key(key):
-        """
-        Natural sorting for both numbers and strings containing numbers.
-        """
-        regex = r'(\d*\.\d+|\d+)'
-        parts = re.split(regex, key)
-        return tuple((e if i % 2 == 0 else float(e))
-                     for i, e in enumerate(parts))
+
+class LoadDataSignals(QObject):
+    sig_progress = Signal(int, int)
+    """Number of functions loaded so far and total number of functions."""
+
+    sig_loaded = Signal(object)
+    """The ProfileResult that was loaded."""
+
+    sig_error = Signal(str)
+    """Message describing why results could not be loaded."""
+
+
+class LoadDataWorker(QRunnable):
+    """
+    Load line profiler data in a thread of the global thread pool.
+
+    If `breakdownfile` is given, the breakdown of the run by thread and
+    task saved in it is first merged into `profdatafile` (see
+    `merge_context_data`) and removed. `children` are the (data file,
+    shards directory) of runs whose child processes saved their results
+    in the shards directory, which are merged into the data file (see
+    `merge_process_data`) and removed. If `runfiles` are given, the
+    results of these repeated runs are then merged into `profdatafile`
+    (see `merge_profile_data`) and removed. If `shardfiles` are given,
+    they are merged into `profdatafile` (see `merge_shard_data`) before
+    loading it. If `history` is given, the results are moved to that
+    RunHistory once loaded, with the keyword arguments of
+    `RunHistory.add_run` in `run_info`, and the index entry of the run
+    is kept in `run`.
+    """
+
+    def __init__(self, profdatafile, block_cache, codefile=None,
+                 convert=False, shardfiles=None, breakdown=False,
+                 history=None, run_info=None, runfiles=None,
+                 children=None, breakdownfile=None):
+        QRunnable.__init__(self)
+        self.setAutoDelete(False)
+        self.profdatafile = profdatafile
+        self.block_cache = block_cache
+        self.codefile = codefile
+        self.convert = convert
+        self.shardfiles = shardfiles
+        self.breakdown = breakdown
+        self.history = history
+        self.run_info = run_info
+        self.runfiles = runfiles
+        self.children = children
+        self.breakdownfile = breakdownfile
+        self.run = None
+        self.signals = LoadDataSignals()
+        self.cancelled = threading.Event()
+
+    def run(self):
+        try:
+            if self.breakdownfile is not None:
+                self._merge_breakdown()
+            for datafile, shards_dir in self.children or []:
+                self._merge_children(datafile, shards_dir)
+            if self.runfiles:
+                self._merge_runs()
+            if self.shardfiles:
+                merge_shard_data(
+                    self.shardfiles, self.profdatafile,
+                    breakdown=self.breakdown,
+                    progress=self.signals.sig_progress.emit,
+                    cancelled=self.cancelled)
+            code = (load_code(self.codefile) if self.codefile is not None
+                    else None)
+            data = load_profile_data(
+                self.profdatafile, self.block_cache,
+                progress=self.signals.sig_progress.emit,
+                cancelled=self.cancelled, code=code, convert=self.convert)
+        except LoadingCancelled:
+            return
+        except Exception as error:
+            logger.debug('Could not load profiling data', exc_info=True)
+            self.signals.sig_error.emit(f'{type(error).__name__}: {error}')
+            return
+        if self.history is not None:
+            self.run = self._store_run(data)
+        self.signals.sig_loaded.emit(data)
+
+    def _merge_breakdown(self):
+        """Merge the breakdown of the run by thread and task."""
+        try:
+            if (osp.isfile(self.breakdownfile)
+                    and osp.isfile(self.profdatafile)):
+                merge_context_data(self.profdatafile, self.breakdownfile,
+                                   self.profdatafile,
+                                   progress=self.signals.sig_progress.emit,
+                                   cancelled=self.cancelled)
+        except LoadingCancelled:
+            raise
+        except Exception:
+            logger.error('Could not merge the breakdown by thread and task',
+                         exc_info=True)
+        try:
+            os.remove(self.breakdownfile)
+        except OSError:
+            pass
+
+    def _merge_children(self, datafile, shards_dir):
+        """Merge the results of the children of a run into `datafile`."""
+        try:
+            shardfiles = sorted(
+                osp.join(shards_dir, name) for name in os.listdir(shards_dir)
+                if name.endswith('.lprof'))
+        except OSError:
+            shardfiles = []
+        try:
+            if shardfiles and osp.isfile(datafile):
+                merge_process_data(datafile, shardfiles, datafile,
+                                   progress=self.signals.sig_progress.emit,
+                                   cancelled=self.cancelled)
+        except LoadingCancelled:
+            raise
+        except Exception:
+            logger.error('Could not merge the results of child processes',
+                         exc_info=True)
+        shutil.rmtree(shards_dir, ignore_errors=True)
+
+    def _merge_runs(self):
+        """Merge the results of repeated runs into `profdatafile`."""
+        existing = [datafile for datafile in self.runfiles
+                    if osp.isfile(datafile)]
+        try:
+            if existing:
+                merge_profile_data(existing, self.profdatafile,
+                                   progress=self.signals.sig_progress.emit,
+                                   cancelled=self.cancelled)
+        except LoadingCancelled:
+            raise
+        except Exception:
+            logger.error('Could not merge the results of repeated runs',
+                         exc_info=True)
+        for datafile in existing:
+            try:
+                os.remove(datafile)
+            except OSError:
+                pass
+
+    def _store_run(self, data):
+        """Move the results to the history and return the run, or None."""
+        try:
+            run = self.history.add_run(self.profdatafile, data,
+                                       **self.run_info)
+        except OSError:
+            logger.debug('Could not store run in history', exc_info=True)
+            return None
+        data.path = self.history.get_data_path(run['id'])
+        return run
+
+    def cancel(self):
+        self.cancelled.set()
 
 
 class SpyderLineProfilerWidgetActions:
@@ -113,13 +296,22 @@ class SpyderLineProfilerWidgetActions:
     Browse = 'browse_action'
     Clear = 'clear_action'
     Collapse = 'collapse_action'
+    Compare = 'compare_action'
     Expand = 'expand_action'
     LoadData = 'load_data_action'
+    LoadDirectory = 'load_directory_action'
     Run = 'run_action'
     SaveData = 'save_data_action'
     ShowOutput = 'show_output_action'
     Stop = 'stop_action'
 
+    # Toggles
+    ShardBreakdown = 'shard_breakdown_action'
+
+
+class SpyderLineProfilerWidgetOptionsMenuSections:
+    Load = 'load_section'
+
 
 class SpyderLineProfilerWidgetMainToolbarSections:
     Main = 'main_section'
@@ -133,6 +325,8 @@ class SpyderLineProfilerWidgetToolbars:
 
 class SpyderLineProfilerWidgetMainToolbarItems:
     FileCombo = 'file_combo'
+    HistoryCombo = 'history_combo'
+    PivotCombo = 'pivot_combo'
 
 
 class SpyderLineProfilerWidgetInformationToolbarSections:
@@ -150,7 +344,16 @@ class SpyderLineProfilerWidget(PluginMainWidget):
     # PluginMainWidget class constants
     CONF_SECTION = CONF_SECTION
     DATAPATH = get_conf_path('lineprofiler.results')
+    SNAPSHOTPATH = get_conf_path('lineprofiler.snapshot')
+    HISTORYPATH = get_conf_path('lineprofiler.history')
+    SHARDSPATH = get_conf_path('lineprofiler.shards')
+    BREAKDOWNPATH = get_conf_path('lineprofiler.breakdown')
+    CALLSTATSPATH = get_conf_path('lineprofiler.callstats')
+    CONSOLEPATH = get_conf_path('lineprofiler.console.py')
+    CONSOLEDATAPATH = get_conf_path('lineprofiler.console')
+    MERGEDPATH = get_conf_path('lineprofiler.merged')
     VERSION = '0.0.1'
+    ENABLE_SPINNER = True
 
     redirect_stdio = Signal(bool)
     sig_finished = Signal()
@@ -177,22 +380,91 @@ class SpyderLineProfilerWidget(PluginMainWidget):
         # Attributes
         self._last_wdir = None
         self._last_args = None
+        self._last_targets = None
+        self._last_auto_select = None
+        self._last_sampling = None
         self.pythonpath = None
         self.error_output = None
         self.output = None
+        self.output_max_size = self.get_conf('output_max_size', default=10)
+        self._output_buffer = None  # Output captured while profiling
+        self._error_buffer = None
         self.use_colors = True
-        self.process = None
+        self.processes = []    # Running profiling processes
+        self._pending_runs = []  # Indexes of the runs yet to start
+        self._repeat = 1
+        self._parallel = 1
+        self._executable = None
+        self._process_env = None
+        self._script_args = None
+        self._targets = []  # Functions profiled without decorators
+        self._auto_select = 0  # Number of functions selected by cProfile
+        self._auto_select_by = 'cumulative'
+        self._sampling = 0  # Seconds between samples, 0 to trace lines
+        self._selecting = False  # Whether functions are being selected
+        self._console = None  # Shell widget of the console profiling runs in
+        self._last_command = ''  # Last command profiled in a console
         self.started_time = None
+        self.live_update = self.get_conf('live_update', default=False)
+        self.live_update_interval = self.get_conf(
+            'live_update_interval', default=2)
+        self.profile_children = self.get_conf(
+            'profile_children', default=False)
+        self._with_children = False  # Whether children of the run are profiled
+        self.context_breakdown = self.get_conf(
+            'context_breakdown', default=False)
+        self._with_breakdown = False  # Whether the run is broken down
+        self.memory_profiling = self.get_conf(
+            'memory_profiling', default=False)
+        self._with_memory = False  # Whether memory of the run is profiled
+        self.warm_workers = self.get_conf('warm_workers', default=0)
+        self.preload_modules = self.get_conf('preload_modules', default='')
+        self._workers = []  # Idle warm workers, with their WorkerKey
+        self.shard_breakdown = self.get_conf('shard_breakdown', default=False)
+        self._shardfiles = []  # Files merged into the results shown
+        self.editor_heatmap = self.get_conf('editor_heatmap', default=True)
+        self.heatmap = LineHeatmap(self)  # Shown by editors, see plugin.py
+        self._heatmap_data = None  # Results whose heat is shown
+        self._snapshot_mtime = None
+        self._load_worker = None
+        self._finished_text = None
+        self._run_script = None
+        self._current_run_id = None
+        self._baseline_run_id = None
+        self.history = RunHistory(
+            self.HISTORYPATH,
+            max_runs=self.get_conf('history_max_runs', default=10),
+            max_size=self.get_conf('history_max_size', default=100) * 2**20)
 
         # Widgets
         self.filecombo = PythonModulesComboBox(
             self, id_=SpyderLineProfilerWidgetMainToolbarItems.FileCombo)
+        self.historycombo = QComboBox(self)
+        self.historycombo.ID = (
+            SpyderLineProfilerWidgetMainToolbarItems.HistoryCombo)
+        self.historycombo.setToolTip(_('Previous runs of this script'))
+        self.historycombo.setSizeAdjustPolicy(QComboBox.AdjustToContents)
+        self.historycombo.setPlaceholderText(_('History'))
+        self.pivotcombo = QComboBox(self)
+        self.pivotcombo.ID = (
+            SpyderLineProfilerWidgetMainToolbarItems.PivotCombo)
+        self.pivotcombo.setToolTip(
+            _('Show timings in total, per thread or per asyncio task'))
+        self.pivotcombo.setSizeAdjustPolicy(QComboBox.AdjustToContents)
+        for text, pivot in [(_('Total'), 'total'),
+                            (_('Per thread'), 'thread'),
+                            (_('Per task'), 'task')]:
+            self.pivotcombo.addItem(text, pivot)
+        self.pivotcombo.setEnabled(False)
         self.datatree = LineProfilerDataTree(self)
         self.datelabel = QLabel(self)
         self.datelabel.ID = SpyderLineProfilerWidgetInformationToolbarItems.DateLabel
         self.datelabel.setText(_('Please select a file to profile, with '
-                                 'added @profile decorators for functions'))
+                                 'added @profile decorators for functions '
+                                 'or with the functions to profile named '
+                                 'in its run configuration'))
         self.timer = QTimer(self)
+        self.timer.timeout.connect(self.update_timer)
 
         layout = QVBoxLayout()
         layout.addWidget(self.datatree)
@@ -201,6 +473,9 @@ class SpyderLineProfilerWidget(PluginMainWidget):
         # Signals
         self.datatree.sig_edit_goto_requested.connect(
             self.sig_edit_goto_requested)
+        self.filecombo.currentTextChanged.connect(self.update_history)
+        self.historycombo.activated.connect(self._on_history_activated)
+        self.pivotcombo.currentIndexChanged.connect(self._on_pivot_changed)
 
     # --- PluginMainWidget API
     # ------------------------------------------------------------------------
@@ -261,6 +536,13 @@ class SpyderLineProfilerWidget(PluginMainWidget):
             icon=self.create_icon('filesave'),
             triggered=self.save_data,
         )
+        self.compare_action = self.create_action(
+            SpyderLineProfilerWidgetActions.Compare,
+            text=_("Compare"),
+            tip=_('Compare with a previous run'),
+            icon=self.create_icon('switcher'),
+            triggered=self.select_baseline,
+        )
         self.clear_action = self.create_action(
             SpyderLineProfilerWidgetActions.Clear,
             text=_("Clear output"),
@@ -268,17 +550,52 @@ class SpyderLineProfilerWidget(PluginMainWidget):
             icon=self.create_icon('editdelete'),
             triggered=self.clear_data,
         )
+        self.load_action = self.create_action(
+            SpyderLineProfilerWidgetActions.LoadData,
+            text=_("Load results..."),
+            tip=_('Load and merge results saved by kernprof'),
+            icon=self.create_icon('fileimport'),
+            triggered=self.select_data_files,
+        )
+        self.load_directory_action = self.create_action(
+            SpyderLineProfilerWidgetActions.LoadDirectory,
+            text=_("Load results from directory..."),
+            tip=_('Load and merge the results saved by kernprof in a '
+                  'directory and its subdirectories'),
+            icon=self.create_icon('DirOpenIcon'),
+            triggered=self.select_data_directory,
+        )
+        self.shard_breakdown_action = self.create_action(
+            SpyderLineProfilerWidgetActions.ShardBreakdown,
+            text=_("Break down merged results by file"),
+            tip=_('Show the timings of each file in the tooltips of '
+                  'merged results'),
+            toggled=True,
+            option='shard_breakdown',
+        )
 
         self.set_running_state(False)
         self.start_action.setEnabled(False)
         self.clear_action.setEnabled(False)
         self.log_action.setEnabled(False)
         self.save_action.setEnabled(False)
+        self.compare_action.setEnabled(False)
+
+        # Options menu
+        options_menu = self.get_options_menu()
+        for item in [self.load_action, self.load_directory_action,
+                     self.shard_breakdown_action]:
+            self.add_item_to_menu(
+                item,
+                menu=options_menu,
+                section=SpyderLineProfilerWidgetOptionsMenuSections.Load,
+            )
 
         # Main Toolbar
         toolbar = self.get_main_toolbar()
         for item in [self.filecombo, self.browse_action, self.start_action,
-                     self.stop_action]:
+                     self.stop_action, self.historycombo,
+                     self.pivotcombo]:
             self.add_item_to_toolbar(
                 item,
                 toolbar=toolbar,
@@ -295,6 +612,7 @@ class SpyderLineProfilerWidget(PluginMainWidget):
                      self.create_stretcher(
                          id_=SpyderLineProfilerWidgetInformationToolbarItems.Stretcher2),
                      self.log_action,
+                     self.compare_action,
                      self.save_action,
                      self.clear_action]:
             self.add_item_to_toolbar(
@@ -306,7 +624,10 @@ class SpyderLineProfilerWidget(PluginMainWidget):
         if not is_lineprofiler_installed():
             for widget in (self.datatree, self.filecombo, self.log_action,
                            self.start_action, self.stop_action, self.browse_action,
-                           self.collapse_action, self.expand_action):
+                           self.collapse_action, self.expand_action,
+                           self.historycombo, self.pivotcombo,
+                           self.compare_action, self.load_action,
+                           self.load_directory_action):
                 widget.setDisabled(True)
             text = _(
                 '<b>Please install the <a href="%s">line_profiler module</a></b>'
@@ -314,14 +635,31 @@ class SpyderLineProfilerWidget(PluginMainWidget):
             self.datelabel.setText(text)
             self.datelabel.setOpenExternalLinks(True)
         else:
-            pass
+            self.fill_worker_pool()
+
+    def analyze(self, filename=None, wdir=None, args=None, use_colors=True,
+                repeat=1, parallel=1, targets=None, auto_select=None,
+                sampling=None):
+        """
+        Profile `filename`.
+
+        The script is run `repeat` times, with up to `parallel` runs at the
+        same time, and the statistics of the runs are shown. `targets` name
+        modules, files or functions to profile in addition to those with
+        @profile decorators, as described in bootstrap/targets.py.
 
-    def analyze(self, filename=None, wdir=None, args=None, use_colors=True):
+        `auto_select` is a (count, time) pair to first run the script with
+        cProfile and also profile the `count` functions taking the most
+        time, `time` being one of SELECT_BY.
+
+        `sampling` is the number of seconds between samples of the lines
+        being run, as described in bootstrap/sampler.py, or 0 to time every
+        line. Child processes are not profiled when sampling.
+        """
         self.use_colors = use_colors
         if not is_lineprofiler_installed():
             return
         self.kill_if_running()
-        #index, _data = self.get_data(filename) # FIXME: storing data is not implemented yet
         if filename is not None:
             filename = osp.abspath(str(filename))
             index = self.filecombo.findText(filename)
@@ -336,7 +674,97 @@ class SpyderLineProfilerWidget(PluginMainWidget):
             filename = str(self.filecombo.currentText())
             if wdir is None:
                 wdir = osp.dirname(filename)
-            self.start(wdir, args)
+            self.start(wdir, args, repeat=repeat, parallel=parallel,
+                       targets=targets, auto_select=auto_select,
+                       sampling=sampling)
+
+    def ask_console_command(self):
+        """
+        Ask for a statement to profile in a console.
+
+        Returns the command, as described in console.py, or None if the
+        dialog was cancelled.
+        """
+        command, valid = QInputDialog.getText(
+            self, _('Profile in the console'),
+            _('Statement to run, preceded by the functions to profile as '
+              '<tt>-f function</tt> (by default, the function called):'),
+            text=self._last_command)
+        if not valid or not command.strip():
+            return None
+        return command
+
+    def analyze_in_console(self, shellwidget, command):
+        """
+        Profile a statement in the console of `shellwidget`.
+
+        `command` is given like to ``%lprun``, as described in console.py.
+        The statement runs in the kernel of the console, with its data,
+        and the results are sent back through the comm of the kernel.
+        """
+        try:
+            expressions, statement = parse_command(command)
+        except ValueError as error:
+            QMessageBox.warning(self, _("Error"), str(error))
+            return
+        self.kill_if_running()
+        self._last_command = command
+        try:
+            with open(self.CONSOLEPATH, 'w', encoding='utf-8') as f:
+                f.write(get_request_code(statement, expressions))
+        except OSError as error:
+            QMessageBox.critical(self, _("Error"), str(error))
+            return
+
+        self.clear_data()
+        self.error_output = ''
+        self.output = _('Profiled in the console: {statement}\n').format(
+            statement=statement)
+        self.started_time = datetime.now()
+        self._console = shellwidget
+        self.set_running_state(True)
+        self.timer.start(1000)
+        self.update_timer()
+        shellwidget.call_kernel(
+            callback=functools.partial(self._on_console_executed,
+                                       shellwidget)
+        ).safe_exec(self.CONSOLEPATH)
+
+    def _on_console_executed(self, shellwidget, _result=None):
+        if shellwidget is not self._console:
+            return
+        shellwidget.call_kernel(
+            callback=functools.partial(self._on_console_finished,
+                                       shellwidget)
+        ).get_value(CONSOLE_RESULT_NAME)
+
+    def _on_console_finished(self, shellwidget, data):
+        if shellwidget is not self._console:
+            return
+        self._console = None
+        shellwidget.call_kernel().remove_value(CONSOLE_RESULT_NAME)
+        self.timer.stop()
+        self.set_running_state(False)
+        try:
+            error = save_console_data(data, self.CONSOLEDATAPATH)
+        except Exception:
+            logger.error('Could not save the results of the console',
+                         exc_info=True)
+            self.datelabel.setText(_('Could not load profiling results'))
+            self.sig_finished.emit()
+            return
+        if error:
+            self.output += error
+        output_exists = bool(self.output)
+        self.log_action.setEnabled(output_exists)
+        self.save_action.setEnabled(output_exists)
+        elapsed = str(datetime.now() - self.started_time).split(".")[0]
+        self.load_results(self.CONSOLEDATAPATH)
+        # sig_finished is emitted when results are shown
+        self._finished_text = _(
+            'Profiling finished after {elapsed}').format(elapsed=elapsed)
+        if error:
+            self._finished_text += _(' - The statement failed, see the output')
 
     def select_file(self):
         self.redirect_stdio.emit(False)
@@ -350,32 +778,393 @@ class SpyderLineProfilerWidget(PluginMainWidget):
         if filename:
             self.analyze(filename)
 
+    def select_data_files(self):
+        """Select results saved by kernprof to load and merge."""
+        self.redirect_stdio.emit(False)
+        filenames, _selfilter = getopenfilenames(
+            self, _("Select line profiler results"), getcwd_or_home(),
+            _("Line profiler results") + " (*.lprof);;"
+            + _("All files") + " (*)")
+        self.redirect_stdio.emit(True)
+
+        if filenames:
+            self.load_data_files(filenames)
+
+    def select_data_directory(self):
+        """Select a directory of results saved by kernprof to merge."""
+        self.redirect_stdio.emit(False)
+        directory = getexistingdirectory(
+            self, _("Select a directory of line profiler results"),
+            getcwd_or_home())
+        self.redirect_stdio.emit(True)
+
+        if not directory:
+            return
+        filenames = sorted(glob.glob(
+            osp.join(glob.escape(directory), '**', '*.lprof'),
+            recursive=True))
+        if not filenames:
+            self.datelabel.setText(
+                _('No line profiler results (.lprof files) in {directory}'
+                  ).format(directory=directory))
+            return
+        self.load_data_files(filenames)
+
+    def load_data_files(self, filenames):
+        """
+        Show the results saved in `filenames`, summed over the files.
+
+        The files are merged by a pool of processes, keeping the timings
+        of each file if the ``shard_breakdown`` option is set.
+        """
+        filenames = list(filenames)
+        self.clear_data()
+        self.error_output = None
+        self._shardfiles = filenames
+        self.load_results(self.MERGEDPATH, shardfiles=filenames)
+        # sig_finished is emitted when results are shown
+        self._finished_text = _(
+            'Merged the results of {count} file(s)').format(
+                count=len(filenames))
+
     def show_log(self):
         if self.output:
-            editor = TextEditor(self.output, title=_("Line profiler output"),
-                                readonly=True, parent=self)
-
-            # Call .show() to dynamically resize editor;
-            # see spyder-ide/spyder#12202
-            editor.show()
-            editor.exec_()
+            self._show_output(self.output)
 
     def show_errorlog(self):
         if self.error_output:
-            editor = TextEditor(self.error_output,
-                                title=_("Line profiler output"),
-                                readonly=True, parent=self)
             self.datelabel.setText(_('Profiling did not complete (error)'))
-            # Call .show() to dynamically resize editor;
-            # see spyder-ide/spyder#12202
-            editor.show()
-            editor.exec_()
+            self._show_output(self.error_output)
+
+    def _show_output(self, text):
+        """
+        Show `text` in a dialog.
+
+        Long outputs are shown a page at a time, the next page being added
+        when scrolling to the end.
+        """
+        pages = iter_pages(text)
+        editor = TextEditor(next(pages, ''), title=_("Line profiler output"),
+                            readonly=True, parent=self)
+        scrollbar = editor.edit.verticalScrollBar()
+
+        def add_page(value):
+            if value < scrollbar.maximum():
+                return
+            page = next(pages, None)
+            if page is None:
+                scrollbar.valueChanged.disconnect(add_page)
+                return
+            cursor = editor.edit.textCursor()
+            cursor.movePosition(cursor.End)
+            cursor.insertText(page)
+
+        scrollbar.valueChanged.connect(add_page)
+
+        # Call .show() to dynamically resize editor;
+        # see spyder-ide/spyder#12202
+        editor.show()
+        editor.exec_()
 
     def update_timer(self):
         elapsed = str(datetime.now() - self.started_time).split(".")[0]
+        if self._console is not None:
+            self.datelabel.setText(
+                _('Profiling in the console, please wait... '
+                  'elapsed: {elapsed}').format(elapsed=elapsed))
+            return
+        if self._selecting:
+            self.datelabel.setText(
+                _('Selecting the functions to profile, please wait... '
+                  'elapsed: {elapsed}').format(elapsed=elapsed))
+            return
+        if self._repeat > 1:
+            done = self._repeat - len(self._pending_runs) - len(self.processes)
+            self.datelabel.setText(
+                _('Profiling, please wait... elapsed: {elapsed}, '
+                  'runs finished: {done}/{total}').format(
+                      elapsed=elapsed, done=done, total=self._repeat))
+            return
         self.datelabel.setText(_(f'Profiling, please wait... elapsed: {elapsed}'))
+        if self.live_update:
+            self.update_live_view()
+
+    def update_live_view(self):
+        """Show the partial results written by the profiled process."""
+        try:
+            mtime = os.stat(self.SNAPSHOTPATH).st_mtime_ns
+        except OSError:
+            return
+        if mtime == self._snapshot_mtime or self._load_worker is not None:
+            return
+        self._snapshot_mtime = mtime
+        self.load_results(self.SNAPSHOTPATH, live=True)
 
-    def start(self, wdir=None, args=None):
+    def load_results(self, profdatafile, live=False, codefile=None,
+                     compare=False, convert=True, shardfiles=None,
+                     store=False, runfiles=None, children=None,
+                     breakdownfile=None):
+        """
+        Load the results saved in `profdatafile` in a background thread.
+
+        If `live` is True, the results are partial ones and only the rows
+        that changed are updated in the tree. `codefile` is the code of the
+        profiled functions saved with the results, if any. If `compare` is
+        True, the results shown are compared with the loaded ones. If
+        `convert` is True, pickled results are converted to a stats file
+        (see statsfile.py) when loaded, which is faster to load again. If
+        `shardfiles` are given, they are first merged into `profdatafile`.
+        If `store` is True, the results are moved to the run history once
+        loaded, as those of the run that just finished. `breakdownfile`
+        is the breakdown of the run by thread and task, first merged into
+        `profdatafile`, `children` are the (data file, shards directory)
+        of runs whose child processes are then merged, and `runfiles` the
+        results of repeated runs merged into `profdatafile` last.
+        """
+        self.cancel_loading()
+        # Partial results are rewritten by the profiled script
+        worker = LoadDataWorker(profdatafile, self.datatree.block_cache,
+                                codefile=codefile,
+                                convert=convert and not live,
+                                shardfiles=shardfiles,
+                                breakdown=self.shard_breakdown,
+                                history=self.history if store else None,
+                                run_info=self._get_run_info() if store
+                                else None,
+                                runfiles=runfiles, children=children,
+                                breakdownfile=breakdownfile)
+        if compare:
+            worker.signals.sig_loaded.connect(
+                functools.partial(self._on_baseline_loaded, worker))
+        else:
+            worker.signals.sig_loaded.connect(
+                functools.partial(self._on_data_loaded, worker, live))
+        worker.signals.sig_error.connect(
+            functools.partial(self._on_data_error, worker, live))
+        if not live:
+            worker.signals.sig_progress.connect(self._on_load_progress)
+            self.start_spinner()
+            self.datelabel.setText(_('Loading results...'))
+        self._load_worker = worker
+        QThreadPool.globalInstance().start(worker)
+
+    def cancel_loading(self):
+        """Cancel the loading of results, if any."""
+        if self._load_worker is not None:
+            self._load_worker.cancel()
+            self._load_worker = None
+            self.stop_spinner()
+        if self._finished_text is not None:
+            self._finished_text = None
+            self.sig_finished.emit()
+
+    def _on_load_progress(self, done, total):
+        self.datelabel.setText(
+            _('Loading results... {percent}%').format(
+                percent=100 * done // max(total, 1)))
+
+    def _on_data_loaded(self, worker, live, data):
+        if worker is not self._load_worker:
+            return  # Loading was cancelled
+        self._load_worker = None
+        self.datatree.set_data(data)
+        if live:
+            # The heatmap is only shown once the run finished, as computing
+            # it for every snapshot would slow down the interface
+            if self.datatree.stats:
+                self.datatree.update_tree()
+            return
+
+        self._heatmap_data = data
+        self._update_heatmap()
+        if data.path != self.MERGEDPATH:
+            self._shardfiles = []
+        if worker.run is not None:
+            self._current_run_id = worker.run['id']
+            self.update_history()
+        run = self.history.get_run(self._current_run_id)
+        budget_text = self._check_budgets(
+            data, self._run_script if run is None else run['script'])
+        self.stop_spinner()
+        self.datatree.show_tree()
+        # The results shown can be exported even without an output
+        self.save_action.setEnabled(True)
+        self.compare_action.setEnabled(run is not None)
+        self.pivotcombo.setEnabled(self.datatree.has_breakdown())
+        text_style = "<span style=\'color: #444444\'><b>%s </b></span>"
+        date_text = text_style % time.strftime(
+            "%d %b %Y %H:%M",
+            time.localtime(None if run is None else run['timestamp']))
+        self.datelabel.setText(date_text + budget_text)
+        if self._finished_text is not None:
+            self._finished_text += budget_text
+        self._emit_finished()
+
+    def _update_heatmap(self):
+        """Show the heat of the lines of the results in editors."""
+        self.heatmap.set_result(
+            self._heatmap_data if self.editor_heatmap else None)
+
+    def _check_budgets(self, data, script):
+        """
+        Check the results against the budgets of the project of `script`.
+
+        Violations are flagged in the tree. Returns a short summary to be
+        shown after the date, which is empty if there are no budgets.
+        """
+        self.datatree.violations = []
+        if not script:
+            return ''
+        try:
+            budgets, budget_file = get_budgets_for(script)
+        except BudgetError as error:
+            logger.error(str(error))
+            return _(' - Invalid budget file')
+        if budget_file is None:
+            return ''
+        violations = check_budgets(budgets, data)
+        self.datatree.violations = violations
+        if not violations:
+            return _(' - Within budgets')
+        return _(' - {count} budget violation(s)').format(
+            count=len(violations))
+
+    def _on_baseline_loaded(self, worker, data):
+        if worker is not self._load_worker:
+            return
+        self._load_worker = None
+        self.stop_spinner()
+        self.datatree.show_diff(compare_results(data, self.datatree.stats))
+        run = self.history.get_run(self._baseline_run_id)
+        text_style = "<span style=\'color: #444444\'><b>%s </b></span>"
+        self.datelabel.setText(text_style % _('Compared with {run}').format(
+            run='?' if run is None else self._run_label(run)))
+
+    def _on_data_error(self, worker, live, message):
+        if worker is not self._load_worker:
+            return
+        self._load_worker = None
+        if live:
+            # Snapshot files may be replaced while being read
+            return
+
+        self.stop_spinner()
+        logger.error(f'Could not load line profiler results: {message}')
+        self.datelabel.setText(_('Could not load profiling results'))
+        self._finished_text = None
+        self.sig_finished.emit()
+
+    def _get_run_info(self):
+        """Return the description of the run that just finished."""
+        args = self._last_args
+        if isinstance(args, list):
+            args = ' '.join(args)
+        return dict(script=self._run_script, args=args, wdir=self._last_wdir,
+                    output=self.output,
+                    timestamp=self.started_time.timestamp())
+
+    def update_history(self):
+        """Fill the history combobox with the runs of the current script."""
+        script = str(self.filecombo.currentText())
+        self.historycombo.blockSignals(True)
+        self.historycombo.clear()
+        for run in self.history.get_runs(osp.abspath(script)):
+            self.historycombo.addItem(self._run_label(run), run['id'])
+            self.historycombo.setItemData(
+                self.historycombo.count() - 1, self._run_tooltip(run),
+                Qt.ToolTipRole)
+        self.historycombo.setCurrentIndex(
+            self.historycombo.findData(self._current_run_id))
+        self.historycombo.blockSignals(False)
+
+    def load_run(self, run_id):
+        """Show the results of run `run_id` from the history."""
+        run = self.history.get_run(run_id)
+        if run is None:
+            self.update_history()
+            return
+        self.clear_data()
+        self.history.touch(run_id)
+        self._current_run_id = run_id
+        try:
+            with open(self.history.get_output_path(run_id),
+                      encoding='utf-8') as f:
+                self.output = f.read()
+        except OSError:
+            self.output = ''
+        output_exists = len(self.output) > 0
+        self.clear_action.setEnabled(True)
+        self.log_action.setEnabled(output_exists)
+        self.save_action.setEnabled(output_exists)
+        self.update_history()
+        self.load_results(self.history.get_data_path(run_id),
+                          codefile=self.history.get_code_path(run_id))
+
+    def select_baseline(self):
+        """Select a previous run to compare the results shown with."""
+        run = self.history.get_run(self._current_run_id)
+        if run is None or not self.datatree.stats:
+            self.datelabel.setText(_('No stored results to compare'))
+            return
+        runs = [other for other in self.history.get_runs(run['script'])
+                if other['id'] != run['id']]
+        if not runs:
+            self.datelabel.setText(_('No previous run to compare with'))
+            return
+        labels = [self._run_label(other) for other in runs]
+        label, valid = QInputDialog.getItem(
+            self, _('Compare runs'),
+            _('Compare the results shown with the run of:'),
+            labels, 0, False)
+        if valid:
+            self.compare_with_run(runs[labels.index(label)]['id'])
+
+    def compare_with_run(self, run_id):
+        """Compare the results shown with the ones of run `run_id`."""
+        if self.history.get_run(run_id) is None or not self.datatree.stats:
+            return
+        self._baseline_run_id = run_id
+        self.load_results(self.history.get_data_path(run_id),
+                          codefile=self.history.get_code_path(run_id),
+                          compare=True)
+
+    def _on_pivot_changed(self, index):
+        self.datatree.set_pivot(self.pivotcombo.itemData(index))
+
+    def _on_history_activated(self, index):
+        run_id = self.historycombo.itemData(index)
+        if run_id is not None and run_id != self._current_run_id:
+            self.load_run(run_id)
+
+    def _run_label(self, run):
+        return _('{date} ({time_ms:.3f}ms)').format(
+            date=time.strftime('%d %b %Y %H:%M:%S',
+                               time.localtime(run['timestamp'])),
+            time_ms=run['total_time'] * 1e3)
+
+    def _run_tooltip(self, run):
+        lines = [_('Arguments: {args}').format(args=run['args']),
+                 _('Working directory: {wdir}').format(wdir=run['wdir'])]
+        for func_name, filename, line_no, total_time in (
+                run['top_functions']):
+            lines.append(
+                _('{func_name} ({time_ms:.3f}ms) in file "{filename}", '
+                  'line {line_no}').format(
+                      func_name=func_name, time_ms=total_time * 1e3,
+                      filename=filename, line_no=line_no))
+        return '\n'.join(lines)
+
+    def _emit_finished(self):
+        """Report that profiling finished once its results are shown."""
+        if self._finished_text is None:
+            return
+        if not self.error_output:
+            self.datelabel.setText(self._finished_text)
+        self._finished_text = None
+        self.sig_finished.emit()
+
+    def start(self, wdir=None, args=None, repeat=1, parallel=1,
+              targets=None, auto_select=None, sampling=None):
         filename = str(self.filecombo.currentText())
 
         if wdir in [None, False]:
@@ -388,120 +1177,544 @@ class SpyderLineProfilerWidget(PluginMainWidget):
             if args is None:
                 args = []
 
+        if targets is None:
+            targets = self._last_targets
+            if targets is None:
+                targets = []
+
+        if auto_select is None:
+            auto_select = self._last_auto_select
+            if auto_select is None:
+                auto_select = (0, 'cumulative')
+
+        if sampling is None:
+            sampling = self._last_sampling
+            if sampling is None:
+                sampling = 0
+
         self._last_wdir = wdir
         self._last_args = args
+        self._last_targets = targets
+        self._last_auto_select = auto_select
+        self._last_sampling = sampling
+        self._targets = list(targets)
+        self._auto_select, self._auto_select_by = auto_select
+        self._run_script = osp.abspath(filename)
+        self._repeat = max(repeat, 1)
+        self._parallel = max(parallel, 1)
+        self._sampling = sampling
+        # Children would trace lines with their own profiler
+        self._with_children = self.profile_children and not self._sampling
+        # Memory is not kept when merging runs or processes and can't be
+        # sampled
+        self._with_memory = (self.memory_profiling and self._repeat == 1
+                             and not self._with_children
+                             and not self._sampling)
+        # Contexts are not kept when merging runs or processes, and
+        # targets have no decorator switching between them
+        self._with_breakdown = (self.context_breakdown and self._repeat == 1
+                                and not self._with_children
+                                and not self._targets
+                                and not self._auto_select
+                                and not self._sampling
+                                and not self._with_memory)
 
         self.datelabel.setText(_('Profiling starting up, please wait...'))
         self.started_time = datetime.now()
 
-        self.process = QProcess(self)
-        self.process.setProcessChannelMode(QProcess.SeparateChannels)
-        self.process.setWorkingDirectory(wdir)
-        self.process.readyReadStandardOutput.connect(self.read_output)
-        self.process.readyReadStandardError.connect(
-            lambda: self.read_output(error=True))
-        self.process.finished.connect(self.finished)
-
-        proc_env = QProcessEnvironment()
-        for k, v in os.environ.items():
-            proc_env.insert(k, v)
-        proc_env.remove('PYTHONPATH')
-        if self.pythonpath is not None:
-            logger.debug(f"Pass Pythonpath {self.pythonpath} to process")
-            proc_env.insert('PYTHONPATH', os.pathsep.join(self.pythonpath))
-        self.process.setProcessEnvironment(proc_env)
+        self._process_env = self._get_process_env()
 
         self.clear_data()
         self.error_output = ''
-
-        # Use UTF-8 mode so that profiler writes its output to DATAPATH using
-        # UTF-8 encoding, instead of the ANSI code page on Windows.
-        # See issue spyder-ide/spyder-line-profiler#90
-        #
-        # UTF-8 mode also changes the encoding of stdin/stdout/stdout which must
-        # be taken into account when using stdandard I/O.
-        p_args = ['-X', 'utf8', '-m', 'kernprof', '-lvb', '-o', self.DATAPATH]
+        max_size = self.output_max_size * 2**20
+        self._output_buffer = OutputBuffer(max_size)
+        self._error_buffer = OutputBuffer(max_size)
 
         if os.name == 'nt':
             # On Windows, one has to replace backslashes by slashes to avoid
             # confusion with escape characters (otherwise, for example, '\t'
             # will be interpreted as a tabulation):
-            p_args.append(osp.normpath(filename).replace(os.sep, '/'))
+            self._script_args = [osp.normpath(filename).replace(os.sep, '/')]
         else:
-            p_args.append(filename)
+            self._script_args = [filename]
         if args:
-            p_args.extend(programs.shell_split(args))
+            self._script_args.extend(programs.shell_split(args))
+
+        self._executable = self._get_executable()
 
+        if self._auto_select:
+            started = self._start_selection()
+            self.set_running_state(started)
+            self.timer.start(1000)
+            if not started:
+                QMessageBox.critical(self, _("Error"),
+                                     _("Process failed to start"))
+        else:
+            self._start_runs()
+
+    def _get_executable(self):
+        """Return the interpreter running the profiled scripts."""
         executable = self.get_conf('executable', section='main_interpreter')
         if executable.endswith('spyder.exe'):
             # py2exe distribution
             executable = 'python.exe'
+        return executable
 
-        logger.debug(f'Starting process with {executable=} and {p_args=}')
-        self.process.start(executable, p_args)
+    def _get_process_env(self):
+        """Return the environment of the profiling processes."""
+        proc_env = QProcessEnvironment()
+        for k, v in os.environ.items():
+            proc_env.insert(k, v)
+        proc_env.remove('PYTHONPATH')
+        if self.pythonpath is not None:
+            logger.debug(f"Pass Pythonpath {self.pythonpath} to process")
+            proc_env.insert('PYTHONPATH', os.pathsep.join(self.pythonpath))
+        return proc_env
+
+    def _get_worker_key(self, executable):
+        """
+        Return what a warm worker started now for `executable` depends on.
+
+        Workers whose key differs from the current one are outdated.
+        """
+        preload = [name.strip() for name in self.preload_modules.split(',')
+                   if name.strip()]
+        return (executable, tuple(self.pythonpath or ()), tuple(preload))
 
-        running = self.process.waitForStarted()
+    def fill_worker_pool(self):
+        """
+        Start warm workers until `warm_workers` of them are idle.
+
+        Each worker is an interpreter which already imported the runner
+        and the preloaded modules, and waits to run a single profiling
+        job (see bootstrap/worker.py).
+        """
+        if not self.warm_workers:
+            return
+        executable = self._get_executable()
+        key = self._get_worker_key(executable)
+        for worker, worker_key in list(self._workers):
+            if worker_key != key:
+                self._workers.remove((worker, worker_key))
+                self._stop_worker(worker)
+        p_args = ['-X', 'utf8', get_bootstrap_path('worker')]
+        for name in key[2]:
+            p_args += ['--preload', name]
+        while len(self._workers) < self.warm_workers:
+            worker = QProcess(self)
+            worker.setProcessChannelMode(QProcess.SeparateChannels)
+            worker.setWorkingDirectory(getcwd_or_home())
+            worker.setProcessEnvironment(self._get_process_env())
+            worker.finished.connect(
+                functools.partial(self._on_worker_finished, worker))
+            logger.debug(f'Starting worker with {executable=} and {p_args=}')
+            worker.start(executable, p_args)
+            self._workers.append((worker, key))
+
+    def stop_workers(self):
+        """Stop all idle warm workers."""
+        workers, self._workers = self._workers, []
+        for worker, _key in workers:
+            self._stop_worker(worker)
+
+    def _stop_worker(self, worker):
+        worker.finished.disconnect()
+        # Workers exit when their input is closed without a job
+        worker.closeWriteChannel()
+        if not worker.waitForFinished(1000):
+            worker.kill()
+            worker.waitForFinished()
+        worker.deleteLater()
+
+    def _take_worker(self):
+        """Return an idle warm worker for the current run, or None."""
+        key = self._get_worker_key(self._executable)
+        while self._workers:
+            worker, worker_key = self._workers.pop(0)
+            if (worker_key == key
+                    and worker.state() != QProcess.NotRunning):
+                worker.finished.disconnect()
+                return worker
+            self._stop_worker(worker)
+        return None
+
+    def _on_worker_finished(self, worker):
+        """Forget a worker which exited before it got a job."""
+        self._workers = [(other, key) for other, key in self._workers
+                         if other is not worker]
+        worker.deleteLater()
+
+    def _start_runs(self):
+        """Start the profiling runs of the script."""
+        # Runs are started as others finish, so that at most `parallel`
+        # of them run at the same time
+        self._pending_runs = list(range(self._repeat))
+        running = False
+        failed = False
+        for __ in range(min(self._parallel, self._repeat)):
+            if not self._start_next_run():
+                self._pending_runs = []
+                failed = True
+                break
+            running = True
         self.set_running_state(running)
-        self.timer.timeout.connect(self.update_timer)
         self.timer.start(1000)
 
-        if not running:
+        if failed:
             QMessageBox.critical(self, _("Error"),
                                  _("Process failed to start"))
 
+    def _start_selection(self):
+        """
+        Run the script with cProfile to select the functions to profile.
+
+        Returns False if the process failed to start.
+        """
+        self._selecting = True
+        try:
+            os.remove(self.CALLSTATSPATH)
+        except OSError:
+            pass
+
+        # The output is the one of the profiling run that follows
+        process = QProcess(self)
+        process.setWorkingDirectory(self._last_wdir)
+        process.setStandardOutputFile(QProcess.nullDevice())
+        process.setStandardErrorFile(QProcess.nullDevice())
+        process.finished.connect(
+            functools.partial(self._on_selection_finished, process))
+        process.setProcessEnvironment(self._process_env)
+        p_args = ['-X', 'utf8', '-m', 'cProfile', '-o', self.CALLSTATSPATH]
+        p_args += self._script_args
+
+        logger.debug(f'Starting process with executable={self._executable} '
+                     f'and {p_args=}')
+        process.start(self._executable, p_args)
+        if not process.waitForStarted():
+            self._selecting = False
+            return False
+        self.processes.append(process)
+        return True
+
+    def _on_selection_finished(self, process):
+        if process not in self.processes:
+            return
+        self.processes.remove(process)
+        self._selecting = False
+        if self.output == 'aborted':
+            self.finished()
+            return
+
+        roots = [osp.dirname(self._run_script)]
+        if self._last_wdir:
+            roots.append(self._last_wdir)
+        try:
+            selected = select_hot_functions(
+                load_call_stats(self.CALLSTATSPATH), self._auto_select,
+                self._auto_select_by, roots)
+        except Exception:
+            logger.error('Could not select the functions to profile',
+                         exc_info=True)
+            selected = []
+        try:
+            os.remove(self.CALLSTATSPATH)
+        except OSError:
+            pass
+        logger.debug(f'Selected functions to profile: {selected}')
+        self._targets.extend(
+            target for target in selected if target not in self._targets)
+        self._start_runs()
+        if not self.processes:
+            self.finished()
+
+    def _get_run_datafile(self, run_index):
+        """Return the file where run `run_index` saves its results."""
+        if self._repeat == 1:
+            return self.DATAPATH
+        return f'{self.DATAPATH}.{run_index}'
+
+    def _get_run_shards_dir(self, run_index):
+        """Return where the children of run `run_index` save results."""
+        if self._repeat == 1:
+            return self.SHARDSPATH
+        return f'{self.SHARDSPATH}.{run_index}'
+
+    def _start_next_run(self):
+        """Start the next pending run. Returns False if it failed."""
+        run_index = self._pending_runs.pop(0)
+        datafile = self._get_run_datafile(run_index)
+
+        worker = self._take_worker()
+        if worker is not None:
+            process = worker
+        else:
+            process = QProcess(self)
+            process.setProcessChannelMode(QProcess.SeparateChannels)
+            process.setWorkingDirectory(self._last_wdir)
+            process.setProcessEnvironment(self._process_env)
+        process.readyReadStandardOutput.connect(
+            functools.partial(self.read_output, process))
+        process.readyReadStandardError.connect(
+            functools.partial(self.read_output, process, error=True))
+        process.finished.connect(
+            functools.partial(self._on_process_finished, process))
+
+        # Use UTF-8 mode so that profiler writes its output to DATAPATH using
+        # UTF-8 encoding, instead of the ANSI code page on Windows.
+        # See issue spyder-ide/spyder-line-profiler#90
+        #
+        # UTF-8 mode also changes the encoding of stdin/stdout/stdout which must
+        # be taken into account when using stdandard I/O.
+        p_args = ['-X', 'utf8']
+        live_update = self.live_update and self._repeat == 1
+        if (worker is not None or live_update or self._with_children
+                or self._with_breakdown or self._targets or self._sampling
+                or self._with_memory):
+            # Our own runner is needed to write partial results regularly,
+            # to profile child processes, to break down timings, to
+            # profile functions without decorators, to sample lines and
+            # to profile memory. Warm workers always run it.
+            p_args += [get_bootstrap_path('runner'), '-o', datafile]
+            if live_update:
+                self._remove_snapshot()
+                p_args += ['--snapshot', self.SNAPSHOTPATH,
+                           '--interval', str(self.live_update_interval)]
+            if self._with_children:
+                shards_dir = self._get_run_shards_dir(run_index)
+                shutil.rmtree(shards_dir, ignore_errors=True)
+                p_args += ['--children', shards_dir]
+            if self._with_breakdown:
+                self._remove_breakdown()
+                p_args += ['--breakdown', self.BREAKDOWNPATH]
+            for target in self._targets:
+                p_args += ['--target', target]
+            if self._sampling:
+                p_args += ['--sampling', str(self._sampling)]
+            if self._with_memory:
+                p_args += ['--memory']
+        else:
+            p_args += ['-m', 'kernprof', '-lvb', '-o', datafile]
+        p_args += self._script_args
+
+        if worker is not None:
+            # The worker runs the runner itself, with the same arguments
+            job = {'wdir': self._last_wdir, 'args': p_args[3:]}
+            logger.debug(f'Sending job to warm worker: {job}')
+            worker.write(json.dumps(job).encode('utf-8') + b'\n')
+            worker.closeWriteChannel()
+            self.processes.append(worker)
+            # Output written while the worker was idle, like preload errors
+            self.read_output(worker)
+            self.read_output(worker, error=True)
+            return True
+
+        logger.debug(f'Starting process with executable={self._executable} '
+                     f'and {p_args=}')
+        process.start(self._executable, p_args)
+        if not process.waitForStarted():
+            return False
+        self.processes.append(process)
+        return True
+
+    def _on_process_finished(self, process):
+        if process not in self.processes:
+            return
+        self.processes.remove(process)
+        if self._pending_runs and not self._start_next_run():
+            self._pending_runs = []
+        if not self.processes:
+            self.finished()
+
+    def _get_children(self):
+        """
+        Return the (data file, shards directory) of the runs that just
+        finished whose child processes were profiled, which are merged
+        when their results are loaded, or None.
+        """
+        if not self._with_children:
+            return None
+        return [(self._get_run_datafile(run_index),
+                 self._get_run_shards_dir(run_index))
+                for run_index in range(self._repeat)]
+
+    def _get_runfiles(self):
+        """
+        Return the files of the repeated runs that just finished, which
+        are merged when their results are loaded, or None.
+        """
+        if self._repeat == 1:
+            return None
+        return [self._get_run_datafile(run_index)
+                for run_index in range(self._repeat)]
+
+    def _remove_runfiles(self):
+        """Remove the results of the runs that were aborted."""
+        if self._with_breakdown:
+            self._remove_breakdown()
+        for _datafile, shards_dir in self._get_children() or []:
+            shutil.rmtree(shards_dir, ignore_errors=True)
+        for datafile in self._get_runfiles() or []:
+            try:
+                os.remove(datafile)
+            except OSError:
+                pass
+
     def set_running_state(self, state=True):
         self.start_action.setEnabled(not state)
         self.stop_action.setEnabled(state)
+        self.historycombo.setEnabled(not state)
 
-    def read_output(self, error=False):
+    def read_output(self, process, error=False):
         if error:
-            self.process.setReadChannel(QProcess.StandardError)
+            qba = process.readAllStandardError()
+            buffer = self._error_buffer
         else:
-            self.process.setReadChannel(QProcess.StandardOutput)
-        qba = QByteArray()
-        while self.process.bytesAvailable():
-            if error:
-                qba += self.process.readAllStandardError()
-            else:
-                qba += self.process.readAllStandardOutput()
-        # encoding: Python process is started with UTF-8 mode
-        text = str(qba.data(), encoding="utf-8")
-        if error:
-            self.error_output += text
-        else:
-            self.output += text
+            qba = process.readAllStandardOutput()
+            buffer = self._output_buffer
+        # encoding: Python process is started with UTF-8 mode. Chunks are
+        # decoded separately for each process, as they can split
+        # characters and processes can run in parallel.
+        buffer.write(qba.data(), source=process)
 
     def finished(self):
         self.timer.stop()
+        self._remove_snapshot()
         self.set_running_state(False)
+        # Replace the workers used by the runs, now that they don't
+        # compete with them for the CPU
+        self.fill_worker_pool()
+        self._output_buffer.flush()
+        self._error_buffer.flush()
+        self.error_output = self._error_buffer.getvalue()
+        if self.output != 'aborted':
+            self.output = self._output_buffer.getvalue()
         self.output = self.error_output + self.output
+        loading = False
         if not self.output == 'aborted':
             elapsed = str(datetime.now() - self.started_time).split(".")[0]
-            self.show_data(justanalyzed=True)
-            self.datelabel.setText(_(f'Profiling finished after {elapsed}'))
+            loading = self.show_data(justanalyzed=True)
+            if loading:
+                # sig_finished is emitted when results are shown
+                self._finished_text = _(
+                    f'Profiling finished after {elapsed}')
         self.show_errorlog()  # If errors occurred, show them.
-        self.sig_finished.emit()
+        if not loading:
+            self._remove_runfiles()
+            self.sig_finished.emit()
 
     def kill_if_running(self):
         self.datelabel.setText(_('Profiling aborted.'))
-        if self.process is not None:
-            if self.process.state() == QProcess.Running:
-                self.process.kill()
+        if self._console is not None:
+            # The results collected until the interruption are shown
+            self._console.interrupt_kernel()
+        self._pending_runs = []
+        for process in list(self.processes):
+            if process.state() == QProcess.Running:
+                process.kill()
                 self.output = 'aborted'
-                self.process.waitForFinished()
+                process.waitForFinished()
 
     @on_conf_change(section='pythonpath_manager', option='spyder_pythonpath')
     def _update_pythonpath(self, value):
         self.pythonpath = value
+        # Workers started with the previous path are replaced
+        self.fill_worker_pool()
+
+    @on_conf_change(option='live_update')
+    def _update_live_update(self, value):
+        self.live_update = value
+
+    @on_conf_change(option='live_update_interval')
+    def _update_live_update_interval(self, value):
+        self.live_update_interval = value
+
+    @on_conf_change(option='profile_children')
+    def _update_profile_children(self, value):
+        self.profile_children = value
+
+    @on_conf_change(option='context_breakdown')
+    def _update_context_breakdown(self, value):
+        self.context_breakdown = value
+
+    @on_conf_change(option='shard_breakdown')
+    def _update_shard_breakdown(self, value):
+        self.shard_breakdown = value
+        if self._shardfiles:
+            # Merge the files shown again
+            self.load_data_files(self._shardfiles)
+
+    @on_conf_change(option='editor_heatmap')
+    def _update_editor_heatmap(self, value):
+        self.editor_heatmap = value
+        self._update_heatmap()
+
+    @on_conf_change(option='memory_profiling')
+    def _update_memory_profiling(self, value):
+        self.memory_profiling = value
+
+    @on_conf_change(option='warm_workers')
+    def _update_warm_workers(self, value):
+        self.warm_workers = value
+        # Extra workers are stopped, and started again if needed
+        self.stop_workers()
+        self.fill_worker_pool()
+
+    @on_conf_change(option='preload_modules')
+    def _update_preload_modules(self, value):
+        self.preload_modules = value
+        # Workers without these modules are replaced
+        self.fill_worker_pool()
+
+    @on_conf_change(option='output_max_size')
+    def _update_output_max_size(self, value):
+        self.output_max_size = value
+
+    @on_conf_change(option='history_max_runs')
+    def _update_history_max_runs(self, value):
+        self.history.max_runs = value
+        self.history.prune()
+        self.update_history()
+
+    @on_conf_change(option='history_max_size')
+    def _update_history_max_size(self, value):
+        self.history.max_size = value * 2**20
+        self.history.prune()
+        self.update_history()
+
+    def _remove_snapshot(self):
+        self._snapshot_mtime = None
+        try:
+            os.remove(self.SNAPSHOTPATH)
+        except OSError:
+            pass
+
+    def _remove_breakdown(self):
+        try:
+            os.remove(self.BREAKDOWNPATH)
+        except OSError:
+            pass
 
     def clear_data(self):
+        self.cancel_loading()
         self.datatree.clear()
+        self._heatmap_data = None
+        self.heatmap.clear()
+        self.pivotcombo.setEnabled(False)
+        self._current_run_id = None
+        self.historycombo.setCurrentIndex(-1)
         self.clear_action.setEnabled(False)
         self.log_action.setEnabled(False)
         self.save_action.setEnabled(False)
+        self.compare_action.setEnabled(False)
         self.output = ''
+        self._shardfiles = []
 
     def show_data(self, justanalyzed=False):
+        """
+        Start loading the results of the last run and show them.
+
+        Returns True if loading started.
+        """
         if not justanalyzed:
             self.clear_data()
         output_exists = self.output is not None and len(self.output) > 0
@@ -512,38 +1725,62 @@ class SpyderLineProfilerWidget(PluginMainWidget):
         self.kill_if_running()
         filename = str(self.filecombo.currentText())
         if not filename:
-            return
+            return False
 
-        self.datatree.load_data(self.DATAPATH)
-        QApplication.processEvents()
-        self.datatree.show_tree()
-
-        text_style = "<span style=\'color: #444444\'><b>%s </b></span>"
-        date_text = text_style % time.strftime("%d %b %Y %H:%M",
-                                               time.localtime())
-        self.datelabel.setText(date_text)
+        # The results of the runs are merged in the thread loading them
+        self.load_results(
+            self.DATAPATH, store=True,
+            runfiles=self._get_runfiles() if justanalyzed else None,
+            children=self._get_children() if justanalyzed else None,
+            breakdownfile=self.BREAKDOWNPATH
+            if justanalyzed and self._with_breakdown else None)
+        return True
 
     def save_data(self):
-        """Save data."""
-        if not self.output:
+        """
+        Save the output of kernprof, or export the results shown.
+
+        Results are exported with a record for each line of code, except
+        in JSON where lines are grouped by function.
+        """
+        if not self.output and not self.datatree.stats:
             self.datelabel.setText(_("Nothing to save"))
             return
 
         title = _("Save line profiler result")
         curr_filename = self.filecombo.currentText()
-        filename, _selfilter = getsavefilename(
+        filters = {}
+        if self.output:
+            filters[_("LineProfiler result") + " (*.txt)"] = None
+        if self.datatree.stats:
+            filters[_("JSON results") + " (*.json)"] = 'json'
+            filters[_("JSON Lines records") + " (*.jsonl)"] = 'jsonl'
+            filters[_("CSV results") + " (*.csv)"] = 'csv'
+            if is_format_available('parquet'):
+                filters[_("Parquet records") + " (*.parquet)"] = 'parquet'
+        extension = '.txt' if self.output else '.json'
+        filename, selfilter = getsavefilename(
             self,
             title,
-            f'{curr_filename}_lineprof.txt',
-            _("LineProfiler result") + " (*.txt)",
+            f'{curr_filename}_lineprof{extension}',
+            ';;'.join(filters),
         )
 
         if filename:
-            with open(filename, 'w') as f:
-                # for some weird reason, everything is double spaced on Win
-                results = self.output
-                results = results.replace('\r', '')
-                f.write(results)
+            export_format = filters.get(selfilter)
+            if export_format in BINARY_FORMATS:
+                with open(filename, 'wb') as f:
+                    write_results([self.datatree.stats], f, export_format)
+            elif export_format is not None:
+                with open(filename, 'w', encoding='utf-8', newline='') as f:
+                    write_results([self.datatree.stats], f, export_format)
+            else:
+                with open(filename, 'w') as f:
+                    # for some weird reason, everything is double spaced on
+                    # Win
+                    results = self.output
+                    results = results.replace('\r', '')
+                    f.write(results)
 
             self.datelabel.setText(_(f"Saved results to {filename}"))
 
@@ -551,25 +1788,713 @@ class SpyderLineProfilerWidget(PluginMainWidget):
         pass
 
 
-class LineProfilerDataTree(QTreeWidget):
+class FunctionNode:
+    """
+    A profiled function shown in the tree, wrapping its FunctionResult.
+
+    The line rows shown in the tree are not materialized: the model reads
+    the values it needs from the result when the view asks for them.
+    """
+    __slots__ = ('result', 'color', 'order', 'line_rows', 'row',
+                 'sort_keys')
+
+    def __init__(self, result, color):
+        self.result = result
+        self.color = color
+        self.order = list(range(len(result)))  # Sorted line rows
+        self.line_rows = list(self.order)  # Row of each line, see order
+        self.row = 0  # Position among the top-level rows
+        self.sort_keys = {}  # Cached sort keys of the line rows by column
+
+    def __len__(self):
+        return len(self.result)
+
+    def sort(self, column, reverse=False):
+        """Sort the line rows by `column`."""
+        self.order.sort(key=self.get_sort_keys(column).__getitem__,
+                        reverse=reverse)
+        for row, pos in enumerate(self.order):
+            self.line_rows[pos] = row
+
+    def update(self, result):
+        """
+        Replace the result by a newer one for the same lines of code.
+
+        Returns the positions of the lines whose values changed, or None
+        if the lines of code are not the same anymore.
+        """
+        old = self.result
+        if result.line_nos != old.line_nos:
+            return None
+        if result.total_time != old.total_time:
+            # Percents of all the lines that ran have changed
+            changed = [pos for pos in range(len(result))
+                       if old.hits[pos] or result.hits[pos]]
+        else:
+            changed = [pos for pos in range(len(result))
+                       if old.hits[pos] != result.hits[pos]
+                       or (result.hits[pos]
+                           and old.times[pos] != result.times[pos])]
+        self.result = result
+        self.sort_keys.clear()
+        return changed
+
+    def get_sort_keys(self, column):
+        """
+        Return the keys used to sort the lines of the function by `column`.
+
+        Keys are computed once per column and cached, so that sorting
+        compares plain numbers (or tuples for text) instead of parsing
+        display strings on every comparison.
+        """
+        keys = self.sort_keys.get(column)
+        if keys is not None:
+            return keys
+        result = self.result
+        if column == COL_NO:
+            keys = result.line_nos
+        elif column == COL_LINE:
+            keys = [natural_sort_key(result.get_code(pos))
+                    for pos in range(len(result))]
+        else:
+            getter = {
+                COL_HITS: result.get_hits,
+                COL_TIME: result.get_time,
+                COL_PERHIT: result.get_perhit,
+                COL_PERCENT: result.get_percent,
+                COL_MEM: result.get_memory,
+                COL_PEAK: result.get_peak,
+            }[column]
+            keys = []
+            for pos in range(len(result)):
+                value = getter(pos)
+                keys.append(NOT_RUN_SORT_KEY if value is None else value)
+        self.sort_keys[column] = keys
+        return keys
+
+    def label(self):
+        result = self.result
+        if (isinstance(result, ContextFunctionResult)
+                and result.context is not None):
+            return _('{func_name} ({time_ms:.3f}ms in {context}) in file '
+                     '"{filename}", line {line_no}').format(
+                        filename=result.filename,
+                        line_no=result.start_line_no,
+                        func_name=result.func_name,
+                        time_ms=result.total_time * 1e3,
+                        context=result.context)
+        if isinstance(result, RepeatedFunctionResult):
+            return _('{func_name} ({time_ms:.3f} ± {error_ms:.3f}ms, mean '
+                     'of {runs} runs) in file "{filename}", '
+                     'line {line_no}').format(
+                        filename=result.filename,
+                        line_no=result.start_line_no,
+                        func_name=result.func_name,
+                        time_ms=result.total_time * 1e3,
+                        error_ms=result.total_error * 1e3,
+                        runs=result.runs)
+        if (isinstance(result, ProcessFunctionResult)
+                and len(result.processes) > 1):
+            return _('{func_name} ({time_ms:.3f}ms in {count} processes) in '
+                     'file "{filename}", line {line_no}').format(
+                        filename=result.filename,
+                        line_no=result.start_line_no,
+                        func_name=result.func_name,
+                        time_ms=result.total_time * 1e3,
+                        count=len(result.processes))
+        return _('{func_name} ({time_ms:.3f}ms) in file "{filename}", '
+                 'line {line_no}').format(
+                    filename=result.filename,
+                    line_no=result.start_line_no,
+                    func_name=result.func_name,
+                    time_ms=result.total_time * 1e3)
+
+
+class DiffNode(FunctionNode):
+    """A function compared between two runs, wrapping its FunctionDiff."""
+    __slots__ = ()
+
+    def get_sort_keys(self, column):
+        keys = self.sort_keys.get(column)
+        if keys is not None:
+            return keys
+        diff = self.result
+        if column == DIFF_COL_LINE:
+            keys = [natural_sort_key(diff.get_code(pos))
+                    for pos in range(len(diff))]
+        else:
+            getter = {
+                DIFF_COL_NO: diff.get_line_no,
+                DIFF_COL_HITS: diff.get_new_hits,
+                DIFF_COL_DHITS: diff.get_hits_delta,
+                DIFF_COL_TIME: diff.get_new_time,
+                DIFF_COL_DTIME: diff.get_time_delta,
+                DIFF_COL_RATIO: diff.get_ratio,
+                DIFF_COL_MEM: diff.get_new_memory,
+                DIFF_COL_DMEM: diff.get_memory_delta,
+            }[column]
+            keys = []
+            for pos in range(len(diff)):
+                value = getter(pos)
+                keys.append(NOT_RUN_SORT_KEY if value is None else value)
+        self.sort_keys[column] = keys
+        return keys
+
+    def label(self):
+        diff = self.result
+        return _('{func_name} ({old_ms:.3f}ms → {new_ms:.3f}ms) in file '
+                 '"{filename}", line {line_no}').format(
+                    filename=diff.filename,
+                    line_no=diff.start_line_no,
+                    func_name=diff.func_name,
+                    old_ms=diff.old_total_time * 1e3,
+                    new_ms=diff.new_total_time * 1e3)
+
+
+class LineProfilerDataModel(QAbstractItemModel):
+    """
+    Item model with the line profiler data shown by LineProfilerDataTree.
+
+    Top-level rows are the profiled functions and their children are the
+    lines of code of each function. Display strings, colors and fonts are
+    computed on demand in `data`, so only the rows that are actually
+    visible cost anything.
+    """
+    NODE_CLASS = FunctionNode
+
+    def __init__(self, header_list, parent=None):
+        QAbstractItemModel.__init__(self, parent)
+        self.header_list = header_list
+        self.functions = []    # List of FunctionNode
+        self.order = []        # Sorted top-level rows
+        self.message = None    # Text shown instead of the functions
+        self.violations = {}   # Budget violations by function and line
+        self.monospace_font = QFont()
+        self.message_font = QFont()
+        self.message_font.setStyle(QFont.StyleItalic)
+
+    # ---- Public API
+    # ------------------------------------------------------------------------
+    def set_stats(self, stats, use_colors=True, monospace_font=None):
+        """Replace the model contents by `stats`."""
+        self.beginResetModel()
+        self.functions = []
+        self.message = None
+        if monospace_font is not None:
+            self.monospace_font = monospace_font
+        for func_index, result in enumerate(stats.values()):
+            if use_colors:
+                color_index = func_index % len(COLOR_CYCLE)
+            else:
+                color_index = 0
+            self.functions.append(
+                self.NODE_CLASS(result, QColor(COLOR_CYCLE[color_index])))
+        self.order = list(range(len(self.functions)))
+        for row, func in enumerate(self.functions):
+            func.row = row
+        self.endResetModel()
+
+    def update_stats(self, stats, use_colors=True):
+        """
+        Update the model with newer `stats` for the same profiled code.
+
+        Only rows whose values changed are signaled to the views, and
+        functions that were not profiled before are appended. Returns
+        False if the data is not compatible with the current contents,
+        in which case nothing is changed.
+        """
+        if self.message is not None:
+            return False
+        current = {func.result.func_info: func for func in self.functions}
+
+        # First check that all functions can be updated
+        new_results = []
+        for func_info, result in stats.items():
+            func = current.get(func_info)
+            if func is None:
+                new_results.append(result)
+            elif result.line_nos != func.result.line_nos:
+                return False
+
+        for func_info, result in stats.items():
+            func = current.get(func_info)
+            if func is None:
+                continue
+            changed = func.update(result)
+            if not changed:
+                continue
+            self.dataChanged.emit(self.createIndex(func.row, 0),
+                                  self.createIndex(func.row, 0))
+            # Signal each range of consecutive rows that changed
+            rows = sorted(func.line_rows[pos] for pos in changed)
+            first = rows[0]
+            for previous, row in zip(rows, rows[1:] + [None]):
+                if row == previous + 1:
+                    continue
+                self.dataChanged.emit(
+                    self.createIndex(first, 0, func),
+                    self.createIndex(previous, self.columnCount() - 1, func))
+                first = row
+
+        if new_results:
+            first = len(self.functions)
+            self.beginInsertRows(
+                QModelIndex(), first, first + len(new_results) - 1)
+            for func_index, result in enumerate(new_results, first):
+                if use_colors:
+                    color_index = func_index % len(COLOR_CYCLE)
+                else:
+                    color_index = 0
+                func = self.NODE_CLASS(
+                    result, QColor(COLOR_CYCLE[color_index]))
+                func.row = func_index
+                self.functions.append(func)
+                self.order.append(func_index)
+            self.endInsertRows()
+        return True
+
+    def set_message(self, message):
+        """Show a single informative row instead of any data."""
+        self.beginResetModel()
+        self.functions = []
+        self.order = []
+        self.message = message
+        self.endResetModel()
+
+    def clear(self):
+        """Remove all data from the model."""
+        self.beginResetModel()
+        self.functions = []
+        self.order = []
+        self.message = None
+        self.endResetModel()
+
+    def set_violations(self, violations):
+        """
+        Flag the functions and lines with budget `violations`.
+
+        This is taken into account the next time the contents are set.
+        """
+        self.violations = {}
+        for violation in violations:
+            self.violations.setdefault(
+                (violation.func_info, violation.line_no), []).append(
+                    violation.message())
+
+    def get_function(self, row):
+        """Return the FunctionNode displayed at top-level `row`."""
+        return self.functions[self.order[row]]
+
+    # ---- Qt API
+    # ------------------------------------------------------------------------
+    def index(self, row, column, parent=QModelIndex()):
+        if not self.hasIndex(row, column, parent):
+            return QModelIndex()
+        if not parent.isValid():
+            return self.createIndex(row, column)
+        return self.createIndex(row, column, self.get_function(parent.row()))
+
+    def parent(self, index=None):
+        if index is None:
+            return QAbstractItemModel.parent(self)
+        if not index.isValid():
+            return QModelIndex()
+        func = index.internalPointer()
+        if func is None:
+            return QModelIndex()
+        return self.createIndex(func.row, 0)
+
+    def rowCount(self, parent=QModelIndex()):
+        if not parent.isValid():
+            if self.message is not None:
+                return 1
+            return len(self.functions)
+        if (parent.column() != 0 or parent.internalPointer() is not None
+                or self.message is not None):
+            return 0
+        return len(self.get_function(parent.row()))
+
+    def columnCount(self, parent=QModelIndex()):
+        return len(self.header_list)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if orientation != Qt.Horizontal:
+            return None
+        if role == Qt.DisplayRole:
+            return self.header_list[section]
+        elif role == Qt.TextAlignmentRole:
+            return int(Qt.AlignCenter)
+        return None
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        func = index.internalPointer()
+        if func is None:
+            if self.message is not None:
+                return self._message_data(index, role)
+            return self._function_data(index, role)
+        return self._line_data(func, index, role)
+
+    def sort(self, column, order=Qt.AscendingOrder):
+        """Sort functions and, within each function, lines by `column`."""
+        if not self.functions:
+            return
+        reverse = order == Qt.DescendingOrder
+
+        self.layoutAboutToBeChanged.emit()
+        old_indexes = self.persistentIndexList()
+        old_positions = []
+        for index in old_indexes:
+            func = index.internalPointer()
+            if func is None:
+                old_positions.append((None, self.order[index.row()]))
+            else:
+                old_positions.append((func, func.order[index.row()]))
+
+        func_keys = [self._function_sort_key(func, column)
+                     for func in self.functions]
+        self.order.sort(key=func_keys.__getitem__, reverse=reverse)
+        for row, func_index in enumerate(self.order):
+            self.functions[func_index].row = row
+        for func in self.functions:
+            func.sort(column, reverse=reverse)
+
+        new_indexes = []
+        for index, (func, pos) in zip(old_indexes, old_positions):
+            if func is None:
+                row = self.functions[pos].row
+                new_indexes.append(self.createIndex(row, index.column()))
+            else:
+                row = func.line_rows[pos]
+                new_indexes.append(
+                    self.createIndex(row, index.column(), func))
+        self.changePersistentIndexList(old_indexes, new_indexes)
+        self.layoutChanged.emit()
+
+    # ---- Private API
+    # ------------------------------------------------------------------------
+    def _message_data(self, index, role):
+        if index.column() != 0:
+            return None
+        if role == Qt.DisplayRole:
+            return self.message
+        elif role == Qt.FontRole:
+            return self.message_font
+        elif role == Qt.TextAlignmentRole:
+            return int(Qt.AlignCenter)
+        return None
+
+    def _function_data(self, index, role):
+        func = self.get_function(index.row())
+        column = index.column()
+        if role == Qt.DisplayRole:
+            if column == 0:
+                return func.label()
+        elif role == Qt.ForegroundRole:
+            if (func.result.func_info, None) in self.violations:
+                return BUDGET_VIOLATION_COLOR
+        elif role == Qt.ToolTipRole:
+            messages = list(self.violations.get(
+                (func.result.func_info, None), []))
+            if isinstance(func.result, ProcessFunctionResult):
+                messages.extend(
+                    _('{process}: {time_ms:.3f}ms').format(
+                        process=label, time_ms=result.total_time * 1e3)
+                    for label, result in func.result.processes)
+            if isinstance(func.result, ContextFunctionResult):
+                messages.extend(
+                    _('{context}: {time_ms:.3f}ms').format(
+                        context=self._context_label(thread, task),
+                        time_ms=result.total_time * 1e3)
+                    for thread, task, result in func.result.contexts)
+            if messages:
+                return '\n'.join(messages)
+        elif role == Qt.UserRole:
+            if column == COL_POS:
+                return (osp.normpath(func.result.filename),
+                        func.result.start_line_no)
+        elif role == SORT_ROLE:
+            return self._function_sort_key(func, column)
+        return None
+
+    def _line_data(self, func, index, role):
+        result = func.result
+        pos = func.order[index.row()]
+        column = index.column()
+        if role == Qt.DisplayRole:
+            if column == COL_NO:
+                return result.get_line_no(pos)
+            return self._line_text(result, pos, column)
+        elif role == Qt.BackgroundRole:
+            # Memory columns are shaded by memory instead of time
+            if (column == COL_MEM
+                    and isinstance(result, MemoryFunctionResult)):
+                percent = result.get_memory_percent(pos)
+            elif (column == COL_PEAK
+                    and isinstance(result, MemoryFunctionResult)):
+                percent = result.get_peak_percent(pos)
+            else:
+                percent = result.get_percent(pos)
+            if percent is not None:
+                color = QColor(func.color)
+                color.setAlphaF(percent)
+                return QBrush(color)
+        elif role == Qt.ForegroundRole:
+            if result.get_hits(pos) is None:
+                return CODE_NOT_RUN_COLOR
+            if (result.func_info, result.get_line_no(pos)) in self.violations:
+                return BUDGET_VIOLATION_COLOR
+        elif role == Qt.ToolTipRole:
+            messages = list(self.violations.get(
+                (result.func_info, result.get_line_no(pos)), []))
+            if column == COL_TIME and result.get_error(pos) is not None:
+                messages.append(self._repeat_tooltip(result, pos))
+            if (column in (COL_HITS, COL_TIME)
+                    and isinstance(result, ProcessFunctionResult)):
+                messages.extend(
+                    _('{process}: {time_ms:.3f} ms, {hits} hits').format(
+                        process=label, time_ms=time * 1e3, hits=hits)
+                    for label, time, hits in result.get_process_times(pos))
+            if (column == COL_TIME
+                    and isinstance(result, ContextFunctionResult)
+                    and result.get_suspended(pos) is not None):
+                messages.append(self._suspended_tooltip(result, pos))
+            if messages:
+                return '\n'.join(messages)
+        elif role == Qt.FontRole:
+            if column == COL_LINE:
+                return self.monospace_font
+        elif role == Qt.TextAlignmentRole:
+            if column in (COL_HITS, COL_TIME, COL_PERHIT, COL_PERCENT,
+                          COL_MEM, COL_PEAK):
+                return int(Qt.AlignCenter)
+        elif role == Qt.UserRole:
+            if column == COL_POS:
+                return (osp.normpath(result.filename),
+                        result.get_line_no(pos))
+        elif role == SORT_ROLE:
+            return func.get_sort_keys(column)[pos]
+        return None
+
+    def _function_sort_key(self, func, column):
+        """Key used to sort function `func` by `column`."""
+        if column == 0:
+            return natural_sort_key(func.label())
+        elif column in (COL_TIME, COL_PERCENT):
+            return func.result.total_time
+        elif (column == COL_MEM
+                and isinstance(func.result, MemoryFunctionResult)):
+            return func.result.total_memory
+        return 0
+
+    def _line_text(self, result, pos, column):
+        """Display text of line `pos` of function `result` in `column`."""
+        if column == COL_NO:
+            return str(result.get_line_no(pos))
+        elif column == COL_LINE:
+            return result.get_code(pos)
+        elif column == COL_HITS:
+            value = result.get_hits(pos)
+            return '' if value is None else '%d' % value
+        elif column == COL_TIME:
+            value = result.get_time(pos)
+            if value is None:
+                return ''
+            error = result.get_error(pos)
+            if error is not None:
+                return '%.3f ± %.3f' % (value * 1e3, error * 1e3)
+            if isinstance(result, ContextFunctionResult):
+                suspended = result.get_suspended(pos)
+                if suspended is not None:
+                    return _('{time:.3f} ({suspended:.3f} suspended)').format(
+                        time=value * 1e3, suspended=suspended * 1e3)
+            return '%.3f' % (value * 1e3)
+        elif column == COL_PERHIT:
+            value = result.get_perhit(pos)
+            return '' if value is None else '%.3f' % (value * 1e3)
+        elif column == COL_PERCENT:
+            value = result.get_percent(pos)
+            return '' if value is None else '%.1f' % (100 * value)
+        elif column == COL_MEM:
+            value = result.get_memory(pos)
+            return '' if value is None else '%+.1f' % (value / 1024)
+        elif column == COL_PEAK:
+            value = result.get_peak(pos)
+            return '' if value is None else '%.1f' % (value / 1024)
+        return ''
+
+    def _repeat_tooltip(self, result, pos):
+        """Describe the statistics of line `pos` over repeated runs."""
+        mean, error = result.get_time(pos), result.get_error(pos)
+        return _('Mean of {runs} runs: {mean:.3f} ms\n'
+                 'Standard deviation: {stddev:.3f} ms\n'
+                 'Minimum: {min:.3f} ms\n'
+                 '95% confidence interval: {low:.3f} to {high:.3f} ms'
+                 ).format(runs=result.runs, mean=mean * 1e3,
+                          stddev=result.get_stddev(pos) * 1e3,
+                          min=result.get_min(pos) * 1e3,
+                          low=(mean - error) * 1e3, high=(mean + error) * 1e3)
+
+    def _suspended_tooltip(self, result, pos):
+        """Describe how line `pos` spent its time in an await."""
+        return _('Executing: {time:.3f} ms\n'
+                 'Suspended: {suspended:.3f} ms').format(
+                     time=result.get_time(pos) * 1e3,
+                     suspended=result.get_suspended(pos) * 1e3)
+
+    def _context_label(self, thread, task):
+        """Label of the context running in `thread` and `task`."""
+        if task is None:
+            return thread
+        return _('{thread}, task {task}').format(thread=thread, task=task)
+
+
+class LineProfilerDiffModel(LineProfilerDataModel):
+    """
+    Item model comparing the results of two runs.
+
+    Its contents are set by `set_stats` with a dict of FunctionDiff, as
+    given by `compare_results`. Changes in time are shown in red when the
+    new run is slower and in green when it is faster, unless they are
+    within the noise measured by repeated runs.
     """
-    Convenience tree widget (with built-in model)
+    NODE_CLASS = DiffNode
+
+    def update_stats(self, stats, use_colors=True):
+        return False
+
+    def _function_sort_key(self, func, column):
+        diff = func.result
+        if column == 0:
+            return natural_sort_key(func.label())
+        elif column == DIFF_COL_TIME:
+            return diff.new_total_time
+        elif column in (DIFF_COL_DTIME, DIFF_COL_RATIO):
+            return diff.new_total_time - diff.old_total_time
+        return 0
+
+    def _line_data(self, func, index, role):
+        diff = func.result
+        pos = func.order[index.row()]
+        column = index.column()
+        if role == Qt.DisplayRole:
+            if column == DIFF_COL_NO:
+                return diff.get_line_no(pos)
+            return self._line_text(diff, pos, column)
+        elif role == Qt.ForegroundRole:
+            if column in (DIFF_COL_DTIME, DIFF_COL_RATIO):
+                delta = diff.get_time_delta(pos)
+            elif column == DIFF_COL_DHITS:
+                delta = diff.get_hits_delta(pos)
+            elif column == DIFF_COL_DMEM:
+                # More memory allocated is shown like a slowdown
+                delta = diff.get_memory_delta(pos)
+                if delta:
+                    return (DIFF_SLOWER_COLOR if delta > 0
+                            else DIFF_FASTER_COLOR)
+                return None
+            elif not diff.in_new(pos) or diff.get_new_hits(pos) is None:
+                return CODE_NOT_RUN_COLOR
+            else:
+                delta = None
+            if delta and column != DIFF_COL_DHITS and diff.is_noise(pos):
+                return CODE_NOT_RUN_COLOR
+            if delta:
+                return DIFF_SLOWER_COLOR if delta > 0 else DIFF_FASTER_COLOR
+        elif role == Qt.ToolTipRole:
+            error = diff.get_error(pos)
+            if column in (DIFF_COL_DTIME, DIFF_COL_RATIO) and error is not None:
+                if diff.is_noise(pos):
+                    text = _('Change within noise (± {error:.3f} ms)')
+                else:
+                    text = _('Change beyond noise (± {error:.3f} ms)')
+                return text.format(error=error * 1e3)
+        elif role == Qt.FontRole:
+            if column == DIFF_COL_LINE:
+                if diff.in_new(pos):
+                    return self.monospace_font
+                font = QFont(self.monospace_font)
+                font.setStrikeOut(True)  # Line removed in the new run
+                return font
+        elif role == Qt.TextAlignmentRole:
+            if column not in (DIFF_COL_NO, DIFF_COL_LINE):
+                return int(Qt.AlignCenter)
+        elif role == Qt.UserRole:
+            if column == COL_POS and diff.in_new(pos):
+                return (osp.normpath(diff.filename), diff.get_line_no(pos))
+        elif role == SORT_ROLE:
+            return func.get_sort_keys(column)[pos]
+        return None
+
+    def _line_text(self, diff, pos, column):
+        """Display text of line `pos` of function `diff` in `column`."""
+        if column == DIFF_COL_NO:
+            return str(diff.get_line_no(pos))
+        elif column == DIFF_COL_LINE:
+            return diff.get_code(pos)
+        elif column == DIFF_COL_HITS:
+            value = diff.get_new_hits(pos)
+            return '' if value is None else '%d' % value
+        elif column == DIFF_COL_DHITS:
+            value = diff.get_hits_delta(pos)
+            return '' if value is None else '%+d' % value
+        elif column == DIFF_COL_TIME:
+            value = diff.get_new_time(pos)
+            return '' if value is None else '%.3f' % (value * 1e3)
+        elif column == DIFF_COL_DTIME:
+            value = diff.get_time_delta(pos)
+            return '' if value is None else '%+.3f' % (value * 1e3)
+        elif column == DIFF_COL_RATIO:
+            value = diff.get_ratio(pos)
+            return '' if value is None else '%.2f×' % value
+        elif column == DIFF_COL_MEM:
+            value = diff.get_new_memory(pos)
+            return '' if value is None else '%+.1f' % (value / 1024)
+        elif column == DIFF_COL_DMEM:
+            value = diff.get_memory_delta(pos)
+            return '' if value is None else '%+.1f' % (value / 1024)
+        return ''
+
+
+class LineProfilerDataTree(QTreeView):
+    """
+    Convenience tree view (with a lazy item model)
     to store and view line profiler data.
     """
     sig_edit_goto_requested = Signal(str, int, str)
 
     def __init__(self, parent=None):
-        QTreeWidget.__init__(self, parent)
+        QTreeView.__init__(self, parent)
         self.header_list = [
             _('Line #'), _('Hits'), _('Time (ms)'), _('Per hit (ms)'),
-            _('% Time'), _('Line contents')]
+            _('% Time'), _('Mem Δ (KiB)'), _('Peak (KiB)'),
+            _('Line contents')]
+        self.diff_header_list = [
+            _('Line #'), _('Hits'), _('Δ Hits'), _('Time (ms)'),
+            _('Δ Time (ms)'), _('Ratio'), _('Mem Δ (KiB)'),
+            _('Δ Mem (KiB)'), _('Line contents')]
         self.stats = None      # To be filled by self.load_data()
         self.max_time = 0      # To be filled by self.load_data()
+        self.violations = []   # Budget violations of self.stats
+        self.pivot = 'total'   # How timings are broken down, see PIVOTS
+        self.block_cache = BlockCache(get_conf_path('lineprofiler.blocks'))
+        self.data_model = LineProfilerDataModel(self.header_list, self)
+        self.diff_model = LineProfilerDiffModel(self.diff_header_list, self)
+        self.setModel(self.data_model)
         self.header().setDefaultAlignment(Qt.AlignCenter)
-        self.setColumnCount(len(self.header_list))
-        self.setHeaderLabels(self.header_list)
         self.clear()
-        self.itemClicked.connect(self.on_item_clicked)
+        self.clicked.connect(self.on_item_clicked)
+
+    def clear(self):
+        """Remove all rows from the tree."""
+        self.data_model.clear()
+        self.diff_model.clear()
+        self.setModel(self.data_model)
+
+    def topLevelItemCount(self):
+        """Return the number of top-level rows."""
+        return self.model().rowCount()
 
     def show_tree(self):
         """Populate the tree with line profiler data and display it."""
@@ -577,188 +2502,140 @@ class LineProfilerDataTree(QTreeWidget):
         self.setItemsExpandable(True)
         self.setSortingEnabled(False)
         self.populate_tree()
-        self.expandAll()
-        for col in range(self.columnCount()-1):
-            self.resizeColumnToContents(col)
-        if self.topLevelItemCount() > 1:
-            self.collapseAll()
+        self._show_memory_columns([COL_MEM, COL_PEAK], self.has_memory())
+        self._resize_columns()
         self.setSortingEnabled(True)
-        self.sortItems(COL_POS, Qt.AscendingOrder)
-
-    def load_data(self, profdatafile):
-        """Load line profiler data saved by kernprof module"""
-        # lstats has the following layout :
-        # lstats.timings =
-        #     {(filename1, line_no1, function_name1):
-        #         [(line_no1, hits1, total_time1),
-        #          (line_no2, hits2, total_time2)],
-        #      (filename2, line_no2, function_name2):
-        #         [(line_no1, hits1, total_time1),
-        #          (line_no2, hits2, total_time2),
-        #          (line_no3, hits3, total_time3)]}
-        # lstats.unit = time_factor
-        with open(profdatafile, 'rb') as fid:
-            lstats = pickle.load(fid)
-
-        # First pass to group by filename
-        self.stats = dict()
-        linecache.checkcache()
-        for func_info, stats in lstats.timings.items():
-            # func_info is a tuple containing (filename, line, function anme)
-            filename, start_line_no = func_info[:2]
-
-            # Read code
-            start_line_no -= 1  # include the @profile decorator
-            all_lines = linecache.getlines(filename)
-            block_lines = inspect.getblock(all_lines[start_line_no:])
-
-            # Loop on each line of code
-            func_stats = []
-            func_total_time = 0.0
-            next_stat_line = 0
-            for line_no, code_line in enumerate(block_lines):
-                line_no += start_line_no + 1  # Lines start at 1
-                code_line = code_line.rstrip('\n')
-                if (next_stat_line >= len(stats)
-                        or line_no != stats[next_stat_line][0]):
-                    # Line didn't run
-                    hits, line_total_time, time_per_hit = None, None, None
-                else:
-                    # Compute line times
-                    hits, line_total_time = stats[next_stat_line][1:]
-                    line_total_time *= lstats.unit
-                    time_per_hit = line_total_time / hits
-                    func_total_time += line_total_time
-                    next_stat_line += 1
-                func_stats.append(
-                    [line_no, code_line, line_total_time, time_per_hit,
-                     hits])
-
-            # Compute percent time
-            for line in func_stats:
-                line_total_time = line[2]
-                if line_total_time is None:
-                    line.append(None)
-                else:
-                    line.append(line_total_time / func_total_time)
-
-            # Fill dict
-            self.stats[func_info] = [func_stats, func_total_time]
-
-    def fill_item(self, item, filename, line_no, code, time, percent, perhit,
-                  hits):
-        item.setData(COL_POS, Qt.UserRole, (osp.normpath(filename), line_no))
+        self.sortByColumn(COL_POS, Qt.AscendingOrder)
 
-        item.setData(COL_NO, Qt.DisplayRole, line_no)
-
-        item.setData(COL_LINE, Qt.DisplayRole, code)
+    def show_diff(self, diffs):
+        """
+        Display the comparison of two runs, as given by `compare_results`.
 
-        if percent is None:
-            percent = ''
+        Functions are sorted with the biggest slowdowns first.
+        """
+        self.clear()
+        self.setModel(self.diff_model)
+        self.setItemsExpandable(True)
+        self.setSortingEnabled(False)
+        if not diffs:
+            self.diff_model.set_message(_('No timings to compare'))
+            self.setFirstColumnSpanned(0, QModelIndex(), True)
         else:
-            percent = '%.1f' % (100 * percent)
-        item.setData(COL_PERCENT, Qt.DisplayRole, percent)
-        item.setTextAlignment(COL_PERCENT, Qt.AlignCenter)
+            self.diff_model.set_stats(
+                diffs, use_colors=self.parent().use_colors,
+                monospace_font=self._get_monospace_font())
+            for row in range(self.topLevelItemCount()):
+                self.setFirstColumnSpanned(row, QModelIndex(), True)
+        self._show_memory_columns(
+            [DIFF_COL_MEM, DIFF_COL_DMEM],
+            any(isinstance(result, MemoryFunctionResult)
+                for diff in diffs.values()
+                for result in (diff.old, diff.new)))
+        self._resize_columns()
+        self.setSortingEnabled(True)
+        self.sortByColumn(DIFF_COL_DTIME, Qt.DescendingOrder)
+
+    def _show_memory_columns(self, columns, visible):
+        # Memory is only known when it was profiled, see the
+        # memory_profiling option
+        for col in range(self.model().columnCount()):
+            self.setColumnHidden(col, col in columns and not visible)
+
+    def _resize_columns(self):
+        # Columns are sized from the rows of the first function only, as
+        # expanding everything is costly for big profiles
+        model = self.model()
+        count = self.topLevelItemCount()
+        if count > 0:
+            self.expand(model.index(0, 0))
+        for col in range(model.columnCount() - 1):
+            self.resizeColumnToContents(col)
+        if count > 1:
+            self.collapseAll()
 
-        if time is None:
-            time = ''
-        else:
-            time = '%.3f' % (time * 1e3)
-        item.setData(COL_TIME, Qt.DisplayRole, time)
-        item.setTextAlignment(COL_TIME, Qt.AlignCenter)
+    def update_tree(self):
+        """
+        Update the tree with newer line profiler data.
 
-        if perhit is None:
-            perhit = ''
-        else:
-            perhit = '%.3f' % (perhit * 1e3)
-        item.setData(COL_PERHIT, Qt.DisplayRole, perhit)
-        item.setTextAlignment(COL_PERHIT, Qt.AlignCenter)
+        Rows are patched in place when possible, so that expanded
+        functions, selection and scroll position are kept.
+        """
+        first_new = self.topLevelItemCount()
+        if (not first_new or self.model() is not self.data_model
+                or self.pivot != 'total'
+                or not self.data_model.update_stats(
+                    self.stats, use_colors=self.parent().use_colors)):
+            self.show_tree()
+            return
+        for row in range(first_new, self.topLevelItemCount()):
+            self.setFirstColumnSpanned(row, QModelIndex(), True)
 
-        if hits is None:
-            hits = ''
+    def load_data(self, profdatafile):
+        """Load line profiler data saved by kernprof module"""
+        self.set_data(load_profile_data(profdatafile, self.block_cache))
+
+    def set_data(self, data):
+        """Set the ProfileResult to display."""
+        self.stats = data
+        # Sampled runs count samples instead of hits
+        if data is not None and data.sampled:
+            self.header_list[COL_HITS] = _('Samples')
+            self.header_list[COL_PERHIT] = _('Per sample (ms)')
         else:
-            hits = '%d' % hits
-        item.setData(COL_HITS, Qt.DisplayRole, hits)
-        item.setTextAlignment(COL_HITS, Qt.AlignCenter)
+            self.header_list[COL_HITS] = _('Hits')
+            self.header_list[COL_PERHIT] = _('Per hit (ms)')
+
+    def has_memory(self):
+        """Whether the results shown have the memory allocated by lines."""
+        return bool(self.stats) and any(
+            isinstance(result, MemoryFunctionResult)
+            for result in self.stats.values())
+
+    def has_breakdown(self):
+        """Whether the timings shown are broken down by thread and task."""
+        return bool(self.stats) and any(
+            isinstance(result, ContextFunctionResult) and result.contexts
+            for result in self.stats.values())
+
+    def set_pivot(self, pivot):
+        """
+        Show timings in total, per thread or per asyncio task.
+
+        `pivot` is one of PIVOTS. The tree is shown again if it displays
+        results.
+        """
+        self.pivot = pivot
+        if self.stats and self.model() is self.data_model:
+            self.show_tree()
 
     def populate_tree(self):
-        """Create each item (and associated data) in the tree"""
+        """Fill the model with the profiling data"""
         if not self.stats:
-            warn_item = TreeWidgetItem(self)
-            warn_item.setData(
-                0, Qt.DisplayRole,
-                _('No timings to display. '
-                  'Did you forget to add @profile decorators ?')
+            self.data_model.set_message(
+                _('No timings to display. Did you forget to add @profile '
+                  'decorators or to name the functions to profile ?')
                 .format(url=WEBSITE_URL))
-            warn_item.setFirstColumnSpanned(True)
-            warn_item.setTextAlignment(0, Qt.AlignCenter)
-            font = warn_item.font(0)
-            font.setStyle(QFont.StyleItalic)
-            warn_item.setFont(0, font)
+            self.setFirstColumnSpanned(0, QModelIndex(), True)
             return
 
+        self.data_model.set_violations(self.violations)
+        self.data_model.set_stats(
+            pivot_results(self.stats, self.pivot),
+            use_colors=self.parent().use_colors,
+            monospace_font=self._get_monospace_font())
+        for row in range(self.topLevelItemCount()):
+            self.setFirstColumnSpanned(row, QModelIndex(), True)
+
+    def _get_monospace_font(self):
         try:
-            monospace_font = self.window().editor.get_plugin_font()
+            return self.window().editor.get_plugin_font()
         except AttributeError:  # If run standalone for testing
             monospace_font = QFont("Courier New")
             monospace_font.setPointSize(10)
+            return monospace_font
 
-        for func_index, stat_item in enumerate(self.stats.items()):
-            # Function name and position
-            func_info, func_data = stat_item
-            filename, start_line_no, func_name = func_info
-            func_stats, func_total_time = func_data
-            func_item = TreeWidgetItem(self)
-            func_item.setData(
-                0, Qt.DisplayRole,
-                _('{func_name} ({time_ms:.3f}ms) in file "{filename}", '
-                  'line {line_no}').format(
-                    filename=filename,
-                    line_no=start_line_no,
-                    func_name=func_name,
-                    time_ms=func_total_time * 1e3))
-            func_item.setFirstColumnSpanned(True)
-            func_item.setData(COL_POS, Qt.UserRole,
-                              (osp.normpath(filename), start_line_no))
-
-            # For sorting by time
-            func_item.setData(COL_TIME, Qt.DisplayRole, func_total_time * 1e3)
-            func_item.setData(COL_PERCENT, Qt.DisplayRole,
-                              func_total_time * 1e3)
-
-            if self.parent().use_colors:
-                color_index = func_index % len(COLOR_CYCLE)
-            else:
-                color_index = 0
-            func_color = COLOR_CYCLE[color_index]
-
-            # Lines of code
-            for line_info in func_stats:
-                line_item = TreeWidgetItem(func_item)
-                (line_no, code_line, line_total_time, time_per_hit,
-                 hits, percent) = line_info
-                self.fill_item(
-                    line_item, filename, line_no, code_line,
-                    line_total_time, percent, time_per_hit, hits)
-
-                # Color background
-                if line_total_time is not None:
-                    alpha = percent
-                    color = QColor(func_color)
-                    color.setAlphaF(alpha)  # Returns None
-                    color = QBrush(color)
-                    for col in range(self.columnCount()):
-                        line_item.setBackground(col, color)
-                else:
-
-                    for col in range(self.columnCount()):
-                        line_item.setForeground(col, CODE_NOT_RUN_COLOR)
-
-                # Monospace font for code
-                line_item.setFont(COL_LINE, monospace_font)
-
-    def on_item_clicked(self, item):
-        data = item.data(COL_POS, Qt.UserRole)
+    def on_item_clicked(self, index):
+        data = index.siblingAtColumn(COL_POS).data(Qt.UserRole)
         if data is None or len(data) < 2:
             return
         filename, line_no = data
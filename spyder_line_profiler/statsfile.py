@@ -0,0 +1,395 @@
+# -*- coding: utf-8 -*-
+#
+# -----------------------------------------------------------------------------
+# Copyright (c) 2013- Spyder Project Contributors
+#
+# Released under the terms of the MIT License
+# (see LICENSE.txt in the project root directory for details)
+# -----------------------------------------------------------------------------
+
+"""
+Compact binary files of line profiler statistics.
+
+Unlike the pickles written by kernprof, these files can be opened
+without running any code, and the lines of each function can be read
+without parsing the whole file. They are laid out as follows, with
+little-endian numbers:
+
+* a header (see HEADER), starting with MAGIC;
+* a table of UTF-8 strings, padded to a multiple of 8 bytes;
+* a table of functions, with a fixed-width record (see FUNCTION) giving
+  the position of its filename and name in the table of strings, its
+  first line, its number of lines, the position of its columns and its
+  total time in seconds;
+* a table of the parts the statistics are broken down into, if they
+  were merged from repeated runs, processes or contexts (see the flags
+  of the header), with a record (see PART) giving the position of their
+  labels in the table of strings;
+* the columns of each function, with one item per line starting at its
+  first line: hits (int64) and times in seconds (float64, NaN for lines
+  that didn't run), followed by the net memory and peak memory in bytes
+  (float64) if the statistics have memory. With a breakdown, they are
+  followed by the number of parts in which the function ran and their
+  indices (int64), then by the hits and times of the function in each
+  of these parts, and the time suspended of its lines in seconds
+  (float64) for contexts.
+
+Columns are aligned on 8 bytes, so that they can be read as arrays from
+a memory-mapped file.
+"""
+
+# Standard library imports
+from array import array
+import itertools
+import math
+import os
+import struct
+import sys
+
+MAGIC = b'SLPSTATS'
+VERSION = 1
+
+# Flags of the header
+SAMPLED = 1  # Hits are numbers of samples, see bootstrap/sampler.py
+MEMORY = 2   # Columns include memory, see bootstrap/memory.py
+REPEATS = 4     # Broken down by run, see results.RepeatedStats
+PROCESSES = 8   # Broken down by process, see results.ProcessStats
+CONTEXTS = 16   # Broken down by context, see results.ContextStats
+
+# Breakdowns by attribute of the statistics, in the order they are looked
+# up
+BREAKDOWNS = {'repeats': REPEATS, 'processes': PROCESSES,
+              'contexts': CONTEXTS}
+
+# Magic, version, flags, number of functions, offset and size of the
+# table of strings, offset of the table of functions, number of parts
+HEADER = struct.Struct('<8sIIqQQQq')
+
+# Offsets of the filename and name, sizes of the filename and name, first
+# line, number of lines, offset of the columns and total time
+FUNCTION = struct.Struct('<QQIIqqQd')
+
+# Offsets and sizes of the two labels of a part, such as the thread and
+# task of a context, with a size of -1 for missing labels
+PART = struct.Struct('<QQqq')
+
+NOT_RUN = float('nan')
+
+
+def can_store(lstats):
+    """
+    Whether the statistics `lstats` can be stored in a stats file, which
+    is the case unless they have several breakdowns.
+    """
+    return sum(bool(getattr(lstats, name, None)) for name in BREAKDOWNS) < 2
+
+
+def is_stats_file(path):
+    """Whether `path` is a stats file."""
+    try:
+        with open(path, 'rb') as f:
+            return f.read(len(MAGIC)) == MAGIC
+    except OSError:
+        return False
+
+
+def _to_bytes(column):
+    if sys.byteorder != 'little':
+        column = array(column.typecode, column)
+        column.byteswap()
+    return column.tobytes()
+
+
+def _read_array(f, typecode, count):
+    """Read an array of `count` items from the stats file `f`."""
+    column = array(typecode)
+    data = f.read(8 * count)
+    if len(data) < 8 * count:
+        raise ValueError('Truncated stats file')
+    column.frombytes(data)
+    if sys.byteorder != 'little':
+        column.byteswap()
+    return column
+
+
+def _get_parts(lstats):
+    """
+    Return the flag of the breakdown of `lstats`, or 0, and its parts as
+    (labels, timings, suspended).
+    """
+    if getattr(lstats, 'repeats', None):
+        return REPEATS, [((None, None), timings, {})
+                         for timings in lstats.repeats]
+    if getattr(lstats, 'processes', None):
+        return PROCESSES, [((label, None), timings, {})
+                           for label, timings in lstats.processes]
+    if getattr(lstats, 'contexts', None):
+        return CONTEXTS, [((thread, task), timings, suspended)
+                          for thread, task, timings, suspended
+                          in lstats.contexts]
+    return 0, []
+
+
+def _timing_columns(stats, start_line_no, nlines, unit):
+    """Return the hits and times in seconds of the lines of `stats`."""
+    hits = array('q', itertools.repeat(0, nlines))
+    times = array('d', itertools.repeat(NOT_RUN, nlines))
+    for line_no, line_hits, line_time in stats:
+        pos = line_no - start_line_no
+        if 0 <= pos < nlines:
+            hits[pos] = line_hits
+            times[pos] = line_time * unit
+    return hits, times
+
+
+def write_stats_file(lstats, path):
+    """
+    Write the line profiler statistics `lstats` to `path`.
+
+    `lstats` are laid out like those of line_profiler, optionally with
+    the ``sampled`` and ``memory`` attributes of bootstrap/sampler.py
+    and bootstrap/memory.py, or the breakdown of a RepeatedStats,
+    ProcessStats or ContextStats. The file is first written to a
+    temporary file which then replaces `path`. Raises ValueError if
+    `lstats` can't be stored (see `can_store`).
+    """
+    if not can_store(lstats):
+        raise ValueError('Statistics with several breakdowns cannot be '
+                         'stored')
+    memory = getattr(lstats, 'memory', None) or {}
+    breakdown, parts = _get_parts(lstats)
+    flags = breakdown
+    if getattr(lstats, 'sampled', False):
+        flags |= SAMPLED
+    if memory:
+        flags |= MEMORY
+
+    strings = bytearray()
+    string_offsets = {}
+
+    def add_string(text):
+        if text is None:
+            return 0, -1
+        encoded = text.encode('utf-8', 'surrogatepass')
+        if text not in string_offsets:
+            string_offsets[text] = len(strings)
+            strings.extend(encoded)
+        return string_offsets[text], len(encoded)
+
+    records = []
+    columns = bytearray()
+    for func_info, stats in lstats.timings.items():
+        filename, start_line_no, func_name = func_info
+        func_parts = [index for index, (_labels, timings, _suspended)
+                      in enumerate(parts) if timings.get(func_info)]
+        last_line_no = max(
+            (stat[0] for part_stats in itertools.chain(
+                [stats], (parts[index][1][func_info] for index in func_parts))
+             for stat in part_stats),
+            default=start_line_no - 1)
+        nlines = max(last_line_no - start_line_no + 1, 0)
+        hits, times = _timing_columns(stats, start_line_no, nlines,
+                                      lstats.unit)
+        total_time = math.fsum(time for time in times if time == time)
+        filename_offset, filename_size = add_string(filename)
+        name_offset, name_size = add_string(func_name)
+        records.append([filename_offset, name_offset, filename_size,
+                        name_size, start_line_no, nlines, len(columns),
+                        total_time])
+        columns += _to_bytes(hits) + _to_bytes(times)
+        if flags & MEMORY:
+            net = array('d', itertools.repeat(0.0, nlines))
+            peaks = array('d', itertools.repeat(0.0, nlines))
+            for line_no, line_net, line_peak in memory.get(func_info, []):
+                pos = line_no - start_line_no
+                if 0 <= pos < nlines:
+                    net[pos] += line_net
+                    peaks[pos] = max(peaks[pos], line_peak)
+            columns += _to_bytes(net) + _to_bytes(peaks)
+        if breakdown:
+            columns += _to_bytes(array('q', [len(func_parts)] + func_parts))
+            for index in func_parts:
+                _labels, timings, suspended = parts[index]
+                part_hits, part_times = _timing_columns(
+                    timings[func_info], start_line_no, nlines, lstats.unit)
+                columns += _to_bytes(part_hits) + _to_bytes(part_times)
+                if breakdown == CONTEXTS:
+                    columns += _to_bytes(array('d', (
+                        suspended.get((filename, start_line_no, line_no), 0.0)
+                        for line_no in range(start_line_no,
+                                             start_line_no + nlines))))
+
+    part_records = []
+    for labels, _timings, _suspended in parts:
+        (label_offset, label_size), (task_offset, task_size) = map(
+            add_string, labels)
+        part_records.append((label_offset, task_offset, label_size,
+                             task_size))
+
+    strings.extend(bytes(-len(strings) % 8))
+    strings_offset = HEADER.size
+    functions_offset = strings_offset + len(strings)
+    columns_offset = (functions_offset + FUNCTION.size * len(records)
+                      + PART.size * len(part_records))
+
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, VERSION, flags, len(records),
+                            strings_offset, len(strings), functions_offset,
+                            len(part_records)))
+        f.write(strings)
+        for record in records:
+            record[6] += columns_offset
+            f.write(FUNCTION.pack(*record))
+        for part_record in part_records:
+            f.write(PART.pack(*part_record))
+        f.write(columns)
+    os.replace(tmp_path, path)
+
+
+class StatsFile:
+    """
+    Line profiler statistics read from the stats file `path`.
+
+    `functions` are the (filename, first line, function name) of the
+    functions, and `total_times` their total time in seconds. If the
+    statistics are broken down, `breakdown` is the attribute of the
+    statistics giving the breakdown (see BREAKDOWNS), and `parts` are
+    the labels of its parts: (label, None) for processes, (thread, task)
+    for contexts and (None, None) for runs. The columns of a function are
+    only read from the file by `read_columns` and `read_breakdown`, so
+    `path` must be updated if the file is moved. Raises ValueError if
+    `path` is not a valid stats file.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            stat = os.fstat(f.fileno())
+            header = f.read(HEADER.size)
+            if len(header) < HEADER.size:
+                raise ValueError('Truncated stats file')
+            (magic, version, flags, nfuncs, strings_offset, strings_size,
+             functions_offset, nparts) = HEADER.unpack(header)
+            if magic != MAGIC:
+                raise ValueError('Not a stats file')
+            if version > VERSION:
+                raise ValueError(
+                    'Unsupported stats file version: {}'.format(version))
+            columns_offset = (functions_offset + FUNCTION.size * nfuncs
+                              + PART.size * nparts)
+            if stat.st_size < columns_offset:
+                raise ValueError('Truncated stats file')
+            f.seek(strings_offset)
+            strings = f.read(strings_size)
+            f.seek(functions_offset)
+            records = f.read(FUNCTION.size * nfuncs)
+            part_records = f.read(PART.size * nparts)
+        # Identifies the file, to check that it wasn't replaced when
+        # reading columns
+        self._stat = (stat.st_size, stat.st_mtime_ns)
+        self.sampled = bool(flags & SAMPLED)
+        self.has_memory = bool(flags & MEMORY)
+        self.breakdown = next((name for name, flag in BREAKDOWNS.items()
+                               if flags & flag), None)
+        self.parts = [
+            tuple(None if size < 0 else
+                  strings[offset:offset + size].decode(
+                      'utf-8', 'surrogatepass')
+                  for offset, size in ((label_offset, label_size),
+                                       (task_offset, task_size)))
+            for label_offset, task_offset, label_size, task_size
+            in PART.iter_unpack(part_records)]
+        self.functions = []
+        self.total_times = []
+        self._columns = []  # Offset and number of lines
+        ncolumns = 4 if self.has_memory else 2
+        for (filename_offset, name_offset, filename_size, name_size,
+             start_line_no, nlines, offset,
+             total_time) in FUNCTION.iter_unpack(records):
+            if offset + 8 * ncolumns * nlines > stat.st_size:
+                raise ValueError('Truncated stats file')
+            filename = strings[filename_offset:filename_offset + filename_size]
+            func_name = strings[name_offset:name_offset + name_size]
+            self.functions.append(
+                (filename.decode('utf-8', 'surrogatepass'), start_line_no,
+                 func_name.decode('utf-8', 'surrogatepass')))
+            self.total_times.append(total_time)
+            self._columns.append((offset, nlines))
+
+    def get_nlines(self, index):
+        """Number of lines with statistics of function `index`."""
+        return self._columns[index][1]
+
+    def read_columns(self, index, nlines):
+        """
+        Return the columns of function `index` for `nlines` lines.
+
+        These map ``hits`` and ``times`` to arrays, as well as ``memory``
+        and ``peaks`` if the statistics have memory. Lines beyond those
+        in the file didn't run. Raises ValueError if the file was replaced
+        since it was opened.
+        """
+        offset, stored = self._columns[index]
+        count = min(stored, nlines)
+        missing = nlines - count
+        names = ['hits', 'times']
+        if self.has_memory:
+            names += ['memory', 'peaks']
+        # The file is only kept open while reading, so that it can be
+        # moved or replaced
+        data = bytearray(8 * stored * len(names))
+        if data:
+            with self._open() as f:
+                f.seek(offset)
+                f.readinto(data)
+        view = memoryview(data)
+        columns = {}
+        for column_index, name in enumerate(names):
+            start = 8 * stored * column_index
+            column = array('q' if name == 'hits' else 'd')
+            column.frombytes(view[start:start + 8 * count])
+            if sys.byteorder != 'little':
+                column.byteswap()
+            fill = NOT_RUN if name == 'times' else 0
+            column.extend(itertools.repeat(fill, missing))
+            columns[name] = column
+        return columns
+
+    def read_breakdown(self, index):
+        """
+        Return the columns of function `index` in the parts where it ran,
+        as a list of (part index, columns).
+
+        Columns map ``hits`` and ``times`` to arrays with an item for each
+        line stored (see `get_nlines`), as well as ``suspended`` for
+        contexts. Raises ValueError if the file was replaced since it was
+        opened.
+        """
+        if self.breakdown is None:
+            return []
+        offset, stored = self._columns[index]
+        ncolumns = 4 if self.has_memory else 2
+        with self._open() as f:
+            f.seek(offset + 8 * ncolumns * stored)
+            count = _read_array(f, 'q', 1)[0]
+            part_indices = _read_array(f, 'q', count)
+            parts = []
+            for part_index in part_indices:
+                if not 0 <= part_index < len(self.parts):
+                    raise ValueError('Invalid part in stats file')
+                columns = {'hits': _read_array(f, 'q', stored),
+                           'times': _read_array(f, 'd', stored)}
+                if self.breakdown == 'contexts':
+                    columns['suspended'] = _read_array(f, 'd', stored)
+                parts.append((part_index, columns))
+        return parts
+
+    def _open(self):
+        """Open the file, checking that it wasn't replaced."""
+        f = open(self.path, 'rb')
+        stat = os.fstat(f.fileno())
+        if (stat.st_size, stat.st_mtime_ns) != self._stat:
+            f.close()
+            raise ValueError('Stats file changed since it was read')
+        return f
@@ -0,0 +1,133 @@
+# -*- coding: utf-8 -*-
+#
+# -----------------------------------------------------------------------------
+# Copyright (c) 2013- Spyder Project Contributors
+#
+# Released under the terms of the MIT License
+# (see LICENSE.txt in the project root directory for details)
+# -----------------------------------------------------------------------------
+
+"""
+Targets naming the functions to profile without @profile decorators.
+
+Targets are ``MODULE_OR_FILE[:PATTERN]`` strings, which are passed to the
+runner of the profiled script (see bootstrap/targets.py). They can be
+selected automatically from the statistics of a quick run with cProfile.
+"""
+
+# Standard library imports
+import ast
+import os.path as osp
+import pstats
+import tokenize
+
+# Times by which functions can be selected, as given by cProfile
+SELECT_BY = ('cumulative', 'self')
+
+
+def split_targets(text):
+    """Split the comma separated targets of `text`."""
+    return [target.strip() for target in text.split(',') if target.strip()]
+
+
+def get_function_at_line(source, line_no):
+    """
+    Return the qualified name of the function defined at `line_no`.
+
+    This is the innermost function or method of `source` whose definition,
+    decorators included, spans line `line_no`. Returns None if the line is
+    not part of a function or if `source` can't be parsed.
+    """
+    try:
+        tree = ast.parse(source)
+    except (SyntaxError, ValueError):
+        return None
+
+    def search(node, qualname, in_function):
+        for child in ast.iter_child_nodes(node):
+            if not isinstance(child, (ast.FunctionDef, ast.AsyncFunctionDef,
+                                      ast.ClassDef)):
+                # Definitions can be nested in other statements
+                found = search(child, qualname, in_function)
+                if found is not None:
+                    return found
+                continue
+            first = min([child.lineno] + [decorator.lineno for decorator
+                                          in child.decorator_list])
+            if not first <= line_no <= child.end_lineno:
+                continue
+            if not qualname:
+                child_qualname = child.name
+            elif in_function:
+                child_qualname = qualname + '.<locals>.' + child.name
+            else:
+                child_qualname = qualname + '.' + child.name
+            is_function = not isinstance(child, ast.ClassDef)
+            found = search(child, child_qualname, is_function)
+            if found is not None:
+                return found
+            return child_qualname if is_function else None
+        return None
+
+    return search(tree, '', False)
+
+
+def load_call_stats(path):
+    """
+    Load the statistics saved by cProfile in `path`.
+
+    Returns a dict mapping the (filename, first line, function name) of
+    each function to its (primitive calls, calls, self time, cumulative
+    time, callers).
+    """
+    return pstats.Stats(path).stats
+
+
+def _is_under(filename, roots):
+    filename = osp.normcase(osp.abspath(filename))
+    for root in roots:
+        root = osp.normcase(osp.abspath(root))
+        if filename == root or filename.startswith(osp.join(root, '')):
+            return True
+    return False
+
+
+def select_hot_functions(stats, count, by='cumulative', roots=()):
+    """
+    Return targets naming the `count` functions taking the most time.
+
+    `stats` are the statistics of cProfile, as given by `load_call_stats`,
+    and `by` is one of SELECT_BY. Only the functions of the files under
+    one of the directories `roots` are selected, which leaves out the
+    standard library and installed packages. Module code, lambdas and
+    comprehensions are never selected.
+    """
+    if by not in SELECT_BY:
+        raise ValueError('Unknown time: {}'.format(by))
+    candidates = []
+    for (filename, line_no, func_name), func_stats in stats.items():
+        if (func_name.startswith('<') or not osp.isfile(filename)
+                or not _is_under(filename, roots)):
+            continue
+        time = func_stats[3] if by == 'cumulative' else func_stats[2]
+        candidates.append((time, filename, line_no))
+    candidates.sort(key=lambda candidate: candidate[0], reverse=True)
+
+    targets = []
+    sources = {}
+    for _time, filename, line_no in candidates:
+        if len(targets) >= count:
+            break
+        if filename not in sources:
+            try:
+                with tokenize.open(filename) as f:
+                    sources[filename] = f.read()
+            except (OSError, SyntaxError, UnicodeDecodeError):
+                sources[filename] = ''
+        qualname = get_function_at_line(sources[filename], line_no)
+        if qualname is None:
+            continue
+        target = '{}:{}'.format(filename, qualname)
+        if target not in targets:
+            targets.append(target)
+    return targets
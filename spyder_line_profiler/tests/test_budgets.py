@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+#
+# -----------------------------------------------------------------------------
+# Copyright (c) 2017- Spyder Project Contributors
+#
+# Released under the terms of the MIT License
+# (see LICENSE.txt in the project root directory for details)
+# -----------------------------------------------------------------------------
+
+"""Tests for budgets.py."""
+
+# Standard library imports
+import io
+import json
+import os
+import os.path as osp
+
+# Third party imports
+import pytest
+
+# Local imports
+from spyder_line_profiler.budgets import (
+    BUDGET_FILENAME, BudgetError, check_budgets, find_budget_file,
+    get_budgets_for, load_budgets, write_report)
+from spyder_line_profiler.results import ProfileResult, compute_function_result
+
+
+def write_budgets(directory, budgets):
+    path = osp.join(directory, BUDGET_FILENAME)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({'budgets': budgets}, f)
+    return path
+
+
+def make_result(filename):
+    """Result of a function called twice, with a slow second line."""
+    func_info = (filename, 1, 'foo')
+    return ProfileResult(None, {func_info: compute_function_result(
+        func_info, [(2, 2, 1), (3, 2, 9)], 1e-3,
+        ['def foo():\n', '    a = 1\n', '    b = 2\n'])})
+
+
+def test_load_budgets(tmpdir):
+    """Check that budgets are validated and files made absolute."""
+    path = write_budgets(tmpdir.strpath, [
+        {'function': 'foo', 'max_time': 5},
+        {'file': 'pkg/foo.py', 'line': 3, 'max_percent': 50}])
+    budgets = load_budgets(path)
+    assert budgets[0].file is None
+    assert budgets[0].max_time == 5
+    assert budgets[1].file == tmpdir.join('pkg', 'foo.py').strpath
+    assert budgets[1].line == 3
+
+    for entry in [{'function': 'foo'},
+                  {'line': 3, 'max_time': 1},
+                  {'function': 'foo', 'max_percent': 1},
+                  {'function': 'foo', 'max_time': -1},
+                  {'function': 'foo', 'max_tme': 1}]:
+        write_budgets(tmpdir.strpath, [entry])
+        with pytest.raises(BudgetError):
+            load_budgets(path)
+
+
+def test_check_budgets(tmpdir):
+    """Check that limits of functions and lines are checked."""
+    filename = tmpdir.join('foo.py').strpath
+    result = make_result(filename)
+    path = write_budgets(tmpdir.strpath, [
+        {'function': 'foo', 'max_time': 20, 'max_hits': 1},
+        {'file': 'foo.py', 'line': 3, 'max_time': 5, 'max_percent': 80},
+        {'file': 'foo.py', 'line': 2, 'max_time': 5},
+        {'file': 'bar.py', 'function': 'foo', 'max_time': 0}])
+    violations = check_budgets(load_budgets(path), result)
+    assert [(violation.line_no, violation.measure, violation.value)
+            for violation in violations] == [
+        (None, 'max_hits', 2),
+        (3, 'max_time', pytest.approx(9)),
+        (3, 'max_percent', pytest.approx(90))]
+    assert violations[0].message() == 'foo in {}: 2 hits > 1'.format(
+        filename)
+
+    f = io.StringIO()
+    write_report(violations, f, path)
+    report = json.loads(f.getvalue())
+    assert report['budget_file'] == path
+    assert not report['passed']
+    assert report['violations'][1]['line'] == 3
+
+    f = io.StringIO()
+    write_report([], f)
+    assert json.loads(f.getvalue())['passed']
+
+
+def test_find_budget_file(tmpdir):
+    """Check that budget files are looked for in parent directories."""
+    subdir = tmpdir.join('pkg', 'sub')
+    os.makedirs(subdir.strpath)
+    assert get_budgets_for(subdir.join('foo.py').strpath) == ([], None)
+    path = write_budgets(tmpdir.strpath, [{'function': 'foo', 'max_time': 1}])
+    assert find_budget_file(subdir.strpath) == path
+    budgets, budget_file = get_budgets_for(subdir.join('foo.py').strpath)
+    assert budget_file == path
+    assert len(budgets) == 1
@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+#
+# -----------------------------------------------------------------------------
+# Copyright (c) 2017- Spyder Project Contributors
+#
+# Released under the terms of the MIT License
+# (see LICENSE.txt in the project root directory for details)
+# -----------------------------------------------------------------------------
+
+"""Tests for compare.py."""
+
+# Standard library imports
+from array import array
+
+# Third party imports
+import pytest
+
+# Local imports
+from spyder_line_profiler.compare import (
+    FunctionDiff, align_lines, compare_results)
+from spyder_line_profiler.results import (
+    MemoryFunctionResult, ProfileResult, RepeatedFunctionResult,
+    compute_function_result)
+
+
+def test_align_lines():
+    """Check that lines are aligned by content."""
+    old = ['def foo():', '    a = 1', '    b = 2', '    return a', '']
+    new = ['def foo():', '    # New comment', '    a = 1', '    return a',
+           '']
+    assert align_lines(old, new) == [
+        (0, 0), (None, 1), (1, 2), (2, None), (3, 3), (4, 4)]
+
+    # Moved lines are shown as removed and added again
+    assert align_lines(['a', 'b', 'c'], ['c', 'a', 'b']) == [
+        (None, 0), (0, 1), (1, 2), (2, None)]
+
+    # Changes in indentation don't break the match
+    assert align_lines(['if x:', '  pass'], ['if x:', '    pass']) == [
+        (0, 0), (1, 1)]
+    assert align_lines([], ['a']) == [(None, 0)]
+    assert align_lines(['x', 'x'], ['x', 'y', 'x']) == [
+        (0, 0), (None, 1), (1, 2)]
+
+
+def make_result(func_info, lines, timings):
+    return compute_function_result(
+        func_info, timings, 1e-3, [line + '\n' for line in lines])
+
+
+def test_function_diff():
+    """Check the changes computed for aligned lines."""
+    old = make_result(('foo.py', 1, 'foo'),
+                      ['def foo():', '    a = 1', '    b = 2'],
+                      [(2, 1, 4), (3, 2, 2)])
+    new = make_result(('foo.py', 1, 'foo'),
+                      ['def foo():', '    c = 3', '    a = 1'],
+                      [(2, 1, 1), (3, 3, 2)])
+    diff = FunctionDiff(old, new)
+    assert len(diff) == 4
+    assert [diff.get_code(pos) for pos in range(4)] == [
+        'def foo():', '    c = 3', '    a = 1', '    b = 2']
+    assert [diff.get_line_no(pos) for pos in range(4)] == [1, 2, 3, 3]
+    assert [diff.in_new(pos) for pos in range(4)] == [
+        True, True, True, False]
+    assert [diff.get_hits_delta(pos) for pos in range(4)] == [
+        None, 1, 2, -2]
+    assert diff.get_time_delta(2) == pytest.approx(-0.002)
+    assert diff.get_ratio(2) == pytest.approx(0.5)
+    assert diff.get_ratio(1) is None  # Line is new
+    assert diff.old_total_time == pytest.approx(0.006)
+    assert diff.new_total_time == pytest.approx(0.003)
+
+
+def test_compare_results():
+    """Check that functions are matched by file and name."""
+    foo_old = make_result(('foo.py', 1, 'foo'), ['def foo(): pass'],
+                          [(1, 1, 1)])
+    bar_old = make_result(('foo.py', 5, 'bar'), ['def bar(): pass'],
+                          [(5, 1, 1)])
+    foo_new = make_result(('foo.py', 3, 'foo'), ['def foo(): pass'],
+                          [(3, 1, 2)])
+    baz_new = make_result(('foo.py', 7, 'baz'), ['def baz(): pass'],
+                          [(7, 1, 1)])
+    old = ProfileResult(None, {result.func_info: result
+                               for result in [foo_old, bar_old]})
+    new = ProfileResult(None, {result.func_info: result
+                               for result in [foo_new, baz_new]})
+    diffs = compare_results(old, new)
+    assert list(diffs) == [foo_new.func_info, baz_new.func_info,
+                           bar_old.func_info]
+    foo = diffs[foo_new.func_info]
+    assert foo.old is foo_old and foo.new is foo_new
+    assert foo.get_time_delta(0) == pytest.approx(0.001)
+    assert diffs[baz_new.func_info].old is None
+    assert diffs[bar_old.func_info].new is None
+    assert not diffs[bar_old.func_info].in_new(0)
+
+
+def test_function_diff_noise():
+    """Check that changes within the noise of repeated runs are found."""
+    lines = ['def foo():', '    a = 1', '    b = 2']
+    func_info = ('foo.py', 1, 'foo')
+    old = RepeatedFunctionResult.from_runs([
+        make_result(func_info, lines, [(2, 1, ms), (3, 1, 10)])
+        for ms in [9, 10, 11]])
+    new = make_result(func_info, lines, [(2, 1, 11), (3, 1, 20)])
+    diff = FunctionDiff(old, new)
+    assert diff.get_error(0) is None
+    assert diff.get_error(1) == pytest.approx(0.004303 / 3 ** 0.5)
+    assert diff.is_noise(1)
+    assert diff.get_error(2) == 0.0
+    assert not diff.is_noise(2)
+    assert FunctionDiff(new, new).get_error(1) is None
+
+
+def test_function_diff_memory():
+    """Check the changes in memory when a run profiled it."""
+    lines = ['def foo():', '    a = [0] * 1000', '    b = 2']
+    func_info = ('foo.py', 1, 'foo')
+    old = make_result(func_info, lines, [(2, 1, 10), (3, 1, 10)])
+    result = make_result(func_info, lines, [(2, 1, 10)])
+    new = MemoryFunctionResult(
+        func_info, result.lines, result.times, result.hits,
+        result.total_time, array('d', [0, 8056, 0]), array('d', [0, 0, 0]))
+    diff = FunctionDiff(old, new)
+    assert diff.get_new_memory(1) == 8056
+    assert diff.get_memory_delta(1) == 8056
+    assert diff.get_new_memory(2) is None
+    assert diff.get_memory_delta(2) is None
+    assert FunctionDiff(old, old).get_memory_delta(1) is None
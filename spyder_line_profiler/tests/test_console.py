@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+#
+# -----------------------------------------------------------------------------
+# Copyright (c) 2017- Spyder Project Contributors
+#
+# Released under the terms of the MIT License
+# (see LICENSE.txt in the project root directory for details)
+# -----------------------------------------------------------------------------
+
+"""Tests for console.py."""
+
+# Third party imports
+import pytest
+
+# Local imports
+from spyder_line_profiler.console import (
+    RESULT_NAME, get_request_code, parse_command, save_console_data)
+from spyder_line_profiler.results import load_profile_data
+from spyder_line_profiler.sourcecache import BlockCache
+
+
+def test_parse_command():
+    assert parse_command('foo(x, y=2)') == (['foo'], 'foo(x, y=2)')
+    assert parse_command(' model.fit(data) ') == (
+        ['model.fit'], 'model.fit(data)')
+    assert parse_command('-f foo -f Model.fit  run(1)') == (
+        ['foo', 'Model.fit'], 'run(1)')
+    assert parse_command('-f foo x = 1; run(x)') == (
+        ['foo'], 'x = 1; run(x)')
+    with pytest.raises(ValueError):
+        parse_command('x = foo(1)')
+    with pytest.raises(ValueError):
+        parse_command('-f foo')
+
+
+def test_profile_statement(tmpdir):
+    """Check that statements are profiled in a namespace."""
+    filename = tmpdir.join('module.py').strpath
+    with open(filename, 'w', encoding='utf-8') as f:
+        f.write('def foo(n):\n'
+                '    return n * 2\n')
+    namespace = {}
+    with open(filename, encoding='utf-8') as f:
+        exec(compile(f.read(), filename, 'exec'), namespace)
+    namespace['data'] = 21
+
+    # The statement is not run if a function can't be found
+    exec(get_request_code('result = foo(data)', ['foo', 'bar']), namespace)
+    assert 'result' not in namespace
+    assert namespace[RESULT_NAME]['error'].startswith(
+        'Could not evaluate bar')
+    assert '_spyder_line_profiler_run' not in namespace
+
+    exec(get_request_code('result = foo(data) + 1', ['foo']), namespace)
+    data = namespace[RESULT_NAME]
+    assert data['error'] is None
+    profdatafile = tmpdir.join('results').strpath
+    assert save_console_data(data, profdatafile) is None
+    result = load_profile_data(profdatafile, BlockCache())
+    func_result = result[filename, 1, 'foo']
+    assert func_result.get_hits(1) == 1
+    assert namespace['result'] == 43
+    assert not result.sampled
+
+    exec(get_request_code('foo(None)', ['foo']), namespace)
+    assert 'TypeError' in namespace[RESULT_NAME]['error']
@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+#
+# -----------------------------------------------------------------------------
+# Copyright (c) 2017- Spyder Project Contributors
+#
+# Released under the terms of the MIT License
+# (see LICENSE.txt in the project root directory for details)
+# -----------------------------------------------------------------------------
+
+"""Tests for export.py."""
+
+# Standard library imports
+import csv
+import io
+import json
+
+# Third party imports
+import pytest
+
+# Local imports
+from spyder_line_profiler.export import (
+    CSV_COLUMNS, is_format_available, write_results)
+from spyder_line_profiler.results import (
+    MemoryFunctionResult, ProfileResult, compute_function_result)
+
+
+@pytest.fixture
+def result():
+    func_info = ('foo.py', 1, 'foo')
+    return ProfileResult('foo.lprof', {func_info: compute_function_result(
+        func_info, [(2, 4, 3000)], 1e-6,
+        ['def foo():\n', '    a = 1\n'])})
+
+
+def test_write_text(result):
+    f = io.StringIO()
+    write_results([result], f)
+    lines = f.getvalue().splitlines()
+    assert lines[0] == 'Results of foo.lprof'
+    assert lines[2] == 'foo (3.000ms) in file "foo.py", line 1'
+    assert lines[6].split() == ['1', 'def', 'foo():']
+    assert lines[7].split() == [
+        '2', '4', '3.000', '0.750', '100.0', 'a', '=', '1']
+
+
+def test_write_json(result):
+    f = io.StringIO()
+    write_results([result, result], f, 'json')
+    data = json.loads(f.getvalue())
+    assert len(data) == 2
+    func = data[0]['functions'][0]
+    assert func['func_name'] == 'foo'
+    assert func['total_time'] == pytest.approx(0.003)
+    assert func['lines'][0]['hits'] is None
+    assert func['lines'][1]['perhit'] == pytest.approx(0.00075)
+
+
+def test_write_csv(result):
+    f = io.StringIO()
+    write_results([result], f, 'csv')
+    rows = list(csv.DictReader(io.StringIO(f.getvalue())))
+    assert len(rows) == 2
+    assert rows[0]['hits'] == ''
+    assert rows[1]['hits'] == '4'
+    assert rows[1]['code'] == '    a = 1'
+    assert rows[1]['memory'] == ''
+
+
+def test_write_jsonl(result):
+    f = io.StringIO()
+    write_results([result, result], f, 'jsonl')
+    records = [json.loads(line) for line in f.getvalue().splitlines()]
+    assert len(records) == 4
+    assert list(records[1]) == CSV_COLUMNS
+    assert records[1]['line_no'] == 2
+    assert records[1]['perhit'] == pytest.approx(0.00075)
+    assert records[0]['hits'] is None
+
+
+def test_write_memory_records():
+    func_info = ('foo.py', 1, 'foo')
+    func = MemoryFunctionResult(
+        func_info, ['def foo():\n', '    a = [1]\n'], [0.0, 0.001], [0, 1],
+        0.001, [0.0, 64.0], [0.0, 128.0])
+    f = io.StringIO()
+    write_results([ProfileResult('foo.lprof', {func_info: func})], f, 'json')
+    lines = json.loads(f.getvalue())[0]['functions'][0]['lines']
+    assert (lines[1]['memory'], lines[1]['peak']) == (64.0, 128.0)
+    assert lines[0]['memory'] is None
+
+
+def test_write_parquet(result, tmpdir):
+    pq = pytest.importorskip('pyarrow.parquet')
+    path = tmpdir.join('results.parquet').strpath
+    with open(path, 'wb') as f:
+        write_results([result] * 3, f, 'parquet')
+    table = pq.read_table(path)
+    assert table.column_names == CSV_COLUMNS
+    assert table.num_rows == 6
+    assert table.schema.field('hits').type == 'int64'
+    assert table.column('hits').to_pylist()[:2] == [None, 4]
+
+
+def test_parquet_unavailable(result, monkeypatch):
+    monkeypatch.setattr('spyder_line_profiler.export.pq', None)
+    assert not is_format_available('parquet')
+    with pytest.raises(ImportError):
+        write_results([result], io.BytesIO(), 'parquet')
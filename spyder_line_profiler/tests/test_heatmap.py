@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+#
+# -----------------------------------------------------------------------------
+# Copyright (c) 2017- Spyder Project Contributors
+#
+# Released under the terms of the MIT License
+# (see LICENSE.txt in the project root directory for details)
+# -----------------------------------------------------------------------------
+
+"""Tests for heatmap.py."""
+
+# Third party imports
+import pytest
+
+# Local imports
+from spyder_line_profiler.heatmap import (
+    compute_heatmap, get_file_functions, normalize_path)
+from spyder_line_profiler.results import (
+    ProfileResult, compute_function_result)
+
+
+def make_result(timings):
+    lines = ['def outer():\n', '    def inner():\n', '        pass\n',
+             '    inner()\n']
+    functions = {}
+    for func_info, stats in timings.items():
+        start = func_info[1] - 1
+        functions[func_info] = compute_function_result(
+            func_info, stats, 1e-6, lines[start:start + 3])
+    return ProfileResult('foo.lprof', functions)
+
+
+def test_compute_heatmap():
+    result = make_result({
+        ('foo.py', 1, 'outer'): [(2, 1, 1000), (3, 1, 4000)],
+        ('foo.py', 2, 'inner'): [(2, 1, 1000)]})
+    lines = compute_heatmap(get_file_functions(result)[
+        normalize_path('foo.py')])
+    assert sorted(lines) == [2, 3]
+    # The definition of the nested function adds up
+    assert lines[2].hits == 2
+    assert lines[2].time == pytest.approx(0.002)
+    assert lines[2].heat == pytest.approx(0.5)
+    assert lines[2].code == '    def inner():'
+    assert lines[3].heat == 1.0
+    assert compute_heatmap([]) == {}
+
+
+def test_get_file_functions():
+    result = make_result({
+        ('foo.py', 1, 'outer'): [(2, 1, 1000)],
+        ('foo.py', 2, 'inner'): [(2, 1, 1000)],
+        ('bar.py', 1, 'outer'): [(2, 1, 1000)]})
+    files = get_file_functions(result)
+    assert files == {
+        normalize_path('foo.py'): [result['foo.py', 1, 'outer'],
+                                   result['foo.py', 2, 'inner']],
+        normalize_path('bar.py'): [result['bar.py', 1, 'outer']]}
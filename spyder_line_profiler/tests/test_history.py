@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+#
+# -----------------------------------------------------------------------------
+# Copyright (c) 2017- Spyder Project Contributors
+#
+# Released under the terms of the MIT License
+# (see LICENSE.txt in the project root directory for details)
+# -----------------------------------------------------------------------------
+
+"""Tests for history.py."""
+
+# Standard library imports
+import os.path as osp
+import threading
+
+# Local imports
+from spyder_line_profiler.history import RunHistory, load_code
+from spyder_line_profiler.results import ProfileResult, compute_function_result
+
+
+def make_result(total_ms):
+    func_info = ('foo.py', 1, 'foo')
+    return ProfileResult(None, {func_info: compute_function_result(
+        func_info, [(2, 1, total_ms)], 1e-3, ['def foo():\n', '    pass\n'])})
+
+
+def add_run(history, tmpdir, script, total_ms=1, timestamp=None, size=10,
+            name='results'):
+    datafile = tmpdir.join(name).strpath
+    with open(datafile, 'wb') as f:
+        f.write(b'x' * size)
+    return history.add_run(datafile, make_result(total_ms), script,
+                           args='-v', wdir='/tmp', output='out',
+                           timestamp=timestamp)
+
+
+def test_run_history(tmpdir):
+    """Check that runs are indexed and persist across sessions."""
+    root = tmpdir.join('history').strpath
+    history = RunHistory(root)
+    run1 = add_run(history, tmpdir, 'a.py', total_ms=5, timestamp=1)
+    run2 = add_run(history, tmpdir, 'a.py', total_ms=7, timestamp=2)
+    add_run(history, tmpdir, 'b.py', timestamp=3)
+
+    assert not osp.exists(tmpdir.join('results').strpath)
+    assert osp.isfile(history.get_data_path(run1['id']))
+    with open(history.get_output_path(run1['id']), encoding='utf-8') as f:
+        assert f.read() == 'out'
+    assert run1['total_time'] == 0.005
+    assert run1['top_functions'] == [['foo', 'foo.py', 1, 0.005]]
+    assert run1['args'] == '-v'
+    with open(history.get_code_path(run1['id']), encoding='utf-8') as f:
+        code_size = len(f.read())
+    assert run1['size'] == 13 + code_size
+    assert load_code(history.get_code_path(run1['id'])) == {
+        ('foo.py', 1): ['def foo():\n', '    pass\n']}
+
+    # Runs are listed from the index, newest first
+    history = RunHistory(root)
+    assert [run['id'] for run in history.get_runs('a.py')] == [
+        run2['id'], run1['id']]
+    assert len(history.get_runs()) == 3
+
+    history.remove_run(run2['id'])
+    assert not osp.exists(history.get_data_path(run2['id']))
+    history.clear('b.py')
+    assert [run['id'] for run in RunHistory(root).get_runs()] == [run1['id']]
+
+
+def test_run_history_eviction(tmpdir):
+    """Check that least recently used runs are evicted first."""
+    history = RunHistory(tmpdir.join('history').strpath, max_runs=2)
+    run1 = add_run(history, tmpdir, 'a.py', timestamp=1)
+    run2 = add_run(history, tmpdir, 'a.py', timestamp=2)
+    other = add_run(history, tmpdir, 'b.py', timestamp=3)
+    history.touch(run1['id'])
+    run3 = add_run(history, tmpdir, 'a.py', timestamp=4)
+    assert history.get_run(run2['id']) is None
+    assert not osp.exists(history.get_data_path(run2['id']))
+    assert [run['id'] for run in history.get_runs('a.py')] == [
+        run3['id'], run1['id']]
+
+    # The whole store is kept under its size limit
+    history.max_size = 2 * run3['size']
+    history.prune()
+    assert [run['id'] for run in history.get_runs()] == [
+        run3['id'], run1['id']]
+    assert history.get_run(other['id']) is None
+
+
+def test_run_history_threads(tmpdir):
+    """Check that runs added while others are used keep a valid index."""
+    root = tmpdir.join('history').strpath
+    history = RunHistory(root, max_runs=100)
+    first = add_run(history, tmpdir, 'a.py')
+    done = threading.Event()
+
+    def add_runs():
+        for index in range(50):
+            add_run(history, tmpdir, 'a.py', name='results{}'.format(index))
+        done.set()
+
+    thread = threading.Thread(target=add_runs)
+    thread.start()
+    while not done.is_set():
+        history.touch(first['id'])
+        # The index is never left corrupt
+        assert RunHistory(root).get_run(first['id']) is not None
+    thread.join()
+    assert len(RunHistory(root).get_runs()) == 51
@@ -11,14 +11,27 @@
 
 # Standard library imports
 import os
+import os.path as osp
+import pickle
 import sys
 
 # Third party imports
+from line_profiler import LineStats
+import pytest
 from qtpy.QtCore import Qt
 from unittest.mock import patch
 
 # Local imports
-from spyder_line_profiler.spyder.widgets import SpyderLineProfilerWidget
+from spyder_line_profiler.budgets import Budget, check_budgets
+from spyder_line_profiler.compare import compare_results
+from spyder_line_profiler.heatmap import normalize_path
+from spyder_line_profiler.results import (
+    ProfileResult, compute_function_result)
+from spyder_line_profiler.spyder.widgets import (
+    BUDGET_VIOLATION_COLOR, COL_MEM, COL_TIME, DIFF_FASTER_COLOR,
+    DIFF_SLOWER_COLOR,
+    LineProfilerDataModel,
+    LineProfilerDiffModel, SORT_ROLE, SpyderLineProfilerWidget)
 
 
 TEST_SCRIPT = \
@@ -32,9 +45,11 @@ def foo():
 foo()"""
 
 
-def test_profile_and_display_results(qtbot, tmpdir):
+def test_profile_and_display_results(qtbot, tmpdir, monkeypatch):
     """Run profiler on simple script and check that results are okay."""
     os.chdir(tmpdir.strpath)
+    monkeypatch.setattr(SpyderLineProfilerWidget, 'HISTORYPATH',
+                        tmpdir.join('history').strpath)
     testfilename = tmpdir.join('test_foo.py').strpath
 
     with open(testfilename, 'w', encoding='utf-8') as f:
@@ -57,21 +72,704 @@ def test_profile_and_display_results(qtbot, tmpdir):
     MockTextEditor.assert_not_called()
 
     dt = widget.datatree
+    model = dt.model()
     assert dt.topLevelItemCount() == 1  # number of functions profiled
 
-    top = dt.topLevelItem(0)
-    assert top.data(0, Qt.DisplayRole).startswith('foo ')
-    assert top.childCount() == 6
+    top = model.index(0, 0)
+    assert top.data(Qt.DisplayRole).startswith('foo ')
+    assert model.rowCount(top) == 6
+
+    def child(row, column=0):
+        return model.index(row, column, top)
+
     for i in range(6):
-        assert top.child(i).data(0, Qt.DisplayRole) == i + 2  # line no
-
-    assert top.child(2).data(1, Qt.DisplayRole) == '1'  # hits
-    assert top.child(3).data(1, Qt.DisplayRole) == '1'
-    assert top.child(4).data(1, Qt.DisplayRole) in ['100', '101']  # result depends on Python version
-    assert top.child(5).data(1, Qt.DisplayRole) == '100'
-
-    assert float(top.child(2).data(2, Qt.DisplayRole)) >= 900  # time (ms)
-    assert float(top.child(2).data(2, Qt.DisplayRole)) <= 1200
-    assert float(top.child(3).data(2, Qt.DisplayRole)) <= 100
-    assert float(top.child(4).data(2, Qt.DisplayRole)) <= 100
-    assert float(top.child(5).data(2, Qt.DisplayRole)) <= 100
+        assert child(i).data(Qt.DisplayRole) == i + 2  # line no
+
+    assert child(2, 1).data(Qt.DisplayRole) == '1'  # hits
+    assert child(3, 1).data(Qt.DisplayRole) == '1'
+    assert child(4, 1).data(Qt.DisplayRole) in ['100', '101']  # result depends on Python version
+    assert child(5, 1).data(Qt.DisplayRole) == '100'
+
+    assert float(child(2, 2).data(Qt.DisplayRole)) >= 900  # time (ms)
+    assert float(child(2, 2).data(Qt.DisplayRole)) <= 1200
+    assert float(child(3, 2).data(Qt.DisplayRole)) <= 100
+    assert float(child(4, 2).data(Qt.DisplayRole)) <= 100
+    assert float(child(5, 2).data(Qt.DisplayRole)) <= 100
+
+
+def test_run_history(qtbot, tmpdir, monkeypatch):
+    """Check that past runs are listed and can be shown again."""
+    os.chdir(tmpdir.strpath)
+    monkeypatch.setattr(SpyderLineProfilerWidget, 'HISTORYPATH',
+                        tmpdir.join('history').strpath)
+    testfilename = tmpdir.join('test_foo.py').strpath
+    with open(testfilename, 'w', encoding='utf-8') as f:
+        f.write('@profile\ndef foo(n):\n    return n\nfoo(1)\n')
+
+    widget = SpyderLineProfilerWidget(None)
+    with patch.object(widget, 'get_conf', return_value=sys.executable):
+        widget.setup()
+        qtbot.addWidget(widget)
+        for args in ['1', '2']:
+            with qtbot.waitSignal(widget.sig_finished, timeout=10000,
+                                  raising=True):
+                widget.analyze(testfilename, args=args)
+
+    runs = widget.history.get_runs(testfilename)
+    assert [run['args'] for run in runs] == ['2', '1']
+    assert runs[0]['top_functions'][0][0] == 'foo'
+    combo = widget.historycombo
+    assert combo.count() == 2
+    assert combo.currentIndex() == 0
+    assert not osp.exists(widget.DATAPATH)
+
+    widget.load_run(runs[1]['id'])
+    assert combo.currentIndex() == 1
+    qtbot.waitUntil(lambda: widget.datatree.topLevelItemCount() == 1)
+    top = widget.datatree.model().index(0, 0)
+    assert top.data(Qt.DisplayRole).startswith('foo ')
+
+    # Compare the runs, using the code saved with them
+    with open(testfilename, 'w', encoding='utf-8') as f:
+        f.write('# Changed\n')
+    widget.compare_with_run(runs[0]['id'])
+    qtbot.waitUntil(
+        lambda: widget.datatree.model() is widget.datatree.diff_model)
+    diff_top = widget.datatree.model().index(0, 0)
+    assert diff_top.data(Qt.DisplayRole).startswith('foo ')
+    assert widget.datatree.model().rowCount(diff_top) == 3
+
+    # A new session lists the same runs
+    other = SpyderLineProfilerWidget(None)
+    qtbot.addWidget(other)
+    other.filecombo.addItem(testfilename)
+    assert other.historycombo.count() == 2
+
+
+def test_load_data_files(qtbot, tmpdir, monkeypatch):
+    """Check that results saved by kernprof are loaded and merged."""
+    monkeypatch.setattr(SpyderLineProfilerWidget, 'HISTORYPATH',
+                        tmpdir.join('history').strpath)
+    monkeypatch.setattr(SpyderLineProfilerWidget, 'MERGEDPATH',
+                        tmpdir.join('merged').strpath)
+    testfilename = tmpdir.join('test_foo.py').strpath
+    with open(testfilename, 'w', encoding='utf-8') as f:
+        f.write('def foo(n):\n    return n\n')
+    func_info = (testfilename, 1, 'foo')
+    filenames = []
+    for index in range(3):
+        filename = tmpdir.join('{}.lprof'.format(index)).strpath
+        with open(filename, 'wb') as f:
+            pickle.dump(LineStats({func_info: [(2, 2, 1000)]}, 1e-6), f)
+        filenames.append(filename)
+
+    widget = SpyderLineProfilerWidget(None)
+    qtbot.addWidget(widget)
+    widget.setup()
+    widget.shard_breakdown = False
+    with qtbot.waitSignal(widget.sig_finished, timeout=10000, raising=True):
+        widget.load_data_files(filenames)
+    assert widget.datatree.topLevelItemCount() == 1
+    result = widget.datatree.stats[func_info]
+    assert result.get_hits(1) == 6
+    assert result.total_time == pytest.approx(0.003)
+    assert '3 file' in widget.datelabel.text()
+
+    # The files are merged again when broken down
+    with qtbot.waitSignal(widget.sig_finished, timeout=10000, raising=True):
+        widget._update_shard_breakdown(True)
+    result = widget.datatree.stats[func_info]
+    assert [label for label, _result in result.processes] == [
+        '0.lprof', '1.lprof', '2.lprof']
+
+
+def test_live_update_heatmap(qtbot, tmpdir, monkeypatch):
+    """Check that the heatmap is only updated once the run finished."""
+    monkeypatch.setattr(SpyderLineProfilerWidget, 'HISTORYPATH',
+                        tmpdir.join('history').strpath)
+    testfilename = tmpdir.join('test_foo.py').strpath
+    with open(testfilename, 'w', encoding='utf-8') as f:
+        f.write('def foo(n):\n    return n\n')
+    func_info = (testfilename, 1, 'foo')
+    filename = tmpdir.join('snapshot.lprof').strpath
+    with open(filename, 'wb') as f:
+        pickle.dump(LineStats({func_info: [(2, 2, 1000)]}, 1e-6), f)
+
+    widget = SpyderLineProfilerWidget(None)
+    qtbot.addWidget(widget)
+    widget.setup()
+    widget.editor_heatmap = True
+    widget.load_results(filename, live=True)
+    qtbot.waitUntil(lambda: widget._load_worker is None, timeout=10000)
+    assert widget.datatree.stats[func_info].get_hits(1) == 2
+    assert widget.heatmap.get_lines(testfilename) is None
+
+    widget.load_results(filename)
+    qtbot.waitUntil(lambda: widget._load_worker is None, timeout=10000)
+    assert widget.heatmap.get_lines(testfilename)[2].hits == 2
+
+
+def test_repeated_runs(qtbot, tmpdir, monkeypatch):
+    """Run a script several times and check that statistics are shown."""
+    os.chdir(tmpdir.strpath)
+    monkeypatch.setattr(SpyderLineProfilerWidget, 'HISTORYPATH',
+                        tmpdir.join('history').strpath)
+    testfilename = tmpdir.join('test_foo.py').strpath
+    with open(testfilename, 'w', encoding='utf-8') as f:
+        f.write('@profile\ndef foo(n):\n    return n\nfoo(1)\n')
+
+    widget = SpyderLineProfilerWidget(None)
+    with patch.object(widget, 'get_conf', return_value=sys.executable):
+        widget.setup()
+        qtbot.addWidget(widget)
+        with qtbot.waitSignal(widget.sig_finished, timeout=20000,
+                              raising=True):
+            widget.analyze(testfilename, repeat=3, parallel=2)
+
+    assert not widget.processes
+    assert not osp.exists(widget.DATAPATH + '.0')
+    model = widget.datatree.model()
+    top = model.index(0, 0)
+    assert 'mean of 3 runs' in top.data(Qt.DisplayRole)
+    line = model.index(2, 2, top)
+    assert ' ± ' in line.data(Qt.DisplayRole)
+    assert line.data(Qt.ToolTipRole).startswith('Mean of 3 runs')
+    assert model.index(2, 1, top).data(Qt.DisplayRole) == '1'
+
+
+def test_profile_targets(qtbot, tmpdir, monkeypatch):
+    """Check that functions are profiled without decorators."""
+    os.chdir(tmpdir.strpath)
+    monkeypatch.setattr(SpyderLineProfilerWidget, 'HISTORYPATH',
+                        tmpdir.join('history').strpath)
+    tmpdir.join('helpers.py').write(
+        'class Solver:\n'
+        '    def solve(self, n):\n'
+        '        return n\n'
+        'def other():\n'
+        '    return 0\n')
+    testfilename = tmpdir.join('test_foo.py').strpath
+    with open(testfilename, 'w', encoding='utf-8') as f:
+        f.write('from helpers import Solver, other\n'
+                'def foo(n):\n'
+                '    return Solver().solve(n) + other()\n'
+                'foo(1)\n')
+
+    widget = SpyderLineProfilerWidget(None)
+    with patch.object(widget, 'get_conf', return_value=sys.executable):
+        widget.setup()
+        qtbot.addWidget(widget)
+        with qtbot.waitSignal(widget.sig_finished, timeout=20000,
+                              raising=True):
+            widget.analyze(testfilename,
+                           targets=[testfilename, 'helpers:Solver'])
+
+    # Methods are named after their qualified name in line_profiler >= 4.2
+    assert sorted(func.func_name.split('.')[-1]
+                  for func in widget.datatree.stats.values()) == [
+        'foo', 'solve']
+    result = widget.datatree.stats[testfilename, 2, 'foo']
+    assert result.get_hits(1) == 1
+
+
+def test_auto_select(qtbot, tmpdir, monkeypatch):
+    """Check that the slowest functions are selected with cProfile."""
+    os.chdir(tmpdir.strpath)
+    monkeypatch.setattr(SpyderLineProfilerWidget, 'HISTORYPATH',
+                        tmpdir.join('history').strpath)
+    monkeypatch.setattr(SpyderLineProfilerWidget, 'CALLSTATSPATH',
+                        tmpdir.join('callstats').strpath)
+    testfilename = tmpdir.join('test_foo.py').strpath
+    with open(testfilename, 'w', encoding='utf-8') as f:
+        f.write('import time\n'
+                'def slow():\n'
+                '    time.sleep(0.2)\n'
+                'def fast():\n'
+                '    return 0\n'
+                'slow()\n'
+                'fast()\n')
+
+    widget = SpyderLineProfilerWidget(None)
+    with patch.object(widget, 'get_conf', return_value=sys.executable):
+        widget.setup()
+        qtbot.addWidget(widget)
+        with qtbot.waitSignal(widget.sig_finished, timeout=20000,
+                              raising=True):
+            widget.analyze(testfilename, auto_select=(1, 'cumulative'))
+
+    assert list(widget.datatree.stats) == [(testfilename, 2, 'slow')]
+    assert not os.path.exists(widget.CALLSTATSPATH)
+
+
+def test_sampling(qtbot, tmpdir, monkeypatch):
+    """Check that lines can be sampled instead of timed."""
+    os.chdir(tmpdir.strpath)
+    monkeypatch.setattr(SpyderLineProfilerWidget, 'HISTORYPATH',
+                        tmpdir.join('history').strpath)
+    testfilename = tmpdir.join('test_foo.py').strpath
+    with open(testfilename, 'w', encoding='utf-8') as f:
+        f.write('import time\n'
+                '@profile\n'
+                'def foo():\n'
+                '    end = time.perf_counter() + 0.3\n'
+                '    while time.perf_counter() < end:\n'
+                '        pass\n'
+                'foo()\n')
+
+    widget = SpyderLineProfilerWidget(None)
+    with patch.object(widget, 'get_conf', return_value=sys.executable):
+        widget.setup()
+        qtbot.addWidget(widget)
+        with qtbot.waitSignal(widget.sig_finished, timeout=20000,
+                              raising=True):
+            widget.analyze(testfilename, sampling=0.001)
+
+    assert widget.datatree.stats.sampled
+    result = widget.datatree.stats[testfilename, 2, 'foo']
+    samples = sum(result.get_hits(pos) or 0 for pos in range(len(result)))
+    assert samples > 10
+    assert 0.1 < result.total_time < 1
+    header = widget.datatree.model().headerData(1, Qt.Horizontal)
+    assert header == 'Samples'
+
+
+def test_memory_profiling(qtbot, tmpdir, monkeypatch):
+    """Check that the memory allocated by lines can be profiled."""
+    os.chdir(tmpdir.strpath)
+    monkeypatch.setattr(SpyderLineProfilerWidget, 'HISTORYPATH',
+                        tmpdir.join('history').strpath)
+    testfilename = tmpdir.join('test_foo.py').strpath
+    with open(testfilename, 'w', encoding='utf-8') as f:
+        f.write('@profile\n'
+                'def foo():\n'
+                '    data = bytearray(10 * 2**20)\n'
+                '    temp = bytearray(20 * 2**20)\n'
+                '    del temp\n'
+                '    return data\n'
+                'result = foo()\n')
+
+    widget = SpyderLineProfilerWidget(None)
+    widget.memory_profiling = True
+    with patch.object(widget, 'get_conf', return_value=sys.executable):
+        widget.setup()
+        qtbot.addWidget(widget)
+        with qtbot.waitSignal(widget.sig_finished, timeout=20000,
+                              raising=True):
+            widget.analyze(testfilename)
+
+    result = widget.datatree.stats[testfilename, 1, 'foo']
+    assert result.get_memory(2) == pytest.approx(10 * 2**20, rel=0.01)
+    assert result.get_peak(3) == pytest.approx(20 * 2**20, rel=0.01)
+    assert result.get_memory(4) == pytest.approx(-20 * 2**20, rel=0.01)
+    assert result.get_hits(2) == 1
+    assert not widget.datatree.isColumnHidden(COL_MEM)
+    model = widget.datatree.model()
+    top = model.index(0, 0)
+    assert model.index(2, COL_MEM, top).data().startswith('+1024')
+
+    # Memory columns are hidden when memory was not profiled
+    widget.memory_profiling = False
+    with patch.object(widget, 'get_conf', return_value=sys.executable):
+        with qtbot.waitSignal(widget.sig_finished, timeout=20000,
+                              raising=True):
+            widget.analyze(testfilename)
+    assert widget.datatree.isColumnHidden(COL_MEM)
+
+
+def test_warm_workers(qtbot, tmpdir, monkeypatch):
+    """Check that runs use warm workers, which don't run outdated code."""
+    os.chdir(tmpdir.strpath)
+    monkeypatch.setattr(SpyderLineProfilerWidget, 'HISTORYPATH',
+                        tmpdir.join('history').strpath)
+    marker = tmpdir.join('imported')
+    module = tmpdir.join('preloaded.py')
+    module.write('open({!r}, "w").close()\n'
+                 'VALUE = 1\n'.format(marker.strpath))
+    testfilename = tmpdir.join('test_foo.py').strpath
+    with open(testfilename, 'w', encoding='utf-8') as f:
+        f.write('import os\n'
+                'import preloaded\n'
+                '@profile\n'
+                'def foo():\n'
+                '    return preloaded.VALUE\n'
+                'print("value:", foo(), "pid:", os.getpid())\n')
+
+    widget = SpyderLineProfilerWidget(None)
+    widget.pythonpath = [tmpdir.strpath]
+    widget.warm_workers = 1
+    widget.preload_modules = 'preloaded'
+    with patch.object(widget, 'get_conf', return_value=sys.executable):
+        widget.setup()
+        qtbot.addWidget(widget)
+        assert len(widget._workers) == 1
+        qtbot.waitUntil(marker.exists, timeout=10000)
+        marker.remove()
+        pid = widget._workers[0][0].processId()
+        with qtbot.waitSignal(widget.sig_finished, timeout=20000,
+                              raising=True):
+            widget.analyze(testfilename)
+        assert 'value: 1 pid: {}'.format(pid) in widget.output
+        assert widget.datatree.stats[testfilename, 3, 'foo']
+
+        # The used worker is replaced, and runs the job in a new
+        # interpreter once the preloaded module changed
+        assert len(widget._workers) == 1
+        qtbot.waitUntil(marker.exists, timeout=10000)
+        module.write('VALUE = 2\n')
+        mtime = module.mtime() + 10
+        os.utime(module.strpath, (mtime, mtime))
+        with qtbot.waitSignal(widget.sig_finished, timeout=20000,
+                              raising=True):
+            widget.analyze(testfilename)
+        assert 'value: 2 pid:' in widget.output
+        assert widget.datatree.stats[testfilename, 3, 'foo']
+
+    widget.stop_workers()
+    assert not widget._workers
+
+
+class FakeShellWidget:
+    """Shell widget running the calls to its kernel in a namespace."""
+
+    def __init__(self, namespace):
+        self.namespace = namespace
+
+    def call_kernel(self, callback=None):
+        shellwidget = self
+
+        class Kernel:
+            def safe_exec(self, filename):
+                with open(filename, encoding='utf-8') as f:
+                    exec(f.read(), shellwidget.namespace)
+                callback(None)
+
+            def get_value(self, name):
+                callback(shellwidget.namespace[name])
+
+            def remove_value(self, name):
+                del shellwidget.namespace[name]
+
+        return Kernel()
+
+
+def test_profile_in_console(qtbot, tmpdir, monkeypatch):
+    """Check that statements are profiled in the namespace of a console."""
+    monkeypatch.setattr(SpyderLineProfilerWidget, 'CONSOLEPATH',
+                        tmpdir.join('console.py').strpath)
+    monkeypatch.setattr(SpyderLineProfilerWidget, 'CONSOLEDATAPATH',
+                        tmpdir.join('console').strpath)
+    testfilename = tmpdir.join('test_foo.py').strpath
+    with open(testfilename, 'w', encoding='utf-8') as f:
+        f.write('def foo(n):\n'
+                '    return n * 2\n')
+    namespace = {}
+    with open(testfilename, encoding='utf-8') as f:
+        exec(compile(f.read(), testfilename, 'exec'), namespace)
+    namespace['data'] = 21
+
+    widget = SpyderLineProfilerWidget(None)
+    widget.setup()
+    qtbot.addWidget(widget)
+    with qtbot.waitSignal(widget.sig_finished, timeout=20000,
+                          raising=True):
+        widget.analyze_in_console(FakeShellWidget(namespace),
+                                  '-f foo x = foo(data)')
+
+    assert namespace['x'] == 42
+    assert list(namespace) == ['__builtins__', 'foo', 'data', 'x']
+    result = widget.datatree.stats[testfilename, 1, 'foo']
+    assert result.get_hits(1) == 1
+    assert widget.start_action.isEnabled()
+    assert 'x = foo(data)' in widget.output
+
+
+CHILDREN_SCRIPT = """import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+@profile
+def foo(n):
+    return n
+if __name__ == '__main__':
+    foo(1)
+    if 'fork' in multiprocessing.get_all_start_methods():
+        with multiprocessing.get_context('fork').Pool(1) as pool:
+            pool.map(foo, [2, 3])
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(1, mp_context=context) as executor:
+        list(executor.map(foo, [4]))
+"""
+
+
+def test_profile_children(qtbot, tmpdir, monkeypatch):
+    """Check that functions are profiled in child processes."""
+    os.chdir(tmpdir.strpath)
+    monkeypatch.setattr(SpyderLineProfilerWidget, 'HISTORYPATH',
+                        tmpdir.join('history').strpath)
+    monkeypatch.setattr(SpyderLineProfilerWidget, 'SHARDSPATH',
+                        tmpdir.join('shards').strpath)
+    testfilename = tmpdir.join('test_foo.py').strpath
+    with open(testfilename, 'w', encoding='utf-8') as f:
+        f.write(CHILDREN_SCRIPT)
+
+    widget = SpyderLineProfilerWidget(None)
+    widget.profile_children = True
+    with patch.object(widget, 'get_conf', return_value=sys.executable):
+        widget.setup()
+        qtbot.addWidget(widget)
+        with qtbot.waitSignal(widget.sig_finished, timeout=30000,
+                              raising=True):
+            widget.analyze(testfilename)
+
+    assert not osp.exists(tmpdir.join('shards').strpath)
+    model = widget.datatree.model()
+    top = model.index(0, 0)
+    result = widget.datatree.stats[testfilename, 3, 'foo']
+    labels = [label for label, _result in result.processes]
+    assert labels[0] == 'Main process'
+    assert any(label.startswith('SpawnProcess') for label in labels)
+    hits = model.index(2, 1, top)
+    assert hits.data(Qt.DisplayRole) == str(
+        4 if len(labels) == 3 else 2)  # Calls of foo in all processes
+    assert 'Main process: ' in hits.data(Qt.ToolTipRole)
+
+
+BREAKDOWN_SCRIPT = """import asyncio
+import threading
+@profile
+async def wait(delay):
+    await asyncio.sleep(delay)
+    return delay
+async def main():
+    await asyncio.gather(asyncio.create_task(wait(0.1), name='first'),
+                         asyncio.create_task(wait(0.2), name='second'))
+thread = threading.Thread(target=asyncio.run, args=(main(),),
+                          name='Loop')
+thread.start()
+thread.join()
+"""
+
+
+def test_context_breakdown(qtbot, tmpdir, monkeypatch):
+    """Check that timings can be shown per thread and per task."""
+    os.chdir(tmpdir.strpath)
+    monkeypatch.setattr(SpyderLineProfilerWidget, 'HISTORYPATH',
+                        tmpdir.join('history').strpath)
+    monkeypatch.setattr(SpyderLineProfilerWidget, 'BREAKDOWNPATH',
+                        tmpdir.join('breakdown').strpath)
+    testfilename = tmpdir.join('test_foo.py').strpath
+    with open(testfilename, 'w', encoding='utf-8') as f:
+        f.write(BREAKDOWN_SCRIPT)
+
+    widget = SpyderLineProfilerWidget(None)
+    widget.context_breakdown = True
+    with patch.object(widget, 'get_conf', return_value=sys.executable):
+        widget.setup()
+        qtbot.addWidget(widget)
+        with qtbot.waitSignal(widget.sig_finished, timeout=20000,
+                              raising=True):
+            widget.analyze(testfilename)
+
+    assert not osp.exists(tmpdir.join('breakdown').strpath)
+    assert widget.pivotcombo.isEnabled()
+    model = widget.datatree.model()
+    top = model.index(0, 0)
+    assert top.data(Qt.ToolTipRole).splitlines()[0].startswith(
+        'Loop, task first: ')
+    await_line = model.index(2, 2, top)
+    assert 'suspended' in await_line.data(Qt.DisplayRole)
+    assert 'Suspended: ' in await_line.data(Qt.ToolTipRole)
+
+    widget.pivotcombo.setCurrentIndex(widget.pivotcombo.findData('task'))
+    model = widget.datatree.model()
+    assert model.rowCount() == 2
+    labels = [model.index(row, 0).data() for row in range(2)]
+    assert all(label.startswith('wait (') for label in labels)
+    assert sorted(label.split(' in ')[1] for label in labels) == [
+        'first)', 'second)']
+
+    widget.pivotcombo.setCurrentIndex(widget.pivotcombo.findData('thread'))
+    assert widget.datatree.model().rowCount() == 1
+    assert ' in Loop) ' in widget.datatree.model().index(0, 0).data()
+
+
+def make_result(func_info, lines, timings):
+    """Make the FunctionResult of `lines` with (line, hits, ms) timings."""
+    return compute_function_result(
+        func_info, timings, 1e-3, [line + '\n' for line in lines])
+
+
+def test_heatmap_panel(qtbot, tmpdir):
+    """Check that the profiled lines are shaded in the editor."""
+    from spyder.plugins.editor.widgets.codeeditor import CodeEditor
+    from spyder_line_profiler.spyder.annotations import (
+        HeatmapPanel, LineHeatmap, install_heatmap_panel)
+
+    filename = tmpdir.join('foo.py').strpath
+    code = 'def foo():\n    a = 1\n    return a\n'
+    editor = CodeEditor(None)
+    editor.setup_editor(language='python', filename=filename)
+    editor.set_text(code)
+    qtbot.addWidget(editor)
+    editor.show()
+    heatmap = LineHeatmap()
+    panel = install_heatmap_panel(editor, heatmap)
+    assert install_heatmap_panel(editor, heatmap) is panel
+    assert panel.isHidden()
+
+    func_info = (filename, 1, 'foo')
+    result = ProfileResult('foo.lprof', {func_info: compute_function_result(
+        func_info, [(2, 1, 1000), (3, 1, 3000)], 1e-6,
+        code.splitlines(True))})
+    with qtbot.waitSignal(heatmap.sig_changed):
+        heatmap.set_result(result)
+    assert not panel.isHidden()
+    # The heat of the file is computed when the panel is painted
+    assert not heatmap._lines
+    panel.grab()
+    lines = heatmap._lines[normalize_path(filename)]
+    assert heatmap.get_lines(filename) is lines
+    block = editor.document().findBlockByNumber(2)
+    assert panel._get_line(lines, 3, block).heat == 1.0
+
+    # Lines whose code changed are not shaded
+    editor.set_text(code.replace('return a', 'return 2 * a'))
+    block = editor.document().findBlockByNumber(2)
+    assert panel._get_line(lines, 3, block) is None
+
+    # Setting the same results again doesn't repaint editors
+    with qtbot.assertNotEmitted(heatmap.sig_changed):
+        heatmap.set_result(result)
+    heatmap.clear()
+    assert panel.isHidden()
+
+    # Nor do results of files without panels
+    other_info = (tmpdir.join('bar.py').strpath, 1, 'foo')
+    with qtbot.assertNotEmitted(heatmap.sig_changed):
+        heatmap.set_result(ProfileResult('bar.lprof', {
+            other_info: compute_function_result(
+                other_info, [(2, 1, 1000)], 1e-6, code.splitlines(True))}))
+    assert heatmap.get_lines(other_info[0])[2].hits == 1
+    editor.panels.remove(HeatmapPanel)
+
+
+def test_data_model_sort(qtbot):
+    """Check that the data model sorts functions and lines by value."""
+    foo = ('foo.py', 2, 'foo')
+    bar = ('bar.py', 11, 'bar')
+    stats = {
+        foo: make_result(foo, ['a = 1', 'b = 2', 'pass'],
+                         [(2, 2, 2), (3, 2, 8)]),
+        bar: make_result(bar, ['c = 3'], [(11, 1, 500)]),
+    }
+    model = LineProfilerDataModel(['#', 'Hits', 'Time', 'Per hit', '%', 'Code'])
+    model.set_stats(stats)
+    assert model.rowCount() == 2
+
+    model.sort(2, Qt.DescendingOrder)  # By time
+    assert model.index(0, 0).data().startswith('bar ')
+    foo = model.index(1, 0)
+    assert [model.index(row, 0, foo).data() for row in range(3)] == [3, 2, 4]
+    assert model.index(0, 2, foo).data() == '8.000'
+    assert model.index(0, 2, foo).data(SORT_ROLE) == pytest.approx(0.008)
+    assert model.index(0, 0, foo).data(Qt.UserRole)[1] == 3
+    assert model.index(2, 0, foo).data(Qt.ForegroundRole) is not None
+    assert model.index(2, 0, foo).data(Qt.BackgroundRole) is None
+
+
+def test_data_model_update(qtbot):
+    """Check that partial results only update the rows that changed."""
+    func_info = ('foo.py', 2, 'foo')
+    lines = ['a = 1', 'b = 2']
+    model = LineProfilerDataModel(['#', 'Hits', 'Time', 'Per hit', '%', 'Code'])
+    model.set_stats(
+        {func_info: make_result(func_info, lines, [(2, 1, 100)])})
+
+    changed = []
+    model.dataChanged.connect(
+        lambda first, last: changed.append(
+            (first.parent().isValid(), first.row(), last.row())))
+    bar = ('bar.py', 6, 'bar')
+    with qtbot.assertNotEmitted(model.modelReset):
+        assert model.update_stats({
+            func_info: make_result(
+                func_info, lines, [(2, 1, 100), (3, 1, 100)]),
+            bar: make_result(bar, ['pass'], [(6, 1, 100)])})
+    assert changed == [(False, 0, 0), (True, 0, 1)]
+    assert model.rowCount() == 2
+    assert model.index(1, 1, model.index(0, 0)).data() == '1'
+
+    # Same timings don't signal anything
+    changed.clear()
+    assert model.update_stats({
+        func_info: make_result(
+            func_info, lines, [(2, 1, 100), (3, 1, 100)])})
+    assert changed == []
+
+    # Different lines of code can't be patched
+    assert not model.update_stats(
+        {func_info: make_result(func_info, ['c = 3'], [(2, 1, 100)])})
+
+
+def test_data_model_update_sorted(qtbot):
+    """Check that changed rows are signaled where they are sorted."""
+    func_info = ('foo.py', 2, 'foo')
+    lines = ['a = 1', 'b = 2', 'c = 3']
+    model = LineProfilerDataModel(['#', 'Hits', 'Time', 'Per hit', '%', 'Code'])
+    model.set_stats({func_info: make_result(
+        func_info, lines, [(2, 1, 100), (3, 1, 200), (4, 1, 300)])})
+    model.sort(COL_TIME, Qt.DescendingOrder)
+
+    changed = []
+    model.dataChanged.connect(
+        lambda first, last: changed.append(
+            (first.parent().isValid(), first.row(), last.row())))
+    # Same times, only the hits of the first and last lines changed
+    assert model.update_stats({func_info: make_result(
+        func_info, lines, [(2, 2, 100), (3, 1, 200), (4, 2, 300)])})
+    assert changed == [(False, 0, 0), (True, 0, 0), (True, 2, 2)]
+
+
+def test_diff_model(qtbot):
+    """Check that changes between runs are shown with colors."""
+    func_info = ('foo.py', 2, 'foo')
+    old = make_result(func_info, ['a = 1', 'b = 2'], [(2, 1, 10), (3, 1, 1)])
+    new = make_result(func_info, ['a = 1', 'c = 3', 'b = 2'],
+                      [(2, 1, 5), (3, 1, 1), (4, 2, 4)])
+    model = LineProfilerDiffModel(
+        ['#', 'Hits', 'Δ Hits', 'Time', 'Δ Time', 'Ratio', 'Code'])
+    model.set_stats(compare_results(ProfileResult(None, {func_info: old}),
+                                    ProfileResult(None, {func_info: new})))
+    top = model.index(0, 0)
+    assert model.rowCount(top) == 3
+    assert [model.index(row, 2, top).data() for row in range(3)] == [
+        '+0', '+1', '+1']
+    assert model.index(0, 4, top).data() == '-5.000'
+    assert model.index(0, 5, top).data() == '0.50×'
+    assert model.index(2, 4, top).data() == '+3.000'
+    assert (model.index(0, 4, top).data(Qt.ForegroundRole)
+            == DIFF_FASTER_COLOR)
+    assert (model.index(2, 4, top).data(Qt.ForegroundRole)
+            == DIFF_SLOWER_COLOR)
+
+    model.sort(4, Qt.DescendingOrder)  # By change in time
+    assert [model.index(row, 0, top).data() for row in range(3)] == [
+        4, 3, 2]
+
+
+def test_data_model_budgets(qtbot):
+    """Check that functions and lines over budget are flagged."""
+    func_info = ('foo.py', 2, 'foo')
+    result = make_result(func_info, ['a = 1', 'b = 2'], [(2, 1, 10), (3, 1, 1)])
+    budgets = [Budget(None, 'foo', None, 5, None, None),
+               Budget(osp.abspath('foo.py'), None, 2, None, 50, None)]
+    model = LineProfilerDataModel(['#', 'Hits', 'Time', 'Per hit', '%', 'Code'])
+    model.set_violations(
+        check_budgets(budgets, ProfileResult(None, {func_info: result})))
+    model.set_stats({func_info: result})
+    top = model.index(0, 0)
+    assert top.data(Qt.ForegroundRole) == BUDGET_VIOLATION_COLOR
+    assert '11.000 ms > 5 ms' in top.data(Qt.ToolTipRole)
+    assert model.index(0, 2, top).data(Qt.ForegroundRole) == (
+        BUDGET_VIOLATION_COLOR)
+    assert 'Line 2 of foo.py' in model.index(0, 2, top).data(Qt.ToolTipRole)
+    assert model.index(1, 2, top).data(Qt.ForegroundRole) is None
+    assert model.index(1, 2, top).data(Qt.ToolTipRole) is None
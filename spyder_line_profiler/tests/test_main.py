@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+#
+# -----------------------------------------------------------------------------
+# Copyright (c) 2017- Spyder Project Contributors
+#
+# Released under the terms of the MIT License
+# (see LICENSE.txt in the project root directory for details)
+# -----------------------------------------------------------------------------
+
+"""Tests for the command line interface in __main__.py."""
+
+# Standard library imports
+import json
+import os
+
+# Local imports
+from spyder_line_profiler.__main__ import main
+
+
+TEST_SCRIPT = """import sys
+@profile
+def foo(n):
+    return n * 2
+foo(1)
+sys.exit(3)
+"""
+
+
+def test_run_and_load(tmpdir, capsys):
+    """Profile a script, then export the saved results in parallel."""
+    os.chdir(tmpdir.strpath)
+    with open('test_foo.py', 'w', encoding='utf-8') as f:
+        f.write(TEST_SCRIPT)
+
+    assert main(['run', '-s', 'foo.lprof', 'test_foo.py']) == 3
+    out = capsys.readouterr().out
+    assert out.startswith('Results of test_foo.py\n')
+    assert 'foo (' in out
+
+    main(['-f', 'json', '-o', 'out.json', 'load', '-j', '2',
+          'foo.lprof', 'foo.lprof'])
+    with open('out.json', encoding='utf-8') as f:
+        data = json.load(f)
+    assert [result['path'] for result in data] == ['foo.lprof'] * 2
+    lines = data[1]['functions'][0]['lines']
+    assert [line['hits'] for line in lines] == [None, None, 1]
+
+
+def test_budgets(tmpdir, capsys):
+    """Check that exceeded budgets make the command fail."""
+    os.chdir(tmpdir.strpath)
+    with open('test_foo.py', 'w', encoding='utf-8') as f:
+        f.write(TEST_SCRIPT)
+    main(['run', '-s', 'foo.lprof', 'test_foo.py'])
+    with open('budgets.json', 'w', encoding='utf-8') as f:
+        json.dump({'budgets': [{'function': 'foo', 'max_hits': 0}]}, f)
+    capsys.readouterr()
+
+    assert main(['-b', 'budgets.json', '--report', 'report.json',
+                 'load', 'foo.lprof']) == 1
+    assert 'Budget exceeded: foo in' in capsys.readouterr().err
+    with open('report.json', encoding='utf-8') as f:
+        report = json.load(f)
+    assert not report['passed']
+    assert report['violations'][0]['measure'] == 'max_hits'
+
+    assert main(['--no-budgets', '-b', 'budgets.json', 'load',
+                 'foo.lprof']) == 0
@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+#
+# -----------------------------------------------------------------------------
+# Copyright (c) 2017- Spyder Project Contributors
+#
+# Released under the terms of the MIT License
+# (see LICENSE.txt in the project root directory for details)
+# -----------------------------------------------------------------------------
+
+"""Tests for bootstrap/memory.py."""
+
+# Standard library imports
+import threading
+import tracemalloc
+
+# Third party imports
+import pytest
+
+# Local imports
+from spyder_line_profiler.bootstrap.memory import MemoryProfiler
+
+SIZE = 10 ** 7
+
+
+@pytest.mark.skipif(not hasattr(tracemalloc, 'reset_peak'),
+                    reason='Peaks are only measured when lines end')
+def test_memory_threads():
+    """Check that peaks are charged to the lines of their thread."""
+    profiler = MemoryProfiler()
+    started = threading.Event()
+    allocated = threading.Event()
+
+    @profiler
+    def wait():
+        started.set()
+        allocated.wait(10)
+
+    @profiler
+    def allocate():
+        data = bytearray(SIZE)
+        del data
+
+    def run(func):
+        profiler.enable_by_count()
+        try:
+            func()
+        finally:
+            profiler.disable_by_count()
+
+    thread = threading.Thread(target=run, args=(wait,))
+    thread.start()
+    try:
+        assert started.wait(10)
+        run(allocate)
+    finally:
+        allocated.set()
+        thread.join()
+    tracemalloc.stop()
+
+    memory = profiler.get_stats().memory
+    peaks = {line_no: peak
+             for func in (wait, allocate)
+             for line_no, _net, peak in memory[
+                 func.__code__.co_filename, func.__code__.co_firstlineno,
+                 func.__qualname__]}
+    # Lines are counted from the decorator
+    assert peaks[wait.__code__.co_firstlineno + 3] < SIZE / 10
+    assert peaks[allocate.__code__.co_firstlineno + 2] >= SIZE
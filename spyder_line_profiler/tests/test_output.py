@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+#
+# -----------------------------------------------------------------------------
+# Copyright (c) 2017- Spyder Project Contributors
+#
+# Released under the terms of the MIT License
+# (see LICENSE.txt in the project root directory for details)
+# -----------------------------------------------------------------------------
+
+"""Tests for output.py."""
+
+# Local imports
+from spyder_line_profiler.output import OMITTED_TEXT, OutputBuffer, iter_pages
+
+
+def test_output_buffer_decoding():
+    """Check that characters split between chunks are decoded."""
+    data = 'Σ = 1 → ✓\n'.encode('utf-8')
+    buffer = OutputBuffer(1000)
+    for pos in range(len(data)):
+        # Chunks of two sources are interleaved
+        buffer.write(data[pos:pos + 1], source='stdout')
+        buffer.write(data[pos:pos + 1], source='stderr')
+    # Invalid and incomplete bytes are replaced
+    buffer.write(b'\xff', source='stdout')
+    buffer.write('Σ'.encode('utf-8')[:1], source='stderr')
+    buffer.flush()
+    assert buffer.getvalue() == (
+        ''.join(char * 2 for char in 'Σ = 1 → ✓\n') + '��')
+
+
+def test_output_buffer_max_size():
+    """Check that only the start and the end of long outputs are kept."""
+    buffer = OutputBuffer(10)
+    buffer.append('abc')
+    assert buffer.getvalue() == 'abc'
+    for chunk in ['def', 'ghijkl', 'm', 'nopqrstuvwxyz']:
+        buffer.append(chunk)
+    assert len(buffer) == 10
+    assert buffer.omitted == 16
+    assert buffer.getvalue() == (
+        'abcde' + OMITTED_TEXT.format(count=16) + 'vwxyz')
+
+
+def test_iter_pages():
+    assert list(iter_pages('abcdefg', 3)) == ['abc', 'def', 'g']
+    assert list(iter_pages('', 3)) == []
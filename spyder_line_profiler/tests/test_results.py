@@ -0,0 +1,374 @@
+# -*- coding: utf-8 -*-
+#
+# -----------------------------------------------------------------------------
+# Copyright (c) 2017- Spyder Project Contributors
+#
+# Released under the terms of the MIT License
+# (see LICENSE.txt in the project root directory for details)
+# -----------------------------------------------------------------------------
+
+"""Tests for results.py."""
+
+# Standard library imports
+import os
+import os.path as osp
+import pickle
+import threading
+import types
+from unittest.mock import MagicMock
+
+# Third party imports
+from line_profiler import LineStats
+import pytest
+
+# Local imports
+from spyder_line_profiler.results import (
+    ContextFunctionResult, LoadingCancelled, MemoryFunctionResult, NO_TASK,
+    ProcessFunctionResult, RepeatedFunctionResult, compute_function_result,
+    compute_results_numpy, load_profile_data, mean_and_error,
+    merge_context_data, merge_process_data, merge_profile_data,
+    merge_shard_data, pivot_results)
+from spyder_line_profiler.sourcecache import BlockCache
+from spyder_line_profiler.statsfile import is_stats_file
+
+
+TEST_SCRIPT = \
+"""import time
+@profile
+def foo():
+    time.sleep(1)
+    xs = []  # Test non-ascii character: Σ
+    for k in range(100):
+        xs = xs + ['x']
+foo()"""
+
+
+def test_function_result():
+    """Check the values given for lines that ran or didn't."""
+    lines = ['def foo():\n', '    a = 1\n', '    pass\n']
+    result = compute_function_result(
+        ('foo.py', 10, 'foo'), [(11, 4, 3000), (12, 2, 0)], 1e-6, lines)
+    assert result.func_info == ('foo.py', 10, 'foo')
+    assert len(result) == 3
+    assert result.line_nos == range(10, 13)
+    assert result.total_time == pytest.approx(0.003)
+    assert list(result.rows()) == [
+        (10, 'def foo():', None, None, None, None),
+        (11, '    a = 1', 0.003, pytest.approx(0.00075), 4, 1.0),
+        (12, '    pass', 0.0, 0.0, 2, 0.0)]
+    # Lines of code are shared, not copied
+    assert result.lines[1] is lines[1]
+
+
+def test_compute_results_numpy():
+    """Check that NumPy gives the same results as pure Python."""
+    pytest.importorskip('numpy')
+    timings = {
+        ('foo.py', 1, 'foo'): [(2, 1, 10), (3, 5, 20), (9, 1, 1)],
+        ('foo.py', 5, 'bar'): [],
+        ('bar.py', 1, 'baz'): [(1, 1, 0)],
+    }
+    blocks = [['def foo():\n', '    a\n', '    b\n'],
+              ['def bar():\n', '    pass\n'],
+              ['def baz(): pass\n']]
+    lstats = LineStats(timings, 1e-6)
+    results = compute_results_numpy(lstats, blocks)
+    assert list(results) == list(timings)
+    for (func_info, stats), block_lines in zip(timings.items(), blocks):
+        assert results[func_info] == compute_function_result(
+            func_info, stats, lstats.unit, block_lines)
+
+
+@pytest.mark.parametrize('use_numpy', [True, False])
+def test_load_profile_data(tmpdir, monkeypatch, use_numpy):
+    """Check that results are loaded with progress and can be cancelled."""
+    if use_numpy:
+        pytest.importorskip('numpy')
+    else:
+        monkeypatch.setattr(
+            'spyder_line_profiler.results.np', None)
+    testfilename = tmpdir.join('test_foo.py').strpath
+    with open(testfilename, 'w', encoding='utf-8') as f:
+        f.write(TEST_SCRIPT)
+    profdatafile = tmpdir.join('results').strpath
+    timings = {(testfilename, 2, 'foo'): [(4, 1, 1000), (7, 100, 3000)]}
+    with open(profdatafile, 'wb') as f:
+        pickle.dump(LineStats(timings, 1e-6), f)
+
+    progress = MagicMock()
+    data = load_profile_data(profdatafile, BlockCache(), progress=progress)
+    progress.assert_called_once_with(0, 1)
+    assert data.path == profdatafile
+    result = data[(testfilename, 2, 'foo')]
+    assert result.total_time == pytest.approx(0.004)
+    lines = list(result.rows())
+    assert [line[0] for line in lines] == [2, 3, 4, 5, 6, 7]
+    assert lines[2][1:] == (
+        '    time.sleep(1)', 0.001, 0.001, 1, pytest.approx(0.25))
+    assert lines[3][2:] == (None, None, None, None)
+
+    cancelled = threading.Event()
+    cancelled.set()
+    with pytest.raises(LoadingCancelled):
+        load_profile_data(profdatafile, BlockCache(), cancelled=cancelled)
+
+
+def test_load_unsafe_data(tmpdir):
+    """Check that pickles of other objects than statistics are rejected."""
+    profdatafile = tmpdir.join('results').strpath
+    with open(profdatafile, 'wb') as f:
+        pickle.dump(LineStats({}, 1e-6), f)
+    pickled = tmpdir.join('pickled').strpath
+    with open(pickled, 'wb') as f:
+        pickle.dump(types.SimpleNamespace(
+            timings={}, unit=1e-6, hook=os.system), f)
+
+    with pytest.raises(pickle.UnpicklingError):
+        load_profile_data(pickled, BlockCache())
+    with pytest.raises(pickle.UnpicklingError):
+        merge_profile_data([profdatafile, pickled], profdatafile)
+    assert len(load_profile_data(profdatafile, BlockCache())) == 0
+
+
+def test_mean_and_error():
+    """Check the statistics of samples."""
+    assert mean_and_error([2.0]) == (2.0, 0.0, 0.0)
+    mean, stddev, error = mean_and_error([1.0, 2.0, 3.0])
+    assert mean == pytest.approx(2.0)
+    assert stddev == pytest.approx(1.0)
+    assert error == pytest.approx(4.303 / 3 ** 0.5)
+
+
+def test_load_repeated_profile_data(tmpdir):
+    """Check that the runs of a script are merged into statistics."""
+    testfilename = tmpdir.join('test_foo.py').strpath
+    with open(testfilename, 'w', encoding='utf-8') as f:
+        f.write(TEST_SCRIPT)
+    func_info = (testfilename, 2, 'foo')
+    profdatafiles = []
+    for index, lstats in enumerate([
+            LineStats({func_info: [(4, 1, 1000), (7, 100, 3000)]}, 1e-6),
+            LineStats({func_info: [(4, 1, 20000), (7, 100, 30000)]}, 1e-7),
+            LineStats({func_info: [(4, 1, 3000)]}, 1e-6)]):
+        profdatafiles.append(tmpdir.join('results.%d' % index).strpath)
+        with open(profdatafiles[-1], 'wb') as f:
+            pickle.dump(lstats, f)
+    merged = tmpdir.join('results').strpath
+    merge_profile_data(profdatafiles, merged)
+    assert is_stats_file(merged)
+
+    result = load_profile_data(merged, BlockCache())[func_info]
+    assert isinstance(result, RepeatedFunctionResult)
+    assert result.runs == 3
+    assert result.total_time == pytest.approx(0.004)
+    assert result.get_time(2) == pytest.approx(0.002)
+    assert result.get_stddev(2) == pytest.approx(0.001)
+    assert result.get_min(2) == pytest.approx(0.001)
+    assert result.get_error(2) == pytest.approx(0.004303 / 3 ** 0.5)
+    # Line 7 didn't run in the last run
+    assert result.get_hits(5) == 67
+    assert result.get_min(5) == 0.0
+    assert result.get_stddev(3) is None
+
+    progress = MagicMock()
+    merge_profile_data(profdatafiles, merged, progress=progress)
+    progress.assert_called_with(3, 3)
+    cancelled = threading.Event()
+    cancelled.set()
+    with pytest.raises(LoadingCancelled):
+        merge_profile_data(profdatafiles, merged, cancelled=cancelled)
+
+
+def test_load_sampled_data(tmpdir):
+    """Check that sampled runs are recognized, also when merged."""
+    testfilename = tmpdir.join('test_foo.py').strpath
+    with open(testfilename, 'w', encoding='utf-8') as f:
+        f.write(TEST_SCRIPT)
+    func_info = (testfilename, 2, 'foo')
+    profdatafiles = []
+    for index, lstats in enumerate([
+            types.SimpleNamespace(timings={func_info: [(7, 40, 4000)]},
+                                  unit=1e-6, sampled=True),
+            types.SimpleNamespace(timings={func_info: [(7, 20, 2000)]},
+                                  unit=1e-6, sampled=True),
+            LineStats({func_info: [(7, 100, 3000)]}, 1e-6)]):
+        profdatafiles.append(tmpdir.join('results.%d' % index).strpath)
+        with open(profdatafiles[-1], 'wb') as f:
+            pickle.dump(lstats, f)
+
+    result = load_profile_data(profdatafiles[0], BlockCache())
+    assert result.sampled
+    assert result[func_info].get_hits(5) == 40
+    assert result[func_info].get_time(5) == pytest.approx(0.004)
+    assert not load_profile_data(profdatafiles[2], BlockCache()).sampled
+
+    merged = tmpdir.join('results').strpath
+    merge_profile_data(profdatafiles[:2], merged)
+    assert load_profile_data(merged, BlockCache()).sampled
+    merge_profile_data(profdatafiles, merged)
+    assert not load_profile_data(merged, BlockCache()).sampled
+
+
+def test_load_memory_data(tmpdir):
+    """Check that the memory of lines is loaded with their timings."""
+    testfilename = tmpdir.join('test_foo.py').strpath
+    with open(testfilename, 'w', encoding='utf-8') as f:
+        f.write(TEST_SCRIPT)
+    func_info = (testfilename, 2, 'foo')
+    lstats = types.SimpleNamespace(
+        timings={func_info: [(4, 1, 1000), (7, 100, 3000)]}, unit=1e-6,
+        memory={func_info: [(4, -64, 0), (7, 4096, 8192)]})
+    profdatafile = tmpdir.join('results').strpath
+    with open(profdatafile, 'wb') as f:
+        pickle.dump(lstats, f)
+
+    result = load_profile_data(profdatafile, BlockCache())[func_info]
+    assert isinstance(result, MemoryFunctionResult)
+    assert result.get_time(5) == pytest.approx(0.003)
+    assert result.get_memory(2) == -64
+    assert result.get_memory(5) == 4096
+    assert result.get_memory(3) is None
+    assert result.get_peak(5) == 8192
+    assert result.total_memory == 4032
+    # Lines freeing memory are not shaded
+    assert result.get_memory_percent(2) == 0.0
+    assert result.get_memory_percent(5) == 1.0
+    assert result.get_peak_percent(2) == 0.0
+
+
+def test_load_process_data(tmpdir):
+    """Check that the results of child processes are merged."""
+    testfilename = tmpdir.join('test_foo.py').strpath
+    with open(testfilename, 'w', encoding='utf-8') as f:
+        f.write(TEST_SCRIPT)
+    func_info = (testfilename, 2, 'foo')
+    profdatafile = tmpdir.join('results').strpath
+    with open(profdatafile, 'wb') as f:
+        pickle.dump(LineStats({func_info: [(4, 1, 1000)]}, 1e-6), f)
+    shardfile = tmpdir.join('42.lprof').strpath
+    with open(shardfile, 'wb') as f:
+        pickle.dump({'pid': 42, 'name': 'Worker-1', 'stats': LineStats(
+            {func_info: [(4, 2, 20000), (7, 100, 30000)]}, 1e-7)}, f)
+    progress = MagicMock()
+    merge_process_data(profdatafile, [shardfile], profdatafile,
+                       progress=progress)
+    progress.assert_called_with(1, 1)
+    assert is_stats_file(profdatafile)
+
+    result = load_profile_data(profdatafile, BlockCache())[func_info]
+    assert isinstance(result, ProcessFunctionResult)
+    assert result.total_time == pytest.approx(0.006)
+    assert result.get_hits(2) == 3
+    assert [label for label, _result in result.processes] == [
+        'Main process', 'Worker-1 (pid 42)']
+    assert result.get_process_times(5) == [
+        ('Worker-1 (pid 42)', pytest.approx(0.003), 100)]
+
+
+@pytest.mark.parametrize('jobs', [1, 2])
+def test_merge_shard_data(tmpdir, jobs):
+    """Check that results saved by separate runs are merged."""
+    testfilename = tmpdir.join('test_foo.py').strpath
+    with open(testfilename, 'w', encoding='utf-8') as f:
+        f.write(TEST_SCRIPT)
+    func_info = (testfilename, 2, 'foo')
+    shardfiles = []
+    for index in range(5):
+        shardfile = tmpdir.mkdir('job{}'.format(index)).join(
+            'results.lprof').strpath
+        with open(shardfile, 'wb') as f:
+            pickle.dump(LineStats(
+                {func_info: [(4, 1, 1000), (7, index, 100 * index)]}, 1e-6),
+                f)
+        shardfiles.append(shardfile)
+    # Files already converted to stats files are merged too
+    load_profile_data(shardfiles[0], convert=True)
+    outfile = tmpdir.join('merged').strpath
+
+    merge_shard_data(shardfiles, outfile, jobs=jobs)
+    result = load_profile_data(outfile)[func_info]
+    assert result.total_time == pytest.approx(0.006)
+    assert result.get_hits(2) == 5
+    assert result.get_hits(5) == 10
+    assert result.get_time(5) == pytest.approx(0.001)
+
+    progress = MagicMock()
+    merge_shard_data(shardfiles, outfile, breakdown=True, jobs=jobs,
+                     progress=progress)
+    progress.assert_called_with(5, 5)
+    result = load_profile_data(outfile)[func_info]
+    assert isinstance(result, ProcessFunctionResult)
+    assert result.get_hits(5) == 10
+    assert [label for label, _result in result.processes] == [
+        osp.join('job{}'.format(index), 'results.lprof')
+        for index in range(5)]
+    assert result.get_process_times(5)[0] == (
+        osp.join('job1', 'results.lprof'), pytest.approx(0.0001), 1)
+
+    cancelled = threading.Event()
+    cancelled.set()
+    with pytest.raises(LoadingCancelled):
+        merge_shard_data(shardfiles, outfile, jobs=jobs,
+                         cancelled=cancelled)
+
+
+def test_load_context_data(tmpdir):
+    """Check that the breakdown by thread and task can be pivoted."""
+    testfilename = tmpdir.join('test_foo.py').strpath
+    with open(testfilename, 'w', encoding='utf-8') as f:
+        f.write(TEST_SCRIPT)
+    func_info = (testfilename, 2, 'foo')
+    profdatafile = tmpdir.join('results').strpath
+    with open(profdatafile, 'wb') as f:
+        pickle.dump(LineStats(
+            {func_info: [(4, 3, 6000), (7, 100, 3000)]}, 1e-6), f)
+    breakdownfile = tmpdir.join('breakdown').strpath
+    with open(breakdownfile, 'wb') as f:
+        pickle.dump([
+            {'thread': 'MainThread', 'task': 'A',
+             'stats': LineStats({func_info: [(4, 1, 1000)]}, 1e-6),
+             'suspended': {(testfilename, 2, 4): 0.5}},
+            {'thread': 'MainThread', 'task': 'B',
+             'stats': LineStats({func_info: [(4, 1, 2000)]}, 1e-6),
+             'suspended': {(testfilename, 2, 4): 0.25}},
+            {'thread': 'Worker', 'task': None,
+             'stats': LineStats(
+                 {func_info: [(4, 1, 30000), (7, 100, 30000)]}, 1e-7),
+             'suspended': {}},
+        ], f)
+    cancelled = threading.Event()
+    cancelled.set()
+    with pytest.raises(LoadingCancelled):
+        merge_context_data(profdatafile, breakdownfile, profdatafile,
+                           cancelled=cancelled)
+    progress = []
+    merge_context_data(profdatafile, breakdownfile, profdatafile,
+                       progress=lambda *args: progress.append(args))
+    assert progress[-1] == (3, 3)
+    assert is_stats_file(profdatafile)
+
+    result = load_profile_data(profdatafile, BlockCache())
+    total = result[func_info]
+    assert isinstance(total, ContextFunctionResult)
+    assert total.context is None
+    assert total.total_time == pytest.approx(0.009)
+    assert total.get_hits(2) == 3
+    assert total.get_suspended(2) == pytest.approx(0.75)
+    assert total.get_suspended(5) is None
+    assert pivot_results(result, 'total') is result
+
+    threads = pivot_results(result, 'thread')
+    assert list(threads) == [func_info + ('MainThread',),
+                             func_info + ('Worker',)]
+    main = threads[func_info + ('MainThread',)]
+    assert main.context == 'MainThread'
+    assert main.get_time(2) == pytest.approx(0.003)
+    assert main.get_hits(5) is None
+    assert main.get_suspended(2) == pytest.approx(0.75)
+
+    tasks = pivot_results(result, 'task')
+    assert [func.context for func in tasks.values()] == ['A', 'B', NO_TASK]
+    assert tasks[func_info + ('B',)].get_suspended(2) == pytest.approx(0.25)
+    assert tasks[func_info + (NO_TASK,)].get_time(5) == pytest.approx(0.003)
+    with pytest.raises(ValueError):
+        pivot_results(result, 'process')
@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+#
+# -----------------------------------------------------------------------------
+# Copyright (c) 2017- Spyder Project Contributors
+#
+# Released under the terms of the MIT License
+# (see LICENSE.txt in the project root directory for details)
+# -----------------------------------------------------------------------------
+
+"""Tests for sourcecache.py."""
+
+# Standard library imports
+import inspect
+import linecache
+from unittest.mock import patch
+
+# Local imports
+from spyder_line_profiler import sourcecache
+from spyder_line_profiler.sourcecache import BlockCache, find_blocks
+
+
+SOURCE = \
+'''import time
+
+
+@profile
+@other_decorator(
+    1, 2)
+def foo(n):
+    """Docstring."""
+    def inner(x): return x
+
+    class Bar:
+        async def baz(self):
+            async with self.lock:
+                pass
+            # Comment in the body
+    return inner(n)
+# Not part of foo
+
+
+def one_liner(): pass
+x = [lambda y: y for z in range(2)]
+'''
+
+
+def test_find_blocks():
+    """Check that blocks are the same as found by inspect.getblock."""
+    lines = SOURCE.splitlines(True)
+    blocks = find_blocks(lines)
+    assert blocks[4] == blocks[7] == 16   # foo
+    assert blocks[9] == 9                 # inner
+    assert blocks[11] == 15               # Bar
+    assert blocks[12] == 15               # baz
+    assert blocks[20] == 20               # one_liner
+    assert 13 not in blocks               # async with
+    for first, last in blocks.items():
+        assert len(inspect.getblock(lines[first - 1:])) == last - first + 1
+
+
+def test_block_cache(tmpdir):
+    """Check that files are only tokenized again when they change."""
+    filename = tmpdir.join('foo.py').strpath
+    with open(filename, 'w') as f:
+        f.write(SOURCE)
+    cache_path = tmpdir.join('blocks').strpath
+
+    cache = BlockCache(cache_path)
+    with patch.object(sourcecache, 'find_blocks',
+                      wraps=sourcecache.find_blocks) as mock_find_blocks:
+        assert len(cache.get_block(filename, 4)) == 13
+        assert len(cache.get_block(filename, 20)) == 1
+        assert mock_find_blocks.call_count == 1
+
+        # Lines that don't start a function use inspect.getblock
+        assert cache.get_block(filename, 21) == [SOURCE.splitlines(True)[20]]
+
+        # The cache is persistent
+        cache.save()
+        cache = BlockCache(cache_path)
+        assert len(cache.get_block(filename, 12)) == 4
+        assert mock_find_blocks.call_count == 1
+
+        # Changing the file invalidates its blocks
+        with open(filename, 'w') as f:
+            f.write('\n' + SOURCE)
+        linecache.checkcache(filename)
+        assert len(cache.get_block(filename, 5)) == 13
+        assert mock_find_blocks.call_count == 2
@@ -0,0 +1,175 @@
+# -*- coding: utf-8 -*-
+#
+# -----------------------------------------------------------------------------
+# Copyright (c) 2017- Spyder Project Contributors
+#
+# Released under the terms of the MIT License
+# (see LICENSE.txt in the project root directory for details)
+# -----------------------------------------------------------------------------
+
+"""Tests for statsfile.py."""
+
+# Standard library imports
+import math
+import os
+import pickle
+import types
+
+# Third party imports
+from line_profiler import LineStats
+import pytest
+
+# Local imports
+from spyder_line_profiler.results import (
+    ContextStats, RepeatedStats, StoredFunctionResult,
+    StoredMemoryFunctionResult, load_profile_data, read_stats)
+from spyder_line_profiler.statsfile import (
+    StatsFile, is_stats_file, write_stats_file)
+
+
+def test_write_and_read(tmpdir):
+    """Check that statistics are read back from a stats file."""
+    path = tmpdir.join('stats').strpath
+    timings = {('fΣo.py', 2, 'foo'): [(3, 1, 1000), (5, 10, 3000)],
+               ('bar.py', 10, 'bar'): []}
+    memory = {('fΣo.py', 2, 'foo'): [(3, 512, 1024), (3, 512, 2048)]}
+    lstats = types.SimpleNamespace(timings=timings, unit=1e-6,
+                                   sampled=True, memory=memory)
+    write_stats_file(lstats, path)
+    assert is_stats_file(path)
+
+    stats = StatsFile(path)
+    assert stats.sampled
+    assert stats.has_memory
+    assert stats.functions == [('fΣo.py', 2, 'foo'), ('bar.py', 10, 'bar')]
+    assert stats.total_times == [pytest.approx(0.004), 0.0]
+    assert stats.get_nlines(0) == 4
+    assert stats.get_nlines(1) == 0
+
+    columns = stats.read_columns(0, 5)
+    assert list(columns['hits']) == [0, 1, 0, 10, 0]
+    times = list(columns['times'])
+    assert math.isnan(times[0]) and math.isnan(times[2])
+    assert math.isnan(times[4])
+    assert times[1] == pytest.approx(0.001)
+    assert times[3] == pytest.approx(0.003)
+    assert list(columns['memory']) == [0, 1024, 0, 0, 0]
+    assert list(columns['peaks']) == [0, 2048, 0, 0, 0]
+    assert list(stats.read_columns(0, 2)['hits']) == [0, 1]
+
+
+def test_invalid_files(tmpdir):
+    """Check that files which are not valid stats files are rejected."""
+    path = tmpdir.join('stats').strpath
+    lstats = LineStats({('foo.py', 1, 'foo'): [(2, 1, 1000)]}, 1e-6)
+    write_stats_file(lstats, path)
+    with open(path, 'rb') as f:
+        data = f.read()
+
+    for invalid in [b'', b'SLPSTATS', data[:-8], b'x' * len(data)]:
+        with open(path, 'wb') as f:
+            f.write(invalid)
+        with pytest.raises(ValueError):
+            StatsFile(path)
+
+    lstats.repeats = [lstats.timings]
+    lstats.processes = [('Main process', lstats.timings)]
+    with pytest.raises(ValueError):
+        write_stats_file(lstats, path)
+
+
+def test_write_and_read_breakdown(tmpdir):
+    """Check that the breakdown of merged statistics is read back."""
+    path = tmpdir.join('stats').strpath
+    foo = ('foo.py', 2, 'foo')
+    bar = ('bar.py', 10, 'bar')
+    contexts = [
+        ('MainThread', 'Task-1', {foo: [(3, 1, 1000)]},
+         {('foo.py', 2, 3): 0.5}),
+        ('Worker', None, {foo: [(3, 2, 2000)], bar: [(11, 1, 500)]}, {})]
+    lstats = ContextStats({foo: [(3, 3, 3000)], bar: [(11, 1, 500)]}, 1e-6,
+                          contexts)
+    write_stats_file(lstats, path)
+
+    stats = StatsFile(path)
+    assert stats.breakdown == 'contexts'
+    assert stats.parts == [('MainThread', 'Task-1'), ('Worker', None)]
+    assert [index for index, _columns in stats.read_breakdown(1)] == [1]
+    (_index, columns), = stats.read_breakdown(1)
+    assert list(columns['hits']) == [0, 1]
+    assert list(columns['suspended']) == [0.0, 0.0]
+
+    read = read_stats(path)
+    assert isinstance(read, ContextStats)
+    assert read.timings[foo] == [(3, 3, pytest.approx(0.003))]
+    thread, task, timings, suspended = read.contexts[0]
+    assert (thread, task) == ('MainThread', 'Task-1')
+    assert timings == {foo: [(3, 1, pytest.approx(0.001))]}
+    assert suspended == {('foo.py', 2, 3): 0.5}
+    assert read.contexts[1][:2] == ('Worker', None)
+    assert set(read.contexts[1][2]) == {foo, bar}
+
+    # Repeated runs are not labelled
+    write_stats_file(RepeatedStats(lstats.timings, 1e-6, [
+        timings for _thread, _task, timings, _suspended in contexts]), path)
+    stats = StatsFile(path)
+    assert stats.breakdown == 'repeats'
+    assert stats.parts == [(None, None), (None, None)]
+    (index, columns), = stats.read_breakdown(1)
+    assert index == 1
+    assert sorted(columns) == ['hits', 'times']
+    assert list(columns['hits']) == [0, 1]
+    assert columns['times'][1] == pytest.approx(0.0005)
+
+
+def test_moved_file(tmpdir):
+    """Check that columns are read from the file where it was moved."""
+    testfilename = tmpdir.join('test_foo.py').strpath
+    with open(testfilename, 'w', encoding='utf-8') as f:
+        f.write('def foo():\n    x = 1\n    return x\n')
+    path = tmpdir.join('stats').strpath
+    lstats = LineStats({(testfilename, 1, 'foo'): [(2, 1, 1000)]}, 1e-6)
+    write_stats_file(lstats, path)
+    data = load_profile_data(path)
+
+    moved = tmpdir.join('moved').strpath
+    os.replace(path, moved)
+    data.path = moved
+    assert data[(testfilename, 1, 'foo')].get_hits(1) == 1
+
+    # Columns are not read from another file replacing it
+    stats = StatsFile(moved)
+    lstats.timings[(testfilename, 1, 'foo')].append((3, 1, 1000))
+    write_stats_file(lstats, moved)
+    with pytest.raises(ValueError):
+        stats.read_columns(0, 3)
+
+
+def test_load_converted_data(tmpdir):
+    """Check that pickled statistics are converted and read lazily."""
+    testfilename = tmpdir.join('test_foo.py').strpath
+    with open(testfilename, 'w', encoding='utf-8') as f:
+        f.write('def foo():\n    x = 1\n    return x\n')
+    profdatafile = tmpdir.join('results').strpath
+    timings = {(testfilename, 1, 'foo'): [(2, 1, 1000), (3, 1, 3000)]}
+    with open(profdatafile, 'wb') as f:
+        pickle.dump(LineStats(timings, 1e-6), f)
+    expected = load_profile_data(profdatafile)
+
+    data = load_profile_data(profdatafile, convert=True)
+    assert is_stats_file(profdatafile)
+    result = data[(testfilename, 1, 'foo')]
+    assert isinstance(result, StoredFunctionResult)
+    assert result.total_time == pytest.approx(0.004)
+    assert list(result.rows()) == list(
+        expected[(testfilename, 1, 'foo')].rows())
+
+    # Memory statistics give memory results
+    lstats = types.SimpleNamespace(
+        timings=timings, unit=1e-6,
+        memory={(testfilename, 1, 'foo'): [(2, 2048, 4096)]})
+    write_stats_file(lstats, profdatafile)
+    result = load_profile_data(profdatafile)[(testfilename, 1, 'foo')]
+    assert isinstance(result, StoredMemoryFunctionResult)
+    assert list(result.memory) == [0, 2048, 0]
+    assert result.total_memory == 2048
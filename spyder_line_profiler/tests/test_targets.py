@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+#
+# -----------------------------------------------------------------------------
+# Copyright (c) 2017- Spyder Project Contributors
+#
+# Released under the terms of the MIT License
+# (see LICENSE.txt in the project root directory for details)
+# -----------------------------------------------------------------------------
+
+"""Tests for targets.py."""
+
+# Local imports
+from spyder_line_profiler.targets import (
+    get_function_at_line, select_hot_functions, split_targets)
+
+
+SOURCE = """import os
+
+class Model:
+    @staticmethod
+    def fit(x):
+        def step():
+            return x
+        return step()
+
+if os.name:
+    async def solve():
+        pass
+"""
+
+
+def test_split_targets():
+    """Check that targets are split on commas."""
+    assert split_targets(' pkg.mod, file.py:solve_* ,, ') == [
+        'pkg.mod', 'file.py:solve_*']
+    assert split_targets('') == []
+
+
+def test_get_function_at_line():
+    """Check that the innermost function at a line is found."""
+    assert [get_function_at_line(SOURCE, line_no)
+            for line_no in range(1, 14)] == [
+        None, None, None, 'Model.fit', 'Model.fit',
+        'Model.fit.<locals>.step', 'Model.fit.<locals>.step', 'Model.fit',
+        None, None, 'solve', 'solve', None]
+    assert get_function_at_line('def (', 1) is None
+
+
+def test_select_hot_functions(tmpdir):
+    project = tmpdir.mkdir('project')
+    filename = project.join('model.py').strpath
+    with open(filename, 'w', encoding='utf-8') as f:
+        f.write(SOURCE)
+    outside = tmpdir.join('outside.py').strpath
+    with open(outside, 'w', encoding='utf-8') as f:
+        f.write('def slow():\n    pass\n')
+    stats = {
+        (filename, 5, 'fit'): (1, 1, 0.1, 3.0, {}),
+        (filename, 6, 'step'): (1, 1, 2.0, 2.0, {}),
+        (filename, 11, 'solve'): (1, 1, 0.5, 0.5, {}),
+        (filename, 1, '<module>'): (1, 1, 0.0, 9.0, {}),
+        (outside, 1, 'slow'): (1, 1, 8.0, 8.0, {}),
+        ('~', 0, "<built-in method time.sleep>"): (1, 1, 7.0, 7.0, {}),
+    }
+    roots = [project.strpath]
+    assert select_hot_functions(stats, 2, roots=roots) == [
+        filename + ':Model.fit', filename + ':Model.fit.<locals>.step']
+    assert select_hot_functions(stats, 2, 'self', roots) == [
+        filename + ':Model.fit.<locals>.step', filename + ':solve']
+    assert select_hot_functions(stats, 1, roots=[tmpdir.strpath]) == [
+        outside + ':slow']